@@ -0,0 +1,103 @@
+"""
+JSON 请求体解码基准：nested_model_params.Offer，items 个 Item，每个 Item 带 images 张 Image
+    json.loads + validate_python   FastAPI 原来的流程（request.json() 再逐个参数校验）
+    orjson.loads + validate_python 只替换解码器（安装了 orjson 时）
+    validate_json                  core.bodies 的 validate_json 方式（深度检查 + pydantic-core 直接解析 bytes）
+    depth check                    core.bodies 的深度检查本身
+    /default /fast                 APIRoute / FastBodyRoute 的完整请求处理（直接调用 ASGI 应用，视图函数只返回 item 数量，不计响应序列化）
+python -m benchmarks.bodies --items 1000 --images 2 --number 50
+"""
+import argparse
+import asyncio
+import json
+import timeit
+
+from fastapi import APIRouter, FastAPI
+from pydantic import TypeAdapter
+
+from core.bodies import DECODERS, MAX_DEPTH, FastBodyRoute, exceeds_depth
+from lessons.nested_model_params import Offer
+
+app = FastAPI()
+fast_router = APIRouter(route_class=FastBodyRoute)
+
+
+@app.post("/default")
+async def create_offer_default(offer: Offer):
+    return {"items": len(offer.items)}
+
+
+@fast_router.post("/fast")
+async def create_offer_fast(offer: Offer):
+    return {"items": len(offer.items)}
+
+
+app.include_router(fast_router)
+
+
+async def post(path: str, body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def make_payload(items: int, images: int) -> bytes:
+    offer = {
+        "name": "Offer", "description": "bulk offer", "price": 42.0,
+        "items": [
+            {
+                "name": f"Item {i}", "description": "The pretender", "price": 10.5, "tax": 1.5, "tags": ["rock", "metal"],
+                "images": [{"url": f"https://example.com/{i}/{j}.png", "name": f"image {j}"} for j in range(images)],
+            }
+            for i in range(items)
+        ],
+    }
+    return json.dumps(offer).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--images", type=int, default=2)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    body = make_payload(args.items, args.images)
+    adapter = TypeAdapter(Offer)
+    decoders = {
+        f"{name}.loads + validate_python": (lambda loads: lambda: adapter.validate_python(loads(body)))(loads)
+        for name, loads in DECODERS.items()
+    }
+    decoders["validate_json"] = lambda: (exceeds_depth(body, MAX_DEPTH), adapter.validate_json(body))
+    decoders["depth check"] = lambda: exceeds_depth(body, MAX_DEPTH)
+
+    print(f"payload: {len(body) / 1024:.0f} KB, {args.items} items x {args.images} images")
+    print(f"{'decoder':<34} {'ms/op':>8}")
+    for name, decode in decoders.items():
+        seconds = min(timeit.repeat(decode, number=args.number, repeat=3))
+        print(f"{name:<34} {seconds / args.number * 1000:>8.2f}")
+
+    print(f"{'asgi (request only)':<34} {'ms/op':>8}")
+    for path in ("/default", "/fast"):
+        assert asyncio.run(post(path, body)) == 200
+        seconds = min(timeit.repeat(lambda: asyncio.run(post(path, body)), number=args.number, repeat=3))
+        print(f"{path:<34} {seconds / args.number * 1000:>8.2f}")
+
+if __name__ == "__main__":
+    main()
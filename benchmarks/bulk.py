@@ -0,0 +1,110 @@
+"""
+批量导入基准：每行一个 Item（带两张图片，图片地址来自几十个重复的 URL），报告每秒导入的行数
+    per-request     每个 Item 一个请求（PUT /items/{item_id}，nested_model_params.update_item）
+    json            POST /items/bulk，JSON 数组（nested_model_params.bulk_create_items）
+    ndjson          同上，NDJSON
+    json no cache   JSON 数组，URL 不缓存（BULK_URL_CACHE_SIZE=0）
+    json 1% bad     JSON 数组，1% 的行缺少 price（逐行报错，其余照常导入）
+直接调用 ASGI 应用
+python -m benchmarks.bulk --rows 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+
+from core.bulk import BulkValidator
+from lessons import nested_model_params
+from lessons.nested_model_params import Item
+
+app = nested_model_params.app
+uncached = BulkValidator(Item, url_cache_size=0)
+bench_app = FastAPI()
+
+
+@bench_app.post("/items/bulk")
+async def bulk_uncached(request: Request):
+    return (await uncached.ingest(request)).summary()
+
+
+def make_rows(count: int, bad_every: int = 0) -> list:
+    rows = []
+    for n in range(count):
+        row = {"name": f"Item {n}", "description": "A very nice Item", "price": 10.5 + n % 100, "tax": 1.5,
+               "tags": ["rock", "metal"],
+               "images": [{"url": f"https://cdn{n % 8}.example.com/images/{n % 50}.png", "name": "front"},
+                          {"url": "https://example.com/logo.png", "name": "logo"}]}
+        if bad_every and n % bad_every == 0:
+            del row["price"]
+        rows.append(row)
+    return rows
+
+
+async def call(target: FastAPI, method: str, path: str, content_type: str, body: bytes) -> bytes:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    chunks = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await target(scope, receive, send)
+    return b"".join(chunks)
+
+
+async def per_request(rows: list) -> float:
+    bodies = [json.dumps(row).encode() for row in rows]
+    start = time.perf_counter()
+    for n, body in enumerate(bodies):
+        await call(app, "PUT", f"/items/{n}", "application/json", body)
+    return time.perf_counter() - start
+
+
+async def bulk(target: FastAPI, content_type: str, body: bytes) -> tuple:
+    start = time.perf_counter()
+    result = json.loads(await call(target, "POST", "/items/bulk", content_type, body))
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    array = json.dumps(rows).encode()
+    ndjson = "\n".join(json.dumps(row) for row in rows).encode()
+    bad = json.dumps(make_rows(args.rows, bad_every=100)).encode()
+
+    print(f"{'case':<16} {'rows/s':>10} {'accepted':>9} {'rejected':>9}")
+    # 每个 Item 一个请求太慢，只跑 2000 行
+    count = min(args.rows, 2000)
+    seconds = asyncio.run(per_request(rows[:count]))
+    print(f"{'per-request':<16} {count / seconds:>10.0f} {count:>9} {0:>9}")
+    for name, target, content_type, body in (
+        ("json", app, "application/json", array),
+        ("ndjson", app, "application/x-ndjson", ndjson),
+        ("json no cache", bench_app, "application/json", array),
+        ("json 1% bad", app, "application/json", bad),
+    ):
+        asyncio.run(bulk(target, content_type, body))
+        seconds, result = min((asyncio.run(bulk(target, content_type, body)) for _ in range(3)), key=lambda r: r[0])
+        print(f"{name:<16} {args.rows / seconds:>10.0f} {result['accepted']:>9} {result['rejected']:>9}")
+    print(f"\nurl cache: {nested_model_params.bulk_items.url_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+列式存储基准：dict 目录（MemoryStore，每条记录一个 dict）vs core.columnar.ColumnarStore
+    1、内存：tracemalloc 统计建立目录前后分配的字节数，除以记录数；以及 ColumnarStore.memory_report() 的估算
+    2、get 的微秒数（ColumnarStore 每次从列中还原一个 dict）
+    3、价格范围过滤：dict 目录逐条比较 vs select(price=(low, high))，第一次（ColumnarStore 建立索引）和第二次查询的毫秒数
+记录与 response_model.Item 相同：name 各不相同，description 有一半为 None、其余来自几个固定的文本，tags 来自一个小词表，
+每条记录都用 json.loads 得到（与请求体解析得到的一样，每条记录有自己的字符串、float 对象）
+python -m benchmarks.columnar --records 1000000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from core.columnar import ColumnarStore, numpy
+from core.storage import MemoryStore
+
+DESCRIPTIONS = [None, "The bartenders", "There goes my baz", "A very nice Item"]
+TAGS = ["rock", "metal", "pop", "jazz", "blues", "folk"]
+
+
+def make_items(count: int) -> dict:
+    rnd = random.Random(0)
+    items = {}
+    for n in range(count):
+        item = {"name": f"Item {n}", "price": round(rnd.uniform(1, 100), 2)}
+        if n % 2:
+            item["description"] = rnd.choice(DESCRIPTIONS)
+            item["tax"] = round(rnd.uniform(0, 20), 1)
+        item["tags"] = rnd.sample(TAGS, rnd.randrange(4))
+        items[f"item-{n}"] = json.loads(json.dumps(item))
+    return items
+
+
+def allocated(build) -> tuple:
+    """ 返回 (结果, 分配的字节数) """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--number", type=int, default=100000)
+    parser.add_argument("--low", type=float, default=20)
+    parser.add_argument("--high", type=float, default=25)
+    args = parser.parse_args()
+
+    memory, memory_bytes = allocated(lambda: MemoryStore(make_items(args.records)))
+
+    def build_columnar() -> ColumnarStore:
+        store = ColumnarStore()
+        # key 复制一份，与 dict 目录一样计算 key 的内存
+        asyncio.run(store.put_many({"".join(list(key)): value for key, value in memory.data.items()}))
+        return store
+
+    columnar, columnar_bytes = allocated(build_columnar)
+    report = columnar.memory_report()
+    print(f"{args.records} records, numpy: {numpy is not None}")
+    print(f"{'':<10} {'bytes/record':>13} {'estimated':>10}")
+    print(f"{'dict':<10} {memory_bytes / args.records:>13.0f} {report['dict_bytes_per_record']:>10.0f}")
+    print(f"{'columnar':<10} {columnar_bytes / args.records:>13.0f} {report['columnar_bytes_per_record']:>10.0f}")
+
+    keys = [f"item-{n}" for n in random.Random(1).sample(range(args.records), min(args.number, args.records))]
+    print(f"\n{'':<10} {'get us':>8} {'price range ms':>15} {'repeat ms':>10} {'matches':>8}")
+    for name, store in (("dict", memory), ("columnar", columnar)):
+        start = time.perf_counter()
+        asyncio.run(_gets(store, keys))
+        get_us = (time.perf_counter() - start) / len(keys) * 1e6
+
+        timings = []
+        for _ in range(2):
+            # ColumnarStore 第一次查询时建立索引，第二次直接使用
+            start = time.perf_counter()
+            if store is memory:
+                matches = [item for item in memory.data.values()
+                           if item.get("price") is not None and args.low <= item["price"] <= args.high]
+            else:
+                matches = columnar.select(price=(args.low, args.high))
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{name:<10} {get_us:>8.2f} {timings[0]:>15.1f} {timings[1]:>10.1f} {len(matches):>8}")
+
+
+async def _gets(store, keys: list) -> None:
+    for key in keys:
+        await store.get(key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+响应压缩基准：每种算法（gzip，安装了 brotli / zstandard 时还有 br / zstd）、每个级别的 CPU 耗时与节省的流量
+    payload       create_offer 的响应（items 个 Item 的 Offer）、GET /items/ 的 JSON 数组
+    ratio         压缩后 / 压缩前
+    compress      压缩一次的耗时（ms），以及吞吐量（MB/s）
+    decompress    客户端解压的耗时（ms）
+    break-even    带宽低于这个值（Mbit/s）时，压缩节省的传输时间大于压缩耗时，压缩才划算
+    cache hit     core.compression 缓存命中时的开销（hash() 摘要 + 查表；每次都用新的 bytes 对象，不使用 bytes 缓存的 hash）
+python -m benchmarks.compression --items 1000 --number 20
+"""
+import argparse
+import json
+import timeit
+
+from core.compression import CODECS, CompressedCache
+from lessons.query_params import iter_items
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6, 11), "zstd": (1, 3, 9, 19)}
+
+
+def make_payloads(items: int) -> dict:
+    offer = {
+        "name": "Offer", "description": "bulk offer", "price": 42.0,
+        "items": [
+            {
+                "name": f"Item {i}", "description": "The pretender", "price": 10.5, "tax": 1.5, "tags": ["rock", "metal"],
+                "images": [{"url": f"https://example.com/{i}/{j}.png", "name": f"image {j}"} for j in range(2)],
+            }
+            for i in range(items)
+        ],
+    }
+    return {
+        "create_offer": json.dumps(offer, separators=(",", ":")).encode(),
+        "read_items": json.dumps(list(iter_items(None, 0, items)), separators=(",", ":")).encode(),
+    }
+
+
+def best(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    cache = CompressedCache()
+    for name, body in make_payloads(args.items).items():
+        print(f"\n{name}: {len(body) / 1024:.1f} KB")
+        print(f"{'codec':<10} {'ratio':>7} {'compress':>9} {'MB/s':>7} {'decompress':>11} {'break-even':>11}")
+        for encoding, codec in CODECS.items():
+            for level in LEVELS[encoding]:
+                compressed = codec.compress(body, level)
+                seconds = best(lambda: codec.compress(body, level), args.number)
+                decompress = best(lambda: codec.decompress(compressed), args.number)
+                saved_bits = (len(body) - len(compressed)) * 8
+                print(f"{encoding + ':' + str(level):<10} {len(compressed) / len(body):>7.3f} {seconds * 1000:>8.2f}ms "
+                      f"{len(body) / seconds / 1e6:>7.0f} {decompress * 1000:>9.2f}ms {saved_bits / seconds / 1e6:>8.0f}Mbps")
+        key = cache.key("gzip", 6, body)
+        cache.set(key, b"x")
+        copies = [bytes(bytearray(body)) for _ in range(args.number * 10)]
+        hit = best(lambda: cache.get(cache.key("gzip", 6, copies.pop())), args.number)
+        print(f"{'cache hit':<10} {'':>7} {hit * 1000:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
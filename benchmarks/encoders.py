@@ -0,0 +1,126 @@
+"""
+jsonable_encoder 对比：先逐个样本对比 core.encoders 与 fastapi.encoders 的输出（不一致时报错退出），再比较耗时
+python -m benchmarks.encoders
+"""
+import dataclasses
+import sys
+import time
+import uuid
+from collections import deque
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import PurePosixPath
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder as fastapi_jsonable_encoder
+from pydantic import BaseModel, Field
+
+from core.encoders import jsonable_encoder
+from lessons import jsonable_encoder as encoder_lesson
+from lessons import nested_model_params, partial_update
+from lessons.path_params import ModelName
+
+ROUNDS = 2000
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: Optional[int] = None
+
+
+class Loose(BaseModel):
+    name: str
+    extra: Dict[str, Any] = {}
+    note: Optional[str] = None
+    when: Optional[date] = None
+
+
+class Aliased(BaseModel):
+    item_id: int = Field(..., alias="id")
+    item_name: str = Field(..., alias="name")
+
+
+def build_offer(count: int) -> nested_model_params.Offer:
+    images = [{"url": f"https://img.example.com/{i}.png", "name": f"img{i}"} for i in range(3)]
+    items = [
+        {"name": f"item{i}", "price": i + 0.5, "tags": ["rock", "metal"], "images": images}
+        for i in range(count)
+    ]
+    return nested_model_params.Offer(name="offer", price=42.0, items=items)
+
+
+def samples():
+    now = datetime(2024, 7, 18, 8, 25, 57)
+    yield "offer", build_offer(5)
+    yield "encoder Item (json_encoders)", encoder_lesson.Item(title="t", timestamp=now)
+    yield "MyItem", encoder_lesson.MyItem(title="t", timestamp=now)
+    yield "MyDateTime", encoder_lesson.MyDateTime(2024, 1, 1, 10)
+    yield "partial_update Item", partial_update.Item(name="Foo", price=50.2)
+    yield "partial_update items", dict(partial_update.items)
+    yield "loose model", Loose(name="x", extra={"_sa_state": 1, "a": None, "b": [now, {"c": None}]})
+    yield "aliased", Aliased(id=1, name="n")
+    yield "enum", ModelName.alexnet
+    yield "dict with models", {"a": [encoder_lesson.Item(title="t", timestamp=now)], ModelName.lenet: {1, 2}}
+    yield "scalars", [1, 2.5, "s", None, True, Decimal("1.0"), Decimal("3"), uuid.UUID(int=1), timedelta(seconds=3)]
+    yield "containers", (frozenset({1}), deque([1, 2]), (3, 4), PurePosixPath("/a/b"), b"bytes")
+    yield "dataclass", Point(1)
+    yield "sa keys", {"_sa_instance_state": object(), "name": "x", "none": None}
+    yield "list of models", [partial_update.Item(name=f"n{i}") for i in range(10)]
+
+
+OPTIONS = [
+    {},
+    dict(exclude_none=True),
+    dict(exclude_unset=True),
+    dict(exclude_defaults=True),
+    dict(by_alias=False),
+    dict(include={"name", "price"}),
+    dict(exclude=["tax", "_sa_instance_state"]),
+    dict(sqlalchemy_safe=False),
+]
+
+
+def check() -> int:
+    failures = 0
+    for name, value in samples():
+        for options in OPTIONS:
+            if name == "sa keys" and not options.get("sqlalchemy_safe", True):
+                continue  # object() 无法编码，两边都会报错
+            expected = fastapi_jsonable_encoder(value, **options)
+            actual = jsonable_encoder(value, **options)
+            if repr(expected) != repr(actual):
+                failures += 1
+                print(f"MISMATCH {name} {options}:\n  fastapi: {expected!r}\n  core:    {actual!r}")
+    # 生成器只能消费一次，单独对比
+    assert fastapi_jsonable_encoder(i for i in range(3)) == jsonable_encoder(i for i in range(3))
+    return failures
+
+
+def bench():
+    cases = [
+        ("Offer x 100 items", build_offer(100)),
+        ("encoder Item", encoder_lesson.Item(title="t", timestamp=datetime.now())),
+        ("partial_update items", dict(partial_update.items)),
+        ("list of 100 dicts", [{"name": f"n{i}", "price": i, "tags": ["a"]} for i in range(100)]),
+    ]
+    print(f"{'case':<24} {'fastapi_us':>10} {'core_us':>10} {'speedup':>8}")
+    for name, value in cases:
+        rounds = max(ROUNDS // 20, 50) if name.startswith("Offer") else ROUNDS
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fastapi_jsonable_encoder(value)
+        fastapi_us = (time.perf_counter() - start) / rounds * 1e6
+        start = time.perf_counter()
+        for _ in range(rounds):
+            jsonable_encoder(value)
+        core_us = (time.perf_counter() - start) / rounds * 1e6
+        print(f"{name:<24} {fastapi_us:>10.1f} {core_us:>10.1f} {fastapi_us / core_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    failures = check()
+    if failures:
+        sys.exit(f"{failures} mismatches")
+    print("outputs identical to fastapi.encoders.jsonable_encoder")
+    bench()
@@ -0,0 +1,57 @@
+"""
+422 错误响应基准：jsonable_encoder({"detail": exc.errors(), "body": exc.body}) vs core.errors.ErrorRenderer（default / compact）
+分别用小请求体（int_parsing）和大请求体（missing，input 和 body 都是整个请求体）构造 RequestValidationError，只计时渲染部分
+python -m benchmarks.errors --number 20000
+"""
+import argparse
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+
+from core.errors import ErrorRenderer
+
+SMALL_BODY = {"title": "x", "size": "abc"}
+LARGE_BODY = {"size": 1, "tags": [f"tag-{i}" for i in range(2000)]}
+
+CASES = {
+    "int_parsing": RequestValidationError(
+        [{"type": "int_parsing", "loc": ("body", "size"),
+          "msg": "Input should be a valid integer, unable to parse string as an integer", "input": "abc"}],
+        body=SMALL_BODY,
+    ),
+    "missing (large body)": RequestValidationError(
+        [{"type": "missing", "loc": ("body", "title"), "msg": "Field required", "input": LARGE_BODY}],
+        body=LARGE_BODY,
+    ),
+}
+
+
+def fastapi_default(exc: RequestValidationError):
+    return JSONResponse(status_code=422, content=jsonable_encoder({"detail": exc.errors(), "body": exc.body}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    default = ErrorRenderer(mode="default")
+    compact = ErrorRenderer(mode="compact")
+    renderers = {
+        "jsonable_encoder": fastapi_default,
+        "renderer default": lambda exc: default.validation_error(None, exc),
+        "renderer compact": lambda exc: compact.validation_error(None, exc),
+    }
+
+    print(f"{'case':<22} {'renderer':<18} {'us/op':>10} {'bytes':>8}")
+    for case, exc in CASES.items():
+        for name, render in renderers.items():
+            size = len(render(exc).body)
+            seconds = timeit.timeit(lambda: render(exc), number=args.number)
+            print(f"{case:<22} {name:<18} {seconds / args.number * 1e6:>10.2f} {size:>8}")
+
+
+if __name__ == "__main__":
+    main()
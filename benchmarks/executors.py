@@ -0,0 +1,123 @@
+"""
+同步视图函数执行方式基准（直接调用 ASGI 应用）
+    1、单个请求的开销：FastAPI 默认（run_in_threadpool，AnyIO 默认线程限制器）/ ExecutorRoute 的 default 池 / 内联执行
+    2、隔离：concurrency 个慢请求（time.sleep(slow_ms)）占着线程时，一个快的同步请求的延迟；
+       shared 表示快慢接口共用 AnyIO 默认的 40 个线程，pooled 表示慢接口在单独的 slow 池（4 个线程 + 排队上限，超出返回 503）
+python -m benchmarks.executors --number 2000 --concurrency 100 --slow-ms 50
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import APIRouter, FastAPI
+
+from core.executors import ExecutorRegistry, ExecutorRoute
+
+registry = ExecutorRegistry(pools="default=40:100,slow=4:16")
+
+
+class BenchExecutorRoute(ExecutorRoute):
+    executors = registry
+
+
+app = FastAPI()
+pooled = APIRouter(route_class=BenchExecutorRoute)
+slow_ms = 50
+
+
+@app.get("/default/return_int")
+def return_int_default():
+    return 123456
+
+
+@pooled.get("/pool/return_int")
+def return_int_pool():
+    return 123456
+
+
+@pooled.get("/inline/return_int")
+@registry.inline
+def return_int_inline():
+    return 123456
+
+
+@app.get("/shared/slow")
+def slow_shared():
+    time.sleep(slow_ms / 1000)
+    return 1
+
+
+@pooled.get("/pooled/slow")
+@registry.run_in("slow")
+def slow_pooled():
+    time.sleep(slow_ms / 1000)
+    return 1
+
+
+app.include_router(pooled)
+
+
+async def get(path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def overhead(path: str, number: int) -> float:
+    await get(path)
+    start = time.perf_counter()
+    for _ in range(number):
+        await get(path)
+    return (time.perf_counter() - start) / number
+
+
+async def isolation(slow_path: str, fast_path: str, concurrency: int) -> tuple:
+    slow = [asyncio.create_task(get(slow_path)) for _ in range(concurrency)]
+    await asyncio.sleep(0.005)
+    start = time.perf_counter()
+    await get(fast_path)
+    fast = time.perf_counter() - start
+    statuses = await asyncio.gather(*slow)
+    return fast, statuses.count(503)
+
+
+def main():
+    global slow_ms
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--slow-ms", type=int, default=50)
+    args = parser.parse_args()
+    slow_ms = args.slow_ms
+
+    print(f"{'handler':<26} {'us/request':>10}")
+    for path in ("/default/return_int", "/pool/return_int", "/inline/return_int"):
+        seconds = asyncio.run(overhead(path, args.number))
+        print(f"{path:<26} {seconds * 1e6:>10.1f}")
+
+    print(f"\n{args.concurrency} x {slow_ms}ms slow requests in flight")
+    print(f"{'case':<10} {'fast request ms':>16} {'slow 503':>9}")
+    for name, slow_path, fast_path in (
+        ("shared", "/shared/slow", "/default/return_int"),
+        ("pooled", "/pooled/slow", "/pool/return_int"),
+    ):
+        fast, rejected = asyncio.run(isolation(slow_path, fast_path, args.concurrency))
+        print(f"{name:<10} {fast * 1000:>16.1f} {rejected:>9}")
+
+
+if __name__ == "__main__":
+    main()
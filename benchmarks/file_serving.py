@@ -0,0 +1,112 @@
+"""
+文件下载基准：Starlette FileResponse vs core.files.serve_file（sendfile / mmap）
+启动一个 uvicorn 进程同时提供两种下载方式，并发下载同一个文件，统计吞吐量和服务进程每 GB 消耗的 CPU 时间（/proc/<pid>/stat，仅 Linux）
+python -m benchmarks.file_serving --size-mb 256 --parallel 8 --rounds 4
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse
+
+from core.files import resolve_path, serve_file
+
+FILES_ROOT = os.environ.get("FILES_ROOT", tempfile.gettempdir())
+FILE_NAME = "fastapi-file-serving-benchmark.bin"
+
+app = FastAPI()
+
+
+@app.get("/starlette/{file_path:path}")
+async def starlette_file(file_path: str):
+    return FileResponse(resolve_path(FILES_ROOT, file_path))
+
+
+@app.get("/zerocopy/{file_path:path}")
+async def zerocopy_file(file_path: str, request: Request):
+    return serve_file(FILES_ROOT, file_path, request)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime、stime 分别是第 14、15 个字段（去掉 pid 和 comm 之后下标为 11、12）
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def download(client: httpx.AsyncClient, url: str) -> int:
+    size = 0
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            size += len(chunk)
+    return size
+
+
+async def run(target: str, port: int, pid: int, parallel: int, rounds: int) -> None:
+    url = f"/{target}/{FILE_NAME}"
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+        await download(client, url)  # 预热页缓存
+        cpu_before = cpu_seconds(pid)
+        start = time.perf_counter()
+        total = 0
+        for _ in range(rounds):
+            sizes = await asyncio.gather(*(download(client, url) for _ in range(parallel)))
+            total += sum(sizes)
+        elapsed = time.perf_counter() - start
+        cpu = cpu_seconds(pid) - cpu_before
+    gb = total / 1024 ** 3
+    print(f"{target:<10} {gb:>8.2f} {elapsed:>8.2f} {total / 1024 ** 2 / elapsed:>10.1f} {cpu / gb:>12.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=4)
+    args = parser.parse_args()
+
+    path = os.path.join(FILES_ROOT, FILE_NAME)
+    with open(path, "wb") as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            f.write(block)
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.file_serving:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "FILES_ROOT": FILES_ROOT},
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            for _ in range(100):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+        print(f"{'target':<10} {'GB':>8} {'secs':>8} {'MB/s':>10} {'cpu_s/GB':>12}")
+        for target in ("starlette", "zerocopy"):
+            await run(target, port, server.pid, args.parallel, args.rounds)
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
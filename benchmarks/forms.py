@@ -0,0 +1,98 @@
+"""
+表单解析基准：APIRoute（python-multipart 解析 + 逐字段校验）vs core.forms.FastFormRoute
+直接调用 ASGI 应用（单进程单核），每种请求报告每秒请求数，以及处理 10k 个请求需要的 CPU 时间（10k RPS 时需要的核数）
+    login        username / password（lessons.form_fields.login，urlencoded）
+    create_item  5 个字段，tags 是列表（lessons.form_fields.create_item，urlencoded）
+    create_file  两个文件 + 一个字段（lessons.form_and_files.create_file，multipart）
+python -m benchmarks.forms --number 5000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from core.forms import FastFormRoute
+from lessons import form_and_files, form_fields
+
+
+def make_app(route_class) -> FastAPI:
+    app = FastAPI()
+    for module in (form_fields, form_and_files):
+        for route in module.app.routes:
+            if isinstance(route, APIRoute):
+                app.router.add_api_route(route.path, route.endpoint, methods=list(route.methods),
+                                         route_class_override=route_class)
+    return app
+
+
+def multipart(fields: dict, files: dict) -> tuple:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: text/plain\r\n\r\n'.encode() + content + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return f"multipart/form-data; boundary={boundary}", b"".join(parts)
+
+
+CASES = {
+    "login": ("/login/", "application/x-www-form-urlencoded", b"username=johndoe&password=secret"),
+    "create_item": ("/items/", "application/x-www-form-urlencoded",
+                    b"name=Foo&description=A+very+nice+Item&price=35.4&tax=3.2&tags=rock&tags=metal&tags=pop"),
+    "create_file": ("/files/", *multipart({"token": "abc"}, {"file": ("a.txt", b"x" * 1024), "fileb": ("b.txt", b"y" * 1024)})),
+}
+
+
+async def post(app: FastAPI, path: str, content_type: str, body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app: FastAPI, case: tuple, number: int) -> float:
+    assert await post(app, *case) == 200
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(number):
+            await post(app, *case)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=5000)
+    args = parser.parse_args()
+
+    apps = {"APIRoute": make_app(APIRoute), "FastFormRoute": make_app(FastFormRoute)}
+    print(f"{'case':<12} {'route':<14} {'us/req':>8} {'req/s':>8} {'cpu s / 10k req':>16}")
+    for name, case in CASES.items():
+        for route_name, app in apps.items():
+            seconds = asyncio.run(measure(app, case, args.number))
+            print(f"{name:<12} {route_name:<14} {seconds * 1e6:>8.1f} {1 / seconds:>8.0f} {seconds * 10000:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
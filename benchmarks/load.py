@@ -0,0 +1,438 @@
+"""
+压测：自动发现 lessons/ 下所有的 FastAPI() 实例（只有 router 的模块包一层 FastAPI）和 runserver.app，
+按每个路由的参数声明（路径参数、必需的查询参数 / 请求头 / Cookie、Body / Form / File，以及 Offer、Item、UserIn 这类 pydantic 模型）生成合法的请求，
+再用固定并发压测：
+    inproc  通过 httpx.ASGITransport 在进程内调用 ASGI 应用（不经过网络，主要看框架本身的开销）
+    socket  启动 uvicorn 子进程，通过本地 socket 请求（只有能用 "模块:app" 启动的应用）
+报告每个路由的 p50 / p99 延迟、每秒请求数，inproc 模式还会报告每个请求的内存分配峰值（tracemalloc，包括 httpx 客户端自身的分配）。
+生成的请求先预热一次，返回码 >= 400 的路由（例如生成的数据不满足视图函数里的业务逻辑）跳过并在最后列出。
+
+保存基线，之后的提交和基线对比（p99 变慢或 rps 下降超过阈值时退出码为 1）：
+python -m benchmarks.load --save benchmarks/baselines/load.json
+python -m benchmarks.load --compare benchmarks/baselines/load.json --threshold 0.2
+只压测部分应用：
+python -m benchmarks.load --apps handle_errors response_model --modes inproc --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import enum
+import importlib
+import io
+import json
+import os
+import pkgutil
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+import typing
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import APIRouter, FastAPI, UploadFile, params
+from fastapi.dependencies.utils import get_flat_dependant
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+import lessons
+
+SAMPLE_STR = "foo"              # lessons 中的示例数据大多以 foo / bar / baz 为 key
+MAX_DEPTH = 4                   # 自引用的模型最多展开的层数
+
+
+class Target:
+    def __init__(self, name: str, app: FastAPI, import_string: Optional[str]):
+        self.name = name
+        self.app = app
+        self.import_string = import_string   # None 表示不能单独启动（只有 router 的模块）
+
+
+class Case:
+    def __init__(self, target: Target, route: APIRoute, method: str, url: str, request: Dict[str, Any]):
+        self.target = target
+        self.route = route
+        self.method = method
+        self.url = url
+        self.request = request
+        # 基线中的 key；同一个应用里路径和方法都相同的路由（被遮蔽的路由）在 collect_cases 中加上序号
+        self.key = f"{target.name} {method} {route.path}"
+
+
+# ---------------- 发现应用 ----------------
+def discover() -> List[Target]:
+    targets = []
+    for info in pkgutil.iter_modules(lessons.__path__):
+        module_name = f"lessons.{info.name}"
+        with contextlib.redirect_stdout(io.StringIO()):
+            module = importlib.import_module(module_name)
+        apps = [(name, value) for name, value in vars(module).items() if isinstance(value, FastAPI)]
+        for attr, app in apps:
+            targets.append(Target(module_name, app, f"{module_name}:{attr}"))
+        router = getattr(module, "router", None)
+        if not apps and isinstance(router, APIRouter):
+            app = FastAPI()
+            app.include_router(router)
+            targets.append(Target(module_name, app, None))
+
+    import runserver
+    targets.append(Target("runserver", runserver.app, "runserver:app"))
+    return targets
+
+
+# ---------------- 根据类型生成数据 ----------------
+def _constraints(field_info) -> Dict[str, Any]:
+    found = {}
+    for meta in getattr(field_info, "metadata", None) or ():
+        for attr in ("gt", "ge", "lt", "le", "min_length", "max_length", "pattern"):
+            value = getattr(meta, attr, None)
+            if value is not None:
+                found[attr] = value
+    return found
+
+
+def _number(kind: type, c: Dict[str, Any]):
+    value = 1
+    if "ge" in c:
+        value = max(value, c["ge"])
+    if "gt" in c:
+        value = max(value, c["gt"] + 1)
+    if "le" in c:
+        value = min(value, c["le"])
+    if "lt" in c:
+        value = min(value, c["lt"] - 1)
+    return kind(value)
+
+
+def _string(c: Dict[str, Any], default: str) -> str:
+    pattern = c.get("pattern")
+    if pattern and pattern.startswith("^") and pattern.endswith("$") and pattern[1:-1].isalnum():
+        return pattern[1:-1]
+    value = default
+    if "min_length" in c and len(value) < c["min_length"]:
+        value = value.ljust(c["min_length"], "x")
+    if "max_length" in c:
+        value = value[:c["max_length"]]
+    return value
+
+
+def sample_value(annotation: Any, field_info=None, depth: int = 0, default_str: str = "string") -> Any:
+    examples = getattr(field_info, "examples", None)
+    if examples:
+        return examples[0] if isinstance(examples, list) else next(iter(examples.values()), None)
+    extra = getattr(field_info, "json_schema_extra", None)
+    if isinstance(extra, dict) and "example" in extra:
+        return extra["example"]
+
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Annotated:
+        return sample_value(args[0], field_info, depth, default_str)
+    if origin in (typing.Union, types.UnionType):
+        non_none = [arg for arg in args if arg is not type(None)]
+        return sample_value(non_none[0], field_info, depth, default_str) if non_none else None
+    if origin in (list, set, frozenset, tuple, typing.List, typing.Set):
+        return [sample_value(args[0] if args else str, None, depth, default_str)]
+    if origin in (dict, typing.Dict):
+        return {SAMPLE_STR: sample_value(args[1] if len(args) > 1 else str, None, depth, default_str)}
+
+    c = _constraints(field_info)
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return model_sample(annotation, depth + 1)
+        if issubclass(annotation, enum.Enum):
+            return next(iter(annotation)).value
+        if issubclass(annotation, bool):
+            return True
+        if issubclass(annotation, int):
+            return _number(int, c)
+        if issubclass(annotation, float):
+            return _number(float, c)
+        if issubclass(annotation, datetime.datetime):
+            return datetime.datetime(2024, 1, 1, 12, 0, 0).isoformat()
+        if issubclass(annotation, datetime.date):
+            return "2024-01-01"
+        if issubclass(annotation, uuid.UUID):
+            return str(uuid.uuid4())
+        if issubclass(annotation, (bytes, UploadFile)):
+            return b"benchmark"
+        if issubclass(annotation, str):
+            return _string(c, default_str)
+    name = getattr(annotation, "__name__", str(annotation))
+    if "Email" in name:
+        return "user@example.com"
+    if "Url" in name:
+        return "https://example.com/image.png"
+    return _string(c, default_str)
+
+
+def model_sample(model: type, depth: int = 0) -> Dict[str, Any]:
+    if depth > MAX_DEPTH:
+        return {}
+    return {
+        field.alias or name: sample_value(field.annotation, field, depth)
+        for name, field in model.model_fields.items()
+    }
+
+
+def _field_sample(field, default_str: str = "string") -> Any:
+    return sample_value(field.field_info.annotation, field.field_info, default_str=default_str)
+
+
+def build_request(route: APIRoute) -> Tuple[str, Dict[str, Any]]:
+    dependant = get_flat_dependant(route.dependant)     # 包括 Depends 子依赖中声明的参数
+    path_values = {}
+    for field in dependant.path_params:
+        value = _field_sample(field, SAMPLE_STR)
+        path_values[field.name] = value.value if isinstance(value, enum.Enum) else value
+    url = route.path_format
+    for name, value in path_values.items():
+        url = url.replace(f"{{{name}}}", str(value))
+
+    request: Dict[str, Any] = {}
+    query = {f.alias: _field_sample(f) for f in dependant.query_params if f.required}
+    if query:
+        request["params"] = query
+    headers = {f.alias: str(_field_sample(f)) for f in dependant.header_params if f.required}
+    if headers:
+        request["headers"] = headers
+    cookies = {f.alias: str(_field_sample(f)) for f in dependant.cookie_params if f.required}
+    if cookies:
+        request["cookies"] = cookies
+
+    body_params = dependant.body_params
+    if body_params:
+        files = {f.alias: ("benchmark.txt", b"benchmark") for f in body_params if isinstance(f.field_info, params.File)}
+        form = {f.alias: _field_sample(f) for f in body_params if type(f.field_info) is params.Form}
+        if files or form:
+            if files:
+                request["files"] = files
+            if form:
+                request["data"] = form
+        else:
+            embed = len(body_params) > 1 or getattr(body_params[0].field_info, "embed", False)
+            if embed:
+                request["json"] = {f.alias: _field_sample(f) for f in body_params}
+            else:
+                request["json"] = _field_sample(body_params[0])
+    return url, request
+
+
+def collect_cases(targets: List[Target]) -> List[Case]:
+    cases = []
+    seen: Dict[str, int] = {}
+    for target in targets:
+        for route in target.app.routes:
+            if not isinstance(route, APIRoute) or not route.include_in_schema:
+                continue
+            method = sorted(route.methods - {"HEAD"})[0]
+            url, request = build_request(route)
+            case = Case(target, route, method, url, request)
+            count = seen.get(case.key, 0)
+            seen[case.key] = count + 1
+            if count:
+                case.key = f"{case.key} #{count + 1}"
+            cases.append(case)
+    return cases
+
+
+# ---------------- 压测 ----------------
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * pct), len(values) - 1)]
+
+
+async def load(client: httpx.AsyncClient, case: Case, requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await client.request(case.method, case.url, **case.request)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def alloc_per_request(client: httpx.AsyncClient, case: Case, requests: int = 50) -> float:
+    """ 顺序请求，每个请求内 tracemalloc 峰值的增量（KB）取平均 """
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(requests):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await client.request(case.method, case.url, **case.request)
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / requests / 1024
+
+
+async def warmup(client: httpx.AsyncClient, case: Case) -> int:
+    try:
+        response = await client.request(case.method, case.url, **case.request)
+    except Exception:
+        return 599
+    return response.status_code
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_inproc(cases: List[Case], args, results: Dict[str, Dict], skipped: List[str]) -> None:
+    by_target: Dict[int, List[Case]] = {}
+    for case in cases:
+        by_target.setdefault(id(case.target.app), []).append(case)
+    for target_cases in by_target.values():
+        app = target_cases[0].target.app
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for case in target_cases:
+                status = await warmup(client, case)
+                if status >= 400:
+                    skipped.append(f"inproc {case.key} -> {status}")
+                    continue
+                stats = await load(client, case, args.requests, args.concurrency)
+                stats["alloc_kb"] = await alloc_per_request(client, case)
+                results[f"inproc {case.key}"] = stats
+                report("inproc", case, stats)
+
+
+async def run_socket(cases: List[Case], args, results: Dict[str, Dict], skipped: List[str]) -> None:
+    by_target: Dict[str, List[Case]] = {}
+    for case in cases:
+        if case.target.import_string:
+            by_target.setdefault(case.target.import_string, []).append(case)
+    for import_string, target_cases in by_target.items():
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", import_string, "--port", str(port), "--log-level", "warning"],
+            stdout=subprocess.DEVNULL,
+        )
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+                for _ in range(100):
+                    try:
+                        await client.get("/openapi.json")
+                        break
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.1)
+                for case in target_cases:
+                    status = await warmup(client, case)
+                    if status >= 400:
+                        skipped.append(f"socket {case.key} -> {status}")
+                        continue
+                    stats = await load(client, case, args.requests, args.concurrency)
+                    results[f"socket {case.key}"] = stats
+                    report("socket", case, stats)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def report(mode: str, case: Case, stats: Dict[str, float]) -> None:
+    alloc = f"{stats['alloc_kb']:.1f}" if "alloc_kb" in stats else "-"
+    print(f"{mode:<7} {case.target.name:<36} {case.method:<6} {case.route.path:<36} "
+          f"{stats['rps']:>9.0f} {stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f} {alloc:>9}", file=sys.__stdout__)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict], path: str, threshold: float) -> bool:
+    """ 和基线对比，打印变化超过阈值的路由，有退化时返回 False """
+    with open(path) as f:
+        baseline = json.load(f)
+    print(f"\ncompare with {path} (commit {baseline.get('commit')}), threshold {threshold:.0%}")
+    ok = True
+    for key, stats in sorted(results.items()):
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        rps_change = stats["rps"] / old["rps"] - 1
+        p99_change = stats["p99_ms"] / old["p99_ms"] - 1
+        regressed = rps_change < -threshold or p99_change > threshold
+        if regressed or abs(rps_change) > threshold or abs(p99_change) > threshold:
+            print(f"{'REGRESSION' if regressed else 'improved':<10} {key:<80} rps {rps_change:+.1%} p99 {p99_change:+.1%}")
+        ok = ok and not regressed
+    return ok
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", nargs="*", help="只压测名称包含这些字符串的应用")
+    parser.add_argument("--modes", nargs="+", default=["inproc", "socket"], choices=["inproc", "socket"])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--save", help="把结果保存为 JSON 基线")
+    parser.add_argument("--compare", help="和 JSON 基线对比")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    targets = discover()
+    if args.apps:
+        targets = [t for t in targets if any(name in t.name for name in args.apps)]
+    cases = collect_cases(targets)
+
+    results: Dict[str, Dict] = {}
+    skipped: List[str] = []
+    print(f"{'mode':<7} {'app':<36} {'method':<6} {'path':<36} {'rps':>9} {'p50_ms':>8} {'p99_ms':>8} {'alloc_kb':>9}")
+    # 视图函数里的 print 会刷屏，压测期间丢弃
+    with open(os.devnull, "w") as devnull:
+        stdout = sys.stdout
+        for mode in args.modes:
+            runner = run_inproc if mode == "inproc" else run_socket
+            sys.stdout = devnull
+            try:
+                await runner(cases, args, results, skipped)
+            finally:
+                sys.stdout = stdout
+
+    if skipped:
+        print("\nskipped (warmup status >= 400):")
+        for line in skipped:
+            print(f"  {line}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+        print(f"\nbaseline saved to {args.save}")
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
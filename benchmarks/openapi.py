@@ -0,0 +1,76 @@
+"""
+OpenAPI 文档基准：FastAPI 默认的 /openapi.json（每次 json.dumps）vs core.openapi 缓存的 bytes
+    default           FastAPI 原来的路由
+    cached            缓存的原始 JSON
+    cached gzip       Accept-Encoding: gzip，直接发送预先压缩好的版本
+    cached 304        带 If-None-Match，只返回 304
+直接调用 ASGI 应用，应用为 lessons.schema_extra / lessons.path_operation_decorator 的路由
+python -m benchmarks.openapi --number 500
+"""
+import argparse
+import asyncio
+import timeit
+
+from fastapi import FastAPI
+
+from core.openapi import install_openapi_cache
+from lessons import path_operation_decorator, schema_extra
+
+
+def make_app(cached: bool) -> FastAPI:
+    app = FastAPI()
+    for module in (schema_extra, path_operation_decorator):
+        for route in module.app.router.routes:
+            if hasattr(route, "response_model"):
+                app.router.routes.append(route)
+    if cached:
+        install_openapi_cache(app, cache_dir="")
+    return app
+
+
+async def get(app: FastAPI, headers: list) -> tuple:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/openapi.json", "raw_path": b"/openapi.json", "root_path": "", "query_string": b"",
+        "headers": headers, "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    result = {"status": 0, "size": 0, "etag": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["etag"] = dict(message["headers"]).get(b"etag", b"")
+        elif message["type"] == "http.response.body":
+            result["size"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return result["status"], result["size"], result["etag"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    default, cached = make_app(False), make_app(True)
+    _, _, etag = asyncio.run(get(cached, []))
+    cases = {
+        "default": (default, []),
+        "cached": (cached, []),
+        "cached gzip": (cached, [(b"accept-encoding", b"gzip, br")]),
+        "cached 304": (cached, [(b"if-none-match", etag)]),
+    }
+    print(f"{'case':<14} {'status':>6} {'bytes':>8} {'us/op':>8}")
+    for name, (app, headers) in cases.items():
+        status, size, _ = asyncio.run(get(app, headers))
+        loop = asyncio.new_event_loop()
+        seconds = min(timeit.repeat(lambda: loop.run_until_complete(get(app, headers)), number=args.number, repeat=3))
+        loop.close()
+        print(f"{name:<14} {status:>6} {size:>8} {seconds / args.number * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+分页基准：skip / limit（offset） vs 游标（core.pagination 使用的 ItemStore.page）
+分别在 MemoryStore 和 SQLiteStore 中写入 rows 条数据，在不同深度各取一页（limit 条），比较每页耗时
+    offset（内存）：itertools.islice(dict.items(), skip, skip + limit)，要先遍历 skip 条
+    offset（SQLite）：ORDER BY key LIMIT ? OFFSET ?，要先扫描 skip 行
+    cursor：key > 上一页最后一个 key，与深度无关
+python -m benchmarks.pagination --rows 1100000 --depths 0 1000 100000 1000000
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+
+from core.storage import MemoryStore, SQLiteStore
+
+OFFSET_SQL = "SELECT key, value FROM kv WHERE namespace = ? ORDER BY key LIMIT ? OFFSET ?"
+
+
+def key_for(index: int) -> str:
+    return f"{index:08d}"
+
+
+async def timed(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_100_000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1000, 100_000, 1_000_000])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    depths = [depth for depth in args.depths if depth + args.limit <= args.rows]
+
+    data = {key_for(i): {"name": f"Foo {i}", "price": 42} for i in range(args.rows)}
+    memory = MemoryStore(data)
+    await memory.page(limit=1)   # 建立有序 key 列表
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = SQLiteStore(os.path.join(tmp, "pagination.db"), "bench", pool_size=1)
+        await sqlite.seed(data)
+
+        async def memory_offset(skip):
+            return list(itertools.islice(data.items(), skip, skip + args.limit))
+
+        async def sqlite_offset(skip):
+            def query(conn):
+                return conn.execute(OFFSET_SQL, ("bench", args.limit, skip)).fetchall()
+            return await sqlite._run(query)
+
+        print(f"{'store':<8} {'depth':>10} {'offset_ms':>12} {'cursor_ms':>12}")
+        for name, store, offset in (("memory", memory, memory_offset), ("sqlite", sqlite, sqlite_offset)):
+            for depth in depths:
+                # 游标指向第 depth 条之前的那个 key，等价于 skip=depth
+                after = key_for(depth - 1) if depth else None
+                assert [k for k, _ in await offset(depth)] == [k for k, _ in await store.page(after=after, limit=args.limit)]
+                offset_ms = await timed(lambda: offset(depth), args.repeat)
+                cursor_ms = await timed(lambda: store.page(after=after, limit=args.limit), args.repeat)
+                print(f"{name:<8} {depth:>10} {offset_ms:>12.3f} {cursor_ms:>12.3f}")
+        await sqlite.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+参数提取基准：APIRoute（solve_dependencies 逐个参数取值、校验）vs core.plans.PlanRoute（预先编译的计划，一次校验）
+直接调用 ASGI 应用，视图函数只返回参数个数
+    q1 ~ q16     1 / 2 / 4 / 8 / 16 个 int 查询参数，最后一行是每增加一个参数的开销（线性拟合的斜率）
+    mixed        path + query + header + cookie 各 2 个
+    课程路由     multi_params.update_item（path + query + 两个请求体参数）、header.read_items2（重复的 x_token 请求头）、cookie.read_items
+python -m benchmarks.plans --number 3000
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import time
+
+from fastapi import Cookie, FastAPI, Header, Path, Query
+from fastapi.routing import APIRoute
+
+from core.plans import PlanRoute
+from lessons import cookie, header, multi_params
+
+COUNTS = (1, 2, 4, 8, 16)
+
+
+def make_endpoint(kinds: list) -> callable:
+    """ 生成带有指定参数的视图函数：kinds 是 [(参数名, 默认值)] """
+
+    async def endpoint(**values):
+        return len(values)
+
+    endpoint.__signature__ = inspect.Signature([
+        inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=default, annotation=int)
+        for name, default in kinds
+    ])
+    return endpoint
+
+
+def make_app(route_class) -> FastAPI:
+    app = FastAPI()
+    for count in COUNTS:
+        app.router.add_api_route(f"/q{count}", make_endpoint([(f"p{i}", Query(...)) for i in range(count)]),
+                                 route_class_override=route_class)
+    mixed = [("a", Path(...)), ("b", Path(...)), ("c", Query(...)), ("d", Query(...)),
+             ("x_e", Header(...)), ("x_f", Header(...)), ("g", Cookie(...)), ("h", Cookie(...))]
+    app.router.add_api_route("/mixed/{a}/{b}", make_endpoint(mixed), route_class_override=route_class)
+    for module, path, lesson_path in (
+        (multi_params, "/items/{item_id}", "/multi_params/items/{item_id}"),
+        (header, "/items2/", "/header/items2/"),
+        (cookie, "/items/", "/cookie/items/"),
+    ):
+        route = next(r for r in module.app.routes if isinstance(r, APIRoute) and r.path == path)
+        app.router.add_api_route(lesson_path, route.endpoint, methods=list(route.methods),
+                                 route_class_override=route_class)
+    return app
+
+
+async def call(app: FastAPI, method: str, path: str, query: bytes, headers: list, body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query, "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def make_cases() -> dict:
+    cases = {}
+    for count in COUNTS:
+        query = "&".join(f"p{i}={i}" for i in range(count)).encode()
+        cases[f"q{count}"] = ("GET", f"/q{count}", query, [], b"")
+    cases["mixed"] = ("GET", "/mixed/1/2", b"c=3&d=4",
+                      [(b"x-e", b"5"), (b"x-f", b"6"), (b"cookie", b"g=7; h=8")], b"")
+    body = json.dumps({"item": {"name": "Foo", "price": 35.4}, "user": {"username": "dave"}}).encode()
+    cases["update_item"] = ("PUT", "/multi_params/items/5", b"item-query=abc",
+                            [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())], body)
+    cases["read_items2"] = ("GET", "/header/items2/", b"", [(b"x_token", b"foo"), (b"x_token", b"bar")], b"")
+    cases["read_items"] = ("GET", "/cookie/items/", b"", [(b"cookie", b"ads_id=abc; other=1")], b"")
+    return cases
+
+
+async def measure(app: FastAPI, case: tuple, number: int) -> float:
+    assert await call(app, *case) == 200, case
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(number):
+            await call(app, *case)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=3000)
+    args = parser.parse_args()
+
+    apps = {"APIRoute": make_app(APIRoute), "PlanRoute": make_app(PlanRoute)}
+    results = {}
+    print(f"{'case':<12} {'APIRoute us':>12} {'PlanRoute us':>13}")
+    for name, case in make_cases().items():
+        results[name] = [asyncio.run(measure(app, case, args.number)) * 1e6 for app in apps.values()]
+        print(f"{name:<12} {results[name][0]:>12.1f} {results[name][1]:>13.1f}")
+
+    slopes = []
+    for index in range(len(apps)):
+        xs, ys = COUNTS, [results[f"q{count}"][index] for count in COUNTS]
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        slopes.append(sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs))
+    print(f"{'us / param':<12} {slopes[0]:>12.2f} {slopes[1]:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
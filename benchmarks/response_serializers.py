@@ -0,0 +1,52 @@
+"""
+response_model 序列化基准：FastAPI 默认流程 vs 预编译的序列化器
+python -m benchmarks.response_serializers
+"""
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from core.serializers import get_serializer
+from lessons.response_model import Item, ItemAlias, UserIn, UserOut, items
+
+ROUNDS = 20000
+
+CASES = [
+    # (名称, 模型, 视图返回值, 序列化参数)
+    ("Item include/exclude", Item, items["bar"], dict(include={"name", "description"}, exclude={"tax"})),
+    ("Item exclude_unset", Item, items["foo"], dict(exclude_unset=True)),
+    ("UserOut from UserIn", UserOut, UserIn(username="derek", password="secret", email="derek@example.com"), {}),
+    ("ItemAlias by_alias=False", ItemAlias, {"id": 1, "name": "Item Name"}, dict(by_alias=False)),
+]
+
+
+async def default_path(field, content, options) -> bytes:
+    data = await serialize_response(field=field, response_content=content, **options)
+    return JSONResponse(data).body
+
+
+async def main():
+    print(f"{'case':<28} {'default_us':>10} {'compiled_us':>11} {'speedup':>8}")
+    for name, model, content, options in CASES:
+        field = create_response_field(name=f"Response_{model.__name__}", type_=model, mode="serialization")
+        serializer = get_serializer(model, **options)
+        assert await default_path(field, content, options) == serializer.dumps(content), name
+
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            await default_path(field, content, options)
+        default = (time.perf_counter() - start) / ROUNDS * 1e6
+
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            serializer.dumps(content)
+        compiled = (time.perf_counter() - start) / ROUNDS * 1e6
+
+        print(f"{name:<28} {default:>10.2f} {compiled:>11.2f} {default / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""
+路由匹配基准：线性匹配（Starlette 默认） vs 前缀树索引
+python -m benchmarks.route_match
+"""
+import time
+
+from fastapi import FastAPI
+
+from core.radix_router import RadixRouter, install_radix_router, linear_lookup
+
+ROUTE_COUNTS = (10, 100, 500, 1000, 2000)
+ROUNDS = 2000
+
+
+def build_app(count: int) -> FastAPI:
+    app = FastAPI()
+    for i in range(count):
+        async def endpoint(item_id: int):
+            return {"item_id": item_id}
+
+        app.add_api_route(f"/group{i}/items/{{item_id}}", endpoint, methods=["GET"], name=f"route{i}")
+    install_radix_router(app)
+    return app
+
+
+def scope_for(path: str) -> dict:
+    return {"type": "http", "method": "GET", "path": path, "root_path": "", "path_params": {}}
+
+
+def timeit(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main():
+    print(f"{'routes':>8} {'linear_us':>10} {'radix_us':>10} {'speedup':>8}")
+    for count in ROUTE_COUNTS:
+        app = build_app(count)
+        router: RadixRouter = app.router
+        router.compile()
+        # 最坏情况：命中最后一条路由
+        scope = scope_for(f"/group{count - 1}/items/42")
+        assert linear_lookup(router, scope) is router.lookup(scope)[0]
+
+        linear = timeit(linear_lookup, router, scope)
+        radix = timeit(router.lookup, scope)
+        print(f"{count:>8} {linear:>10.2f} {radix:>10.2f} {linear / radix:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+共享内存存储基准：MemoryStore（每个 worker 一份 dict）vs SharedMemoryStore（所有 worker 共用一个 mmap 文件）
+    1、单进程读取延迟：get 的微秒数
+    2、多进程内存：workers 个 spawn 出来的进程各自加载 keys 条数据（MemoryStore 在每个进程中建 dict，
+       SharedMemoryStore 打开同一个文件并把每条数据读一遍），报告每个进程加载前后 RSS / PSS 的增量
+       （PSS 把共享的页按进程数均摊，反映真实占用；RSS 中共享页每个进程都会算一遍）
+    3、跨进程可见：另一个进程中 put 的耗时，put 返回后本进程的下一次读取能否读到新值（不需要通知、不需要重新加载）
+python -m benchmarks.shared_store --keys 50000 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from core.storage import MemoryStore, SharedMemoryStore
+
+
+def make_item(n: int) -> dict:
+    return {"name": f"Item {n}", "description": "There goes my baz", "price": 50.2 + n, "tax": 10.5,
+            "tags": ["a", "b", str(n % 10)]}
+
+
+def memory_kb() -> tuple:
+    """ 当前进程的 (RSS, PSS)，单位 KB（只支持 Linux） """
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name] = int(rest.split()[0])
+    return values["Rss"], values["Pss"]
+
+
+def load(kind: str, path: str, keys: int, ready, start, results) -> None:
+    async def run():
+        before = memory_kb()
+        if kind == "memory":
+            store = MemoryStore({f"item-{n}": make_item(n) for n in range(keys)})
+        else:
+            store = SharedMemoryStore(path)
+        for n in range(keys):
+            await store.get(f"item-{n}")
+        ready.wait()
+        # 所有进程都加载完以后再统计，PSS 才是按最终的进程数均摊的
+        start.wait()
+        after = memory_kb()
+        results.put((after[0] - before[0], after[1] - before[1]))
+        await store.close()
+
+    asyncio.run(run())
+
+
+def measure_memory(kind: str, path: str, keys: int, workers: int) -> tuple:
+    ctx = multiprocessing.get_context("spawn")
+    ready, start, results = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1), ctx.Queue()
+    processes = [ctx.Process(target=load, args=(kind, path, keys, ready, start, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    start.wait()
+    deltas = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    rss = sum(delta[0] for delta in deltas) / workers / 1024
+    pss = sum(delta[1] for delta in deltas) / workers / 1024
+    return rss, pss
+
+
+async def read_latency(store, keys: int, number: int) -> float:
+    start = time.perf_counter()
+    for n in range(number):
+        await store.get(f"item-{n % keys}")
+    return (time.perf_counter() - start) / number
+
+
+def write_one(path: str, results) -> None:
+    async def run():
+        store = SharedMemoryStore(path)
+        start = time.perf_counter()
+        await store.put("item-0", {"name": "changed"})
+        results.put(time.perf_counter() - start)
+
+    asyncio.run(run())
+
+
+async def visibility(path: str) -> tuple:
+    """ 另一个进程中 put 的耗时，以及 put 返回后本进程的下一次读取是否读到新值 """
+    store = SharedMemoryStore(path)
+    await store.get("item-0")
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=write_one, args=(path, results))
+    process.start()
+    seconds = results.get()
+    process.join()
+    return seconds, (await store.get("item-0"))["name"] == "changed"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=50000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as tmp:
+        path = os.path.join(tmp, "bench")
+        data = {f"item-{n}": make_item(n) for n in range(args.keys)}
+        shared = SharedMemoryStore(path)
+        asyncio.run(shared.seed(data))
+        print(f"shared file: {os.path.getsize(path) / 1024 / 1024:.1f} MB for {args.keys} items")
+
+        print(f"\n{'store':<8} {'get us':>8}")
+        for name, store in (("memory", MemoryStore(data)), ("shared", shared)):
+            print(f"{name:<8} {asyncio.run(read_latency(store, args.keys, args.number)) * 1e6:>8.2f}")
+
+        print(f"\nper-worker memory after loading {args.keys} items (MB)")
+        print(f"{'workers':>7} {'memory rss':>11} {'memory pss':>11} {'shared rss':>11} {'shared pss':>11}")
+        for workers in args.workers:
+            memory = measure_memory("memory", path, args.keys, workers)
+            shm = measure_memory("shared", path, args.keys, workers)
+            print(f"{workers:>7} {memory[0]:>11.1f} {memory[1]:>11.1f} {shm[0]:>11.1f} {shm[1]:>11.1f}")
+
+        seconds, visible = asyncio.run(visibility(path))
+        print(f"\nput in another process: {seconds * 1e6:.0f} us, visible on next read: {visible}")
+
+
+if __name__ == "__main__":
+    main()
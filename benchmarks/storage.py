@@ -0,0 +1,58 @@
+"""
+存储基准：MemoryStore vs SQLiteStore（不同连接池大小）
+并发执行 get / put，统计每秒操作数；SQLite 的写入会被合并成批量事务
+python -m benchmarks.storage --ops 20000 --concurrency 64 --pool-sizes 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from core.storage import ItemStore, MemoryStore, SQLiteStore
+
+ITEM = {"name": "Foo", "description": "There goes my baz", "price": 50.2, "tax": 10.5, "tags": ["a", "b"]}
+
+
+async def run_ops(store: ItemStore, op: str, ops: int, concurrency: int, keys: int) -> float:
+    async def worker(index: int) -> None:
+        for n in range(index, ops, concurrency):
+            key = f"item-{n % keys}"
+            if op == "read":
+                await store.get(key)
+            else:
+                await store.put(key, ITEM)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return ops / (time.perf_counter() - start)
+
+
+async def bench(name: str, store: ItemStore, args) -> None:
+    await store.seed({f"item-{n}": ITEM for n in range(args.keys)})
+    reads = await run_ops(store, "read", args.ops, args.concurrency, args.keys)
+    writes = await run_ops(store, "write", args.ops, args.concurrency, args.keys)
+    await store.close()
+    print(f"{name:<16} {reads:>12.0f} {writes:>12.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-window", type=float, default=0.002)
+    args = parser.parse_args()
+
+    print(f"{'store':<16} {'reads/s':>12} {'writes/s':>12}")
+    await bench("memory", MemoryStore(), args)
+    with tempfile.TemporaryDirectory() as tmp:
+        for pool_size in args.pool_sizes:
+            path = os.path.join(tmp, f"bench-{pool_size}.db")
+            store = SQLiteStore(path, "bench", pool_size=pool_size, batch_window=args.batch_window)
+            await bench(f"sqlite pool={pool_size}", store, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
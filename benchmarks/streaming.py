@@ -0,0 +1,94 @@
+"""
+大列表响应基准：返回 list（JSONResponse） vs core.streaming（JSON 数组 / NDJSON，生成器为同步或异步）
+直接调用 ASGI 应用，send 只统计字节数、不保存响应体；先记录首字节时间和总耗时，再单独跑一次用 tracemalloc 记录峰值内存
+python -m benchmarks.streaming --limits 1000 10000 100000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from fastapi import FastAPI
+
+from core.streaming import StreamingJSONResponse
+from lessons.query_params import iter_items
+
+app = FastAPI()
+
+
+@app.get("/list")
+async def as_list(limit: int):
+    return list(iter_items(None, 0, limit))
+
+
+@app.get("/array")
+async def as_array(limit: int):
+    return StreamingJSONResponse(iter_items(None, 0, limit))
+
+
+@app.get("/ndjson")
+async def as_ndjson(limit: int):
+    return StreamingJSONResponse(iter_items(None, 0, limit), format="ndjson")
+
+
+@app.get("/ndjson-async")
+async def as_ndjson_async(limit: int):
+    async def items():
+        for item in iter_items(None, 0, limit):
+            yield item
+
+    return StreamingJSONResponse(items(), format="ndjson")
+
+
+async def run(path: str, limit: int, trace: bool = False):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": f"limit={limit}".encode(),
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    received = False
+    first_byte = None
+    size = 0
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()   # 直到响应结束都不断开
+
+    async def send(message):
+        nonlocal first_byte, size
+        if message["type"] == "http.response.body" and message.get("body"):
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            size += len(message["body"])
+
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return (first_byte - start) * 1000, elapsed * 1000, peak / 1024, size
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limits", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'path':<14} {'limit':>8} {'ttfb_ms':>10} {'total_ms':>10} {'peak_kb':>10} {'bytes':>10}")
+    for limit in args.limits:
+        for path in ("/list", "/array", "/ndjson", "/ndjson-async"):
+            await run(path, 1)   # 预热
+            ttfb, total, _, size = await run(path, limit)
+            _, _, peak, _ = await run(path, limit, trace=True)
+            print(f"{path:<14} {limit:>8} {ttfb:>10.2f} {total:>10.1f} {peak:>10.0f} {size:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
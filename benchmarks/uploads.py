@@ -0,0 +1,101 @@
+"""
+大文件并发上传基准：UploadFile（/uploadfile/，会 await file.read()） vs 流式上传（/stream-files/）
+每个目标单独启动一个 uvicorn 进程，上传结束后读取服务进程的峰值 RSS（/proc/<pid>/status 中的 VmHWM，仅 Linux）
+python -m benchmarks.uploads --parallel 4 --size-mb 1024
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+BOUNDARY = "----fastapi-upload-benchmark"
+CHUNK = b"x" * (1024 * 1024)
+TARGETS = {
+    "uploadfile": "/uploadfile/",
+    "stream": "/stream-files/",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def multipart_body(size_mb: int):
+    """ 边生成边发送的 multipart 请求体，客户端自身不占用整个文件的内存 """
+    yield (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="big.bin"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    for _ in range(size_mb):
+        yield CHUNK
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def upload(client: httpx.AsyncClient, url: str, size_mb: int) -> None:
+    response = await client.post(
+        url,
+        content=multipart_body(size_mb),
+        headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+    response.raise_for_status()
+
+
+async def run_target(name: str, parallel: int, size_mb: int) -> None:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "lessons.upload_files:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,  # /uploadfile/ 会 print 文件内容
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/html/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+            baseline = peak_rss_mb(server.pid)
+            start = time.perf_counter()
+            await asyncio.gather(*(upload(client, TARGETS[name], size_mb) for _ in range(parallel)))
+            elapsed = time.perf_counter() - start
+
+        total_mb = parallel * size_mb
+        print(f"{name:<12} {parallel:>8} {size_mb:>8} {elapsed:>8.1f} {total_mb / elapsed:>10.1f} "
+              f"{baseline:>12.1f} {peak_rss_mb(server.pid):>12.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    args = parser.parse_args()
+
+    print(f"{'target':<12} {'parallel':>8} {'size_mb':>8} {'secs':>8} {'MB/s':>10} {'idle_rss_mb':>12} {'peak_rss_mb':>12}")
+    for name in args.targets:
+        await run_target(name, args.parallel, args.size_mb)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("PYTHONWARNINGS", "ignore")
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+启动预热基准：第一个请求 vs 稳定后的请求耗时，WARMUP=0 与 WARMUP=1（回放 test_main.http）对比
+每种配置在新的子进程中导入 runserver、执行 startup，然后直接调用 ASGI 应用（core.warmup.call_app）：
+每个样例请求先记录第一次的耗时，再取之后 repeat 次的中位数
+python -m benchmarks.warmup --repeat 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+CHILD = r"""
+import json, logging, statistics, sys, time
+logging.disable(logging.WARNING)
+from fastapi.testclient import TestClient
+import runserver
+from core.warmup import SAFE_METHODS, Sample, call_app, default_samples, load_samples
+
+repeat = int(sys.argv[1])
+with TestClient(runserver.app) as client:
+    samples = [s for s in load_samples("test_main.http") if s.method in SAFE_METHODS] + default_samples(runserver.app)
+    results = []
+    for sample in samples:
+        timings = []
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            status = client.portal.call(call_app, runserver.app, sample)
+            timings.append((time.perf_counter() - start) * 1000)
+        results.append([sample.label, status, timings[0], statistics.median(timings[1:])])
+print(json.dumps(results))
+"""
+
+
+def run(env: dict, repeat: int) -> list:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, str(repeat)], env={**os.environ, **env}, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    cold = run({"WARMUP": "0"}, args.repeat)
+    warm = run({"WARMUP": "1", "WARMUP_REQUESTS": "test_main.http"}, args.repeat)
+    print(f"{'request':<44} {'cold_first':>11} {'warm_first':>11} {'steady':>8}   (ms)")
+    for (label, status, cold_first, steady), (_, _, warm_first, _) in zip(cold, warm):
+        print(f"{label[:44]:<44} {cold_first:>11.2f} {warm_first:>11.2f} {steady:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
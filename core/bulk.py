@@ -0,0 +1,268 @@
+"""
+批量导入：一个请求提交成千上万条记录（JSON 数组或 NDJSON），按批校验，逐行报告错误
+create_offer（nested_model_params.py）一次只提交一个 Offer；逐条导入时每条记录都是一个请求（路由匹配、读请求体、依赖注入、
+序列化响应），校验本身只占很小一部分；每个 Image.url（HttpUrl）都要重新解析，同一个图片地址出现多少次就解析多少次。
+BulkValidator 的做法：
+    1、JSON 数组（application/json）读完整个请求体后一次解码（有 orjson 时用 orjson）；NDJSON（application/x-ndjson）边接收边按行解码，
+       不需要把整个请求体放在内存中。请求体大小由 BULK_MAX_BYTES 限制（413）
+    2、每 batch_size 行用一个 TypeAdapter(List[Model]) 校验（一次调用 pydantic-core，不会为每一行进出 Python）
+    3、URL 字段（HttpUrl、AnyUrl 等，包括嵌套模型、列表中的）换成带缓存的校验：相同的字符串直接返回上次的结果
+       （Url 对象不可变，可以共用），CDN、图片服务器这种重复的地址只解析一次；每个字段一个缓存，最多 url_cache_size 条，满了淘汰最早的
+    4、一批中有校验失败的行时，按报错中的下标记下这些行的错误（FastAPI 422 的格式，loc 去掉了行号），其余行重新校验后照常导入，
+       不会因为一行出错整批失败；NDJSON 中无法解码的行报 json_invalid。最多返回 max_errors 条行错误，rejected 是出错的总行数
+    5、每批校验通过的模型交给 on_batch（例如写入 core.storage 的存储），批之间让出事件循环
+配置：BULK_MAX_BYTES=67108864，BULK_BATCH_SIZE=1000，BULK_MAX_ERRORS=100，BULK_URL_CACHE_SIZE=4096（0 表示不缓存）
+用法：
+    bulk_items = BulkValidator(Item)
+
+    @app.post("/items/bulk")
+    async def bulk_create_items(request: Request):
+        return (await bulk_items.ingest(request)).summary()
+"""
+import asyncio
+import copy
+import json
+import os
+import types
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type, Union, get_args, get_origin
+
+from fastapi import HTTPException, Request
+from pydantic import AnyUrl, BaseModel, TypeAdapter, ValidationError, WrapValidator, create_model
+from pydantic_core import MultiHostUrl, Url
+from typing_extensions import Annotated
+
+from core.bodies import MAX_DEPTH, exceeds_depth, get_decoder, is_json_content_type, read_body
+
+MAX_BYTES = int(os.environ.get("BULK_MAX_BYTES", 64 * 1024 * 1024))
+BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 1000))
+MAX_ERRORS = int(os.environ.get("BULK_MAX_ERRORS", 100))
+URL_CACHE_SIZE = int(os.environ.get("BULK_URL_CACHE_SIZE", 4096))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines", "application/x-jsonlines")
+_URL_TYPES = (AnyUrl, Url, MultiHostUrl)
+
+
+class UrlCache:
+    """ 一个 URL 字段的校验缓存，用作 WrapValidator：字符串 -> 校验后的 Url """
+    __slots__ = ("maxsize", "values", "hits", "misses")
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.values: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, value: Any, handler: Callable[[Any], Any]) -> Any:
+        if type(value) is not str:
+            return handler(value)
+        found = self.values.get(value)
+        if found is not None:
+            self.hits += 1
+            return found
+        self.misses += 1
+        found = handler(value)
+        if len(self.values) >= self.maxsize:
+            del self.values[next(iter(self.values))]
+        self.values[value] = found
+        return found
+
+
+def _is_url(annotation: Any) -> bool:
+    if get_origin(annotation) is Annotated:
+        annotation = get_args(annotation)[0]
+    return isinstance(annotation, type) and issubclass(annotation, _URL_TYPES)
+
+
+class _UrlCacheRewriter:
+    """ 生成把 URL 字段换成带缓存校验的子类模型（字段、默认值、校验器与原模型相同，isinstance 仍然成立） """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.caches: List[UrlCache] = []
+        self.models: Dict[type, type] = {}
+
+    def _cached(self, annotation: Any) -> Any:
+        cache = UrlCache(self.maxsize)
+        self.caches.append(cache)
+        return Annotated[annotation, WrapValidator(cache)]
+
+    def annotation(self, annotation: Any) -> Any:
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return self.model(annotation)
+        if _is_url(annotation):
+            return self._cached(annotation)
+        args = get_args(annotation)
+        if not args:
+            return annotation
+        new_args = tuple(self.annotation(arg) for arg in args)
+        if all(new is old for new, old in zip(new_args, args)):
+            return annotation
+        origin = get_origin(annotation)
+        if origin is Annotated:
+            return Annotated[new_args]
+        if origin is Union or origin is getattr(types, "UnionType", None):
+            return Union[new_args]
+        if hasattr(annotation, "copy_with"):
+            return annotation.copy_with(new_args)
+        return origin[new_args]
+
+    def model(self, model: Type[BaseModel]) -> Type[BaseModel]:
+        if model in self.models:
+            return self.models[model]
+        # 模型引用自己时，里面的引用仍然使用原模型
+        self.models[model] = model
+        fields = {}
+        for name, field in model.model_fields.items():
+            info = copy.copy(field)
+            if _is_url(field.annotation):
+                # HttpUrl 的约束（UrlConstraints）在 metadata 中，放进缓存的范围内一起跳过
+                annotation = self._cached(Annotated[(field.annotation, *field.metadata)])
+                info.metadata = []
+            else:
+                annotation = self.annotation(field.annotation)
+                if annotation is field.annotation:
+                    continue
+            fields[name] = (annotation, info)
+        if fields:
+            self.models[model] = create_model(model.__name__, __base__=model, __module__=model.__module__, **fields)
+        return self.models[model]
+
+
+class BulkResult:
+    __slots__ = ("accepted", "rejected", "errors", "max_errors")
+
+    def __init__(self, max_errors: int):
+        self.accepted = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.max_errors = max_errors
+
+    def reject(self, index: int, errors: List[Dict[str, Any]]) -> None:
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"index": index, "errors": errors})
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            # NDJSON 中无法解码的行在读到时就记下了，比同一批中校验失败的行早
+            "errors": sorted(self.errors, key=lambda error: error["index"]),
+            "errors_truncated": self.rejected > len(self.errors),
+        }
+
+
+OnBatch = Callable[[List[BaseModel]], Awaitable[None]]
+
+
+class BulkValidator:
+    def __init__(
+        self,
+        model: Type[BaseModel],
+        batch_size: int = BATCH_SIZE,
+        max_errors: int = MAX_ERRORS,
+        max_bytes: int = MAX_BYTES,
+        url_cache_size: int = URL_CACHE_SIZE,
+    ):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.max_bytes = max_bytes
+        rewriter = _UrlCacheRewriter(url_cache_size)
+        self.model = rewriter.model(model) if url_cache_size > 0 else model
+        self.url_caches = rewriter.caches
+        self.adapter = TypeAdapter(List[self.model])
+        self.decoder = get_decoder()
+
+    def url_cache_stats(self) -> Dict[str, int]:
+        return {
+            "hits": sum(cache.hits for cache in self.url_caches),
+            "misses": sum(cache.misses for cache in self.url_caches),
+            "size": sum(len(cache.values) for cache in self.url_caches),
+        }
+
+    def validate(self, rows: List[Any], indexes: List[int], result: BulkResult) -> List[BaseModel]:
+        """ 校验一批；出错的行记到 result 中（indexes 是每一行在整个请求中的行号），返回其余行的模型 """
+        try:
+            models = self.adapter.validate_python(rows)
+        except ValidationError as exc:
+            failed: Dict[int, List[Dict[str, Any]]] = {}
+            for error in exc.errors(include_url=False):
+                position, *loc = error["loc"]
+                error["loc"] = tuple(loc)
+                failed.setdefault(position, []).append(error)
+            for position, errors in failed.items():
+                result.reject(indexes[position], errors)
+            rows = [row for position, row in enumerate(rows) if position not in failed]
+            models = self.adapter.validate_python(rows) if rows else []
+        result.accepted += len(models)
+        return models
+
+    async def _flush(self, rows: List[Any], indexes: List[int], result: BulkResult, on_batch: Optional[OnBatch]):
+        models = self.validate(rows, indexes, result)
+        if models and on_batch is not None:
+            await on_batch(models)
+        # 一批校验完让出事件循环，大请求不会一直占着它
+        await asyncio.sleep(0)
+
+    async def _ingest_json(self, request: Request, result: BulkResult, on_batch: Optional[OnBatch]) -> None:
+        body = await read_body(request, self.max_bytes)
+        if exceeds_depth(body, MAX_DEPTH + 1):
+            raise HTTPException(status_code=400, detail="JSON body too deeply nested")
+        try:
+            rows = self.decoder(body)
+        except json.JSONDecodeError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {exc.msg}")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array")
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            await self._flush(batch, range(start, start + len(batch)), result, on_batch)
+
+    async def _ingest_ndjson(self, request: Request, result: BulkResult, on_batch: Optional[OnBatch]) -> None:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise HTTPException(status_code=413, detail="Request body too large")
+        rows: List[Any] = []
+        indexes: List[int] = []
+        index = 0
+        size = 0
+        pending = b""
+
+        async def add(line: bytes) -> None:
+            nonlocal index, rows, indexes
+            if not line.strip():
+                return
+            try:
+                rows.append(self.decoder(line))
+                indexes.append(index)
+            except json.JSONDecodeError as exc:
+                result.reject(index, [{"type": "json_invalid", "loc": (), "msg": "JSON decode error",
+                                       "input": {}, "ctx": {"error": exc.msg}}])
+            index += 1
+            if len(rows) >= self.batch_size:
+                batch, batch_indexes, rows, indexes = rows, indexes, [], []
+                await self._flush(batch, batch_indexes, result, on_batch)
+
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise HTTPException(status_code=413, detail="Request body too large")
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                await add(line)
+        await add(pending)
+        if rows:
+            await self._flush(rows, indexes, result, on_batch)
+
+    async def ingest(self, request: Request, on_batch: Optional[OnBatch] = None) -> BulkResult:
+        """ 按 Content-Type 解析请求体（JSON 数组或 NDJSON）并分批校验；行号从 0 开始，NDJSON 的空行不计 """
+        result = BulkResult(self.max_errors)
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in NDJSON_TYPES:
+            await self._ingest_ndjson(request, result, on_batch)
+        elif is_json_content_type(request):
+            await self._ingest_json(request, result, on_batch)
+        else:
+            raise HTTPException(status_code=415, detail="Expected application/json or application/x-ndjson")
+        return result
@@ -0,0 +1,273 @@
+"""
+GET 接口的响应缓存（读穿透，LRU + TTL）
+read_item、get_model、read_items 这类接口的结果只取决于路径和查询参数，但每次请求都要走一遍依赖注入、参数校验和响应序列化。
+用 @response_cache.cached(ttl=...) 标记视图函数，路由类使用 CachedRoute 后：
+    1、缓存 key = 视图函数 + 规范化的路径 + 排序后的查询参数 + vary 指定的请求头
+    2、命中时直接返回缓存的响应体（不再校验参数、调用视图函数、序列化），响应头带 X-Cache: HIT
+    3、条目总数超过 maxsize 时淘汰最久未使用的，每个路由单独设置 ttl
+    4、同一个 key 同时有多个请求未命中时，只有第一个请求执行视图函数，其余请求等待它的结果（single-flight，防止缓存击穿）
+    5、数据被修改时调用 response_cache.invalidate(read_item, item_id=item_id) 删除对应的缓存；
+       正在生成中的同一个 key 也会被标记为过期：它的结果不写入缓存，等待它的请求自己重新执行视图函数
+只缓存状态码为 200、非流式、不带 Set-Cookie 的响应；请求头 Cache-Control: no-cache 会跳过缓存重新生成。
+缓存是进程内的，多个 worker 之间不共享，invalidate 也只作用于当前进程。
+
+用法：
+    app = FastAPI()
+    app.router.route_class = CachedRoute   # 在声明路由之前设置
+
+    @app.get("/items/{item_id}")
+    @response_cache.cached(ttl=30)
+    async def read_item(item_id: str):
+        ...
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+
+class CachePolicy:
+    __slots__ = ("ttl", "vary")
+
+    def __init__(self, ttl: float, vary: Iterable[str] = ()):
+        self.ttl = ttl
+        self.vary = tuple(header.lower() for header in vary)
+
+
+class CacheEntry:
+    __slots__ = ("endpoint", "path_params", "status_code", "headers", "body", "expires_at")
+
+    def __init__(self, endpoint: str, path_params: Dict[str, Any], response: Response, expires_at: float):
+        self.endpoint = endpoint
+        self.path_params = path_params
+        self.status_code = response.status_code
+        self.headers = [(k, v) for k, v in response.raw_headers if k != b"x-cache"]
+        self.body = response.body
+        self.expires_at = expires_at
+
+    def response(self, state: bytes) -> Response:
+        response = Response(status_code=self.status_code)
+        response.body = self.body
+        response.raw_headers = [*self.headers, (b"x-cache", state)]
+        return response
+
+
+class CacheStats:
+    __slots__ = ("hits", "misses", "coalesced", "evictions", "invalidations")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0      # 等待其他请求的结果（single-flight）
+        self.evictions = 0
+        self.invalidations = 0
+
+    def dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _Flight:
+    """ 正在生成中的缓存条目，其他请求等待 done """
+
+    def __init__(self, endpoint: str, path_params: Dict[str, Any]):
+        self.endpoint = endpoint
+        self.path_params = path_params
+        self.done = asyncio.Event()
+        self.entry: Optional[CacheEntry] = None
+        self.error: Optional[Exception] = None
+        # 生成过程中被 invalidate：视图函数可能读到的是修改前的数据
+        self.stale = False
+
+
+def endpoint_name(endpoint: Callable) -> str:
+    return f"{endpoint.__module__}.{endpoint.__qualname__}"
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple, CacheEntry]" = OrderedDict()
+        self._flights: Dict[Tuple, _Flight] = {}
+        self.stats: Dict[str, CacheStats] = {}
+
+    def cached(self, ttl: float = 60, vary: Iterable[str] = ()) -> Callable:
+        """ 标记视图函数需要缓存，vary 是参与缓存 key 的请求头 """
+        policy = CachePolicy(ttl, vary)
+
+        def decorator(func: Callable) -> Callable:
+            func.__response_cache__ = policy
+            return func
+
+        return decorator
+
+    def make_key(self, name: str, policy: CachePolicy, request: Request) -> Tuple:
+        query = sorted(parse_qsl(request.scope["query_string"].decode("latin-1"), keep_blank_values=True),
+                       key=lambda item: item[0])
+        headers = request.headers
+        return (
+            name,
+            request.scope["path"].rstrip("/") or "/",
+            tuple(query),
+            tuple(headers.get(header, "") for header in policy.vary),
+        )
+
+    def _stats(self, name: str) -> CacheStats:
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = CacheStats()
+        return stats
+
+    def get(self, key: Tuple) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Tuple, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            _, evicted = self._entries.popitem(last=False)
+            self._stats(evicted.endpoint).evictions += 1
+
+    def invalidate(self, endpoint: Optional[Callable] = None, **path_params: Any) -> int:
+        """
+        删除缓存，返回删除的条目数
+        invalidate()                              全部
+        invalidate(read_item)                     read_item 的全部缓存
+        invalidate(read_item, item_id="foo")      read_item 中路径参数 item_id == "foo" 的缓存
+        """
+        name = endpoint_name(endpoint) if endpoint is not None else None
+
+        def matches(item) -> bool:
+            return ((name is None or item.endpoint == name)
+                    and all(str(item.path_params.get(k)) == str(v) for k, v in path_params.items()))
+
+        self._expire_flights(matches)
+        keys = [key for key, entry in self._entries.items() if matches(entry)]
+        for key in keys:
+            entry = self._entries.pop(key)
+            self._stats(entry.endpoint).invalidations += 1
+        return len(keys)
+
+    def invalidate_many(self, endpoint: Callable, param: str, values: Iterable[Any]) -> int:
+        """ 批量删除：路径参数 param 的值在 values 中的缓存，只遍历一次缓存 """
+        name = endpoint_name(endpoint)
+        values = {str(value) for value in values}
+
+        def matches(item) -> bool:
+            return item.endpoint == name and str(item.path_params.get(param)) in values
+
+        self._expire_flights(matches)
+        keys = [key for key, entry in self._entries.items() if matches(entry)]
+        for key in keys:
+            del self._entries[key]
+        if keys:
+            self._stats(name).invalidations += len(keys)
+        return len(keys)
+
+    def _expire_flights(self, matches: Callable[[Any], bool]) -> None:
+        """ 把匹配的正在生成的条目标记为过期，并从 _flights 中移除，之后的请求重新生成 """
+        for key, flight in list(self._flights.items()):
+            if matches(flight):
+                flight.stale = True
+                del self._flights[key]
+
+    def clear(self) -> None:
+        self._expire_flights(lambda flight: True)
+        self._entries.clear()
+
+    def report(self) -> Dict[str, Any]:
+        total = CacheStats()
+        for stats in self.stats.values():
+            for name in CacheStats.__slots__:
+                setattr(total, name, getattr(total, name) + getattr(stats, name))
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "total": total.dict(),
+            "endpoints": {name: stats.dict() for name, stats in sorted(self.stats.items())},
+        }
+
+    async def fetch(self, key: Tuple, request: Request, policy: CachePolicy, call: Callable) -> Response:
+        name = key[0]
+        stats = self._stats(name)
+        if "no-cache" not in request.headers.get("cache-control", ""):
+            entry = self.get(key)
+            if entry is not None:
+                stats.hits += 1
+                return entry.response(b"HIT")
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                stats.coalesced += 1
+                await flight.done.wait()
+                if not flight.stale:
+                    if flight.error is not None:
+                        raise flight.error
+                    if flight.entry is not None:
+                        return flight.entry.response(b"HIT")
+                # 第一个请求的响应不可缓存（如 404）、被取消或者生成过程中缓存被 invalidate，自己再执行一次
+                return await call(request)
+
+        stats.misses += 1
+        flight = self._flights[key] = _Flight(name, dict(request.path_params))
+        try:
+            response = await call(request)
+            if self._cacheable(response):
+                entry = CacheEntry(name, flight.path_params, response, time.monotonic() + policy.ttl)
+                if not flight.stale:
+                    flight.entry = entry
+                    self.set(key, entry)
+                response.raw_headers.append((b"x-cache", b"MISS"))
+            return response
+        except Exception as exc:
+            # 只把普通异常交给等待的请求；CancelledError 等（第一个请求的客户端断开）不能取消其他请求
+            flight.error = exc
+            raise
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.done.set()
+
+    @staticmethod
+    def _cacheable(response: Response) -> bool:
+        return (
+            response.status_code == 200
+            and response.background is None
+            and isinstance(getattr(response, "body", None), bytes)
+            and not any(k == b"set-cookie" for k, _ in response.raw_headers)
+        )
+
+
+response_cache = ResponseCache()
+
+
+class CachedRoute(APIRoute):
+    """ 视图函数被 @response_cache.cached 标记时，在路由处理函数外面加上响应缓存 """
+
+    cache: ResponseCache = response_cache
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        policy: Optional[CachePolicy] = getattr(self.endpoint, "__response_cache__", None)
+        if policy is None or "GET" not in self.methods:
+            return handler
+
+        cache = self.cache
+        name = endpoint_name(self.endpoint)
+
+        async def cached_handler(request: Request) -> Response:
+            if request.method != "GET":
+                return await handler(request)
+            return await cache.fetch(cache.make_key(name, policy, request), request, policy, handler)
+
+        return cached_handler
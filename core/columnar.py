@@ -0,0 +1,534 @@
+"""
+列式的内存存储
+response_model.py / partial_update.py 的 items、jsonable_encoder.py 的 fake_db 每条记录是一个 dict：
+dict 本身约 200 字节，每个 float 24 字节、每个字符串 50 字节以上、tags 列表 56 字节起，一百万条记录就是几百 MB。
+ColumnarStore 按字段分列保存：
+    1、数值字段（int、float）放在 array('d') 中，每个值 8 字节；None 和没有提供的值保存为 NaN，范围过滤时自动排除
+    2、字符串字段（name 等）和字符串列表（tags）保存字符串池中的 id（array('I')，4 字节），相同的字符串只保存一份；
+       tags 的 id 连续放在一个共享的 array('I') 中，每行记录起点和长度
+    3、每行 present / none / ints 三个位图，区分没有提供的字段和值为 None 的字段，记录哪些数值原来是 int，
+       get() 返回的 dict 与写入的相同；
+       列的类型按第一次出现的非 None 值确定，类型不符的值（bool、超过 2**53 的 int、嵌套对象等）放在这一行单独的 extras dict 中
+get() 返回新建的 dict（与 SQLiteStore 一样，调用方修改它不会影响存储）；select() 返回 ColumnarRow，
+它是一个只读的 Mapping，只在序列化（FastAPI 按 response_model 校验、jsonable_encoder）时才逐个字段取值。
+select(price=(10, 50), name="Foo", tags="rock") 按列过滤：
+    数值列第一次范围查询时建立按值排序的索引（安装了 numpy 时用 numpy.argsort 直接在 array 上排序），之后用 bisect 定位，
+    代价只和结果的数量有关；该列有写入时索引失效，下次查询时重建（适合读多写少的目录）
+    字符串相等比较字符串池中的 id（map / itertools.compress，循环在 C 中执行）；先算数值范围，其他条件只检查范围内的行
+字段顺序按列的创建顺序，extras 中的字段在最后。
+memory_report() 报告每条记录的字节数，以及按同样的数据构造 dict 时的字节数。
+用法：
+    STORAGE_URL=columnar://          （core.storage.create_store，StoreProvider 自动使用）
+    store = ColumnarStore()
+    await store.seed(items)
+    rows = store.select(price=(10, 50), limit=100)
+"""
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from itertools import compress
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from core.storage import ItemStore
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NAN = float("nan")
+NONE_ID = 0xFFFFFFFF
+ALIVE = 1 << 31
+MAX_COLUMNS = 31
+
+
+class StringPool:
+    """ 驻留字符串：相同的字符串只保存一份，列中保存 id """
+    __slots__ = ("strings", "ids")
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        found = self.ids.get(value)
+        if found is None:
+            found = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return found
+
+    def nbytes(self) -> int:
+        return (sys.getsizeof(self.strings) + sys.getsizeof(self.ids)
+                + sum(sys.getsizeof(value) for value in self.strings))
+
+
+class Column:
+    """ 一个字段的列；set 返回 False 表示类型不符，值放到 extras """
+    __slots__ = ("name", "bit")
+
+    def __init__(self, name: str, bit: int):
+        self.name = name
+        self.bit = bit
+
+    def append(self, count: int) -> None:
+        raise NotImplementedError
+
+    def set(self, row: int, value: Any) -> bool:
+        raise NotImplementedError
+
+    def clear(self, row: int) -> None:
+        pass
+
+    def get(self, row: int) -> Any:
+        raise NotImplementedError
+
+    def nbytes(self) -> int:
+        raise NotImplementedError
+
+
+class FloatColumn(Column):
+    """ 数值列；范围查询用按值排序的索引（第一次查询时建立，写入后失效） """
+    __slots__ = ("values", "_order", "_sorted")
+
+    def __init__(self, name: str, bit: int):
+        super().__init__(name, bit)
+        self.values = array("d")
+        self._order: Optional[array] = None
+        self._sorted: Optional[array] = None
+
+    def append(self, count: int) -> None:
+        self.values.extend(array("d", [NAN]) * count)
+
+    def set(self, row: int, value: Any) -> bool:
+        # int 也放在这一列中（范围过滤才能包括它），由 ColumnarStore 的 ints 位图记录原来是 int
+        if type(value) is not float and (type(value) is not int or not -2 ** 53 <= value <= 2 ** 53):
+            return False
+        self.values[row] = value
+        self._order = None
+        return True
+
+    def clear(self, row: int) -> None:
+        self.values[row] = NAN
+        self._order = None
+
+    def get(self, row: int) -> float:
+        return self.values[row]
+
+    def _build(self) -> None:
+        """ 不是 NaN 的行按值排序：_order 是行号，_sorted 是对应的值 """
+        values = self.values
+        if numpy is not None:
+            data = numpy.frombuffer(values, dtype=numpy.float64)
+            order = numpy.argsort(data, kind="stable")
+            order = order[~numpy.isnan(data[order])]
+            self._order = array("I", order.astype(numpy.uint32).tobytes())
+            self._sorted = array("d", data[order].tobytes())
+        else:
+            # value == value 排除 NaN（None、没有提供、已删除的行）
+            order = sorted((row for row, value in enumerate(values) if value == value), key=values.__getitem__)
+            self._order = array("I", order)
+            self._sorted = array("d", map(values.__getitem__, order))
+
+    def range(self, low: Optional[float], high: Optional[float]) -> List[int]:
+        """ 值在 [low, high] 中的行号（按行号排序），某一端为 None 表示不限 """
+        if self._order is None:
+            self._build()
+        start = bisect_left(self._sorted, low) if low is not None else 0
+        end = bisect_right(self._sorted, high) if high is not None else len(self._sorted)
+        return sorted(self._order[start:end])
+
+    def nbytes(self) -> int:
+        arrays = (self.values,) if self._order is None else (self.values, self._order, self._sorted)
+        return sum(values.buffer_info()[1] * values.itemsize for values in arrays)
+
+
+class StrColumn(Column):
+    __slots__ = ("ids", "pool")
+
+    def __init__(self, name: str, bit: int, pool: StringPool):
+        super().__init__(name, bit)
+        self.ids = array("I")
+        self.pool = pool
+
+    def append(self, count: int) -> None:
+        self.ids.extend(array("I", [NONE_ID]) * count)
+
+    def set(self, row: int, value: Any) -> bool:
+        if type(value) is not str:
+            return False
+        self.ids[row] = self.pool.intern(value)
+        return True
+
+    def clear(self, row: int) -> None:
+        self.ids[row] = NONE_ID
+
+    def get(self, row: int) -> str:
+        return self.pool.strings[self.ids[row]]
+
+    def nbytes(self) -> int:
+        return self.ids.buffer_info()[1] * self.ids.itemsize
+
+
+class StrListColumn(Column):
+    """ 字符串列表：所有行的 id 连续放在 items 中，每行记录起点和长度；修改过的行留下的空洞超过一半时整理 """
+    __slots__ = ("starts", "lengths", "items", "pool", "used")
+
+    def __init__(self, name: str, bit: int, pool: StringPool):
+        super().__init__(name, bit)
+        self.starts = array("I")
+        self.lengths = array("H")
+        self.items = array("I")
+        self.pool = pool
+        self.used = 0
+
+    def append(self, count: int) -> None:
+        self.starts.extend(array("I", [0]) * count)
+        self.lengths.extend(array("H", [0]) * count)
+
+    def set(self, row: int, value: Any) -> bool:
+        if type(value) is not list or len(value) > 0xFFFF or not all(type(item) is str for item in value):
+            return False
+        self.clear(row)
+        if len(self.items) > 1024 and self.used * 2 < len(self.items):
+            self._compact()
+        intern = self.pool.intern
+        self.starts[row] = len(self.items)
+        self.lengths[row] = len(value)
+        self.items.extend(intern(item) for item in value)
+        self.used += len(value)
+        return True
+
+    def clear(self, row: int) -> None:
+        self.used -= self.lengths[row]
+        self.lengths[row] = 0
+
+    def _compact(self) -> None:
+        items, starts, lengths = array("I"), self.starts, self.lengths
+        for row in range(len(starts)):
+            start, length = starts[row], lengths[row]
+            starts[row] = len(items)
+            items.extend(self.items[start:start + length])
+        self.items = items
+
+    def ids(self, row: int) -> array:
+        start = self.starts[row]
+        return self.items[start:start + self.lengths[row]]
+
+    def get(self, row: int) -> List[str]:
+        strings = self.pool.strings
+        return [strings[index] for index in self.ids(row)]
+
+    def nbytes(self) -> int:
+        return sum(values.buffer_info()[1] * values.itemsize for values in (self.starts, self.lengths, self.items))
+
+
+Condition = Union[Tuple[Optional[float], Optional[float]], str, int, float]
+
+
+class ColumnarRow(Mapping):
+    """ 一行的只读视图，取字段时才从列中解码 """
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "ColumnarStore", row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def key(self) -> str:
+        return self._store.row_keys[self._row]
+
+    def __getitem__(self, field: str) -> Any:
+        return self._store.field(self._row, field)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.fields(self._row))
+
+    def __len__(self) -> int:
+        return len(self._store.fields(self._row))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._store.row_dict(self._row)
+
+    def __repr__(self) -> str:
+        return f"ColumnarRow({self.key!r}, {self.to_dict()!r})"
+
+
+class ColumnarStore(ItemStore):
+    def __init__(self):
+        self.pool = StringPool()
+        self.columns: Dict[str, Column] = {}
+        self.present = array("I")
+        self.nones = array("I")
+        self.ints = array("I")
+        self.extras: Dict[int, Dict[str, Any]] = {}
+        self.keys: Dict[str, int] = {}
+        self.row_keys: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._sorted: Optional[List[str]] = None
+        # (字段名, 位, 取值函数)，还原 dict 时按这个顺序
+        self._layout: List[Tuple[str, int, Callable[[int], Any]]] = []
+
+    # ---------------- 行 ----------------
+    def _column(self, field: str, value: Any) -> Optional[Column]:
+        column = self.columns.get(field)
+        if column is not None or value is None or len(self.columns) >= MAX_COLUMNS:
+            return column
+        bit = 1 << len(self.columns)
+        kind = type(value)
+        if kind is float or kind is int:
+            column = FloatColumn(field, bit)
+        elif kind is str:
+            column = StrColumn(field, bit, self.pool)
+        elif kind is list and all(type(item) is str for item in value):
+            column = StrListColumn(field, bit, self.pool)
+        else:
+            return None
+        column.append(len(self.row_keys))
+        self.columns[field] = column
+        self._layout.append((field, bit, column.get))
+        return column
+
+    def _allocate(self, key: str) -> int:
+        if self._free:
+            row = self._free.pop()
+            self.row_keys[row] = key
+        else:
+            row = len(self.row_keys)
+            self.row_keys.append(key)
+            self.present.append(0)
+            self.nones.append(0)
+            self.ints.append(0)
+            for column in self.columns.values():
+                column.append(1)
+        self.keys[key] = row
+        self._sorted = None
+        return row
+
+    def _clear(self, row: int) -> None:
+        present = self.present[row]
+        for column in self.columns.values():
+            if present & column.bit:
+                column.clear(row)
+        self.present[row] = 0
+        self.nones[row] = 0
+        self.ints[row] = 0
+        self.extras.pop(row, None)
+
+    def _write(self, row: int, value: Dict[str, Any]) -> None:
+        self._clear(row)
+        present, nones, ints, extras = ALIVE, 0, 0, None
+        for field, item in value.items():
+            column = self._column(field, item)
+            if column is not None and item is None:
+                present |= column.bit
+                nones |= column.bit
+            elif column is not None and column.set(row, item):
+                present |= column.bit
+                if type(item) is int and type(column) is FloatColumn:
+                    ints |= column.bit
+            else:
+                if extras is None:
+                    extras = self.extras[row] = {}
+                extras[field] = item
+        self.present[row] = present
+        self.nones[row] = nones
+        self.ints[row] = ints
+
+    def field(self, row: int, field: str) -> Any:
+        column = self.columns.get(field)
+        if column is not None and self.present[row] & column.bit:
+            if self.nones[row] & column.bit:
+                return None
+            return int(column.get(row)) if self.ints[row] & column.bit else column.get(row)
+        extras = self.extras.get(row)
+        if extras is None or field not in extras:
+            raise KeyError(field)
+        return extras[field]
+
+    def fields(self, row: int) -> List[str]:
+        present = self.present[row]
+        names = [column.name for column in self.columns.values() if present & column.bit]
+        if row in self.extras:
+            names.extend(self.extras[row])
+        return names
+
+    def row_dict(self, row: int) -> Dict[str, Any]:
+        present, nones, ints = self.present[row], self.nones[row], self.ints[row]
+        data = {}
+        for name, bit, get in self._layout:
+            if present & bit:
+                if nones & bit:
+                    data[name] = None
+                elif ints & bit:
+                    data[name] = int(get(row))
+                else:
+                    data[name] = get(row)
+        if row in self.extras:
+            data.update(self.extras[row])
+        return data
+
+    def row(self, key: str) -> Optional[ColumnarRow]:
+        row = self.keys.get(key)
+        return ColumnarRow(self, row) if row is not None else None
+
+    # ---------------- ItemStore ----------------
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.keys.get(key)
+        return self.row_dict(row) if row is not None else None
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        rows = self.keys
+        return {key: self.row_dict(rows[key]) for key in keys if key in rows}
+
+    async def contains(self, key: str) -> bool:
+        return key in self.keys
+
+    async def put_many(self, values: Dict[str, Dict[str, Any]]) -> None:
+        for key, value in values.items():
+            row = self.keys.get(key)
+            self._write(self._allocate(key) if row is None else row, value)
+
+    async def delete(self, key: str) -> None:
+        row = self.keys.pop(key, None)
+        if row is not None:
+            self._clear(row)
+            self.row_keys[row] = None
+            self._free.append(row)
+            self._sorted = None
+
+    async def seed(self, values: Dict[str, Dict[str, Any]]) -> None:
+        for key, value in values.items():
+            if key not in self.keys:
+                self._write(self._allocate(key), value)
+
+    async def page(
+        self, after: Optional[str] = None, before: Optional[str] = None, limit: int = 10
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        if self._sorted is None:
+            self._sorted = sorted(self.keys)
+        keys = self._sorted
+        if before is not None:
+            end = bisect_left(keys, before)
+            selected = keys[max(end - limit, 0):end]
+        else:
+            start = bisect_right(keys, after) if after is not None else 0
+            selected = keys[start:start + limit]
+        return [(key, self.row_dict(self.keys[key])) for key in selected]
+
+    # ---------------- 过滤 ----------------
+    def _matches(self, column: Column, condition: Condition, rows: Optional[List[int]]) -> List[int]:
+        """ 满足一个条件的行号（rows 不为空时只在这些行中找）；返回的行还要再检查 present / none 位 """
+        if isinstance(column, StrListColumn):
+            target = self.pool.ids.get(condition)
+            if target is None:
+                return []
+            candidates = rows if rows is not None else range(len(self.row_keys))
+            return [row for row in candidates if target in column.ids(row)]
+        if isinstance(column, StrColumn):
+            target = self.pool.ids.get(condition)
+            if target is None:
+                return []
+            ids = column.ids
+            if rows is not None:
+                return [row for row in rows if ids[row] == target]
+            return list(compress(range(len(ids)), map(target.__eq__, ids)))
+        low, high = condition if isinstance(condition, tuple) else (condition, condition)
+        if rows is None:
+            return column.range(low, high)
+        values = column.values
+        return [row for row in rows if (low is None or low <= values[row]) and (high is None or values[row] <= high)]
+
+    @staticmethod
+    def _check(field: str, column: Column, condition: Any) -> None:
+        """ 条件的类型与列不符时抛出 ValueError（否则数值列会和字符串比较） """
+        if isinstance(column, FloatColumn):
+            bounds = condition if isinstance(condition, tuple) else (condition,)
+            if isinstance(condition, tuple) and len(condition) != 2 or not all(
+                bound is None and isinstance(condition, tuple) or type(bound) in (int, float) for bound in bounds
+            ):
+                raise ValueError(f"{field} 是数值列，条件应为数值或 (low, high)：{condition!r}")
+        elif type(condition) is not str:
+            raise ValueError(f"{field} 是字符串列，条件应为字符串：{condition!r}")
+
+    def _cost(self, field: str) -> int:
+        column = self.columns.get(field)
+        return 0 if isinstance(column, FloatColumn) else 2 if isinstance(column, StrListColumn) else 1
+
+    def select(self, limit: Optional[int] = None, **conditions: Condition) -> List[ColumnarRow]:
+        """
+        按列过滤，返回满足所有条件的行（按行号顺序：delete 空出的行号会被之后写入的 key 复用，所以不是写入顺序）：
+            price=(10, 50) 闭区间范围，某一端为 None 表示不限；price=50.2 / name="Foo" 相等；tags="rock" 列表中包含
+        值为 None、没有提供、类型不符（放在 extras 中）的字段不满足任何条件；条件中的字段不存在时返回空列表；
+        条件的类型与列不符（例如 price="Foo"）时抛出 ValueError
+        """
+        for field, condition in conditions.items():
+            column = self.columns.get(field)
+            if column is not None:
+                self._check(field, column, condition)
+        rows: Optional[List[int]] = None
+        bits = ALIVE
+        # 先算数值范围（用索引，通常结果最少），再在结果中检查字符串、列表条件
+        for field, condition in sorted(conditions.items(), key=lambda item: self._cost(item[0])):
+            column = self.columns.get(field)
+            if column is None:
+                return []
+            rows = self._matches(column, condition, rows)
+            bits |= column.bit
+            if not rows:
+                return []
+        if rows is None:
+            rows = range(len(self.row_keys))
+        present, nones = self.present, self.nones
+        selected = []
+        for row in rows:
+            if present[row] & bits == bits and not nones[row] & bits:
+                selected.append(ColumnarRow(self, row))
+                if limit is not None and len(selected) >= limit:
+                    break
+        return selected
+
+    # ---------------- 内存 ----------------
+    def memory_report(self, sample: int = 1000) -> Dict[str, float]:
+        """
+        每条记录的字节数：columnar 包括列、位图、字符串池、extras 和 key 索引；
+        dict 是把前 sample 条记录还原成 dict（每条记录有自己的字符串、float 对象，与 JSON 解码得到的相同）后按比例估算，也包括 key 索引
+        """
+        records = len(self.keys)
+        if not records:
+            return {"records": 0, "columnar_bytes_per_record": 0.0, "dict_bytes_per_record": 0.0, "ratio": 0.0}
+        index = sys.getsizeof(self.keys) + sum(sys.getsizeof(key) for key in self.keys)
+        columnar = (
+            sum(column.nbytes() for column in self.columns.values())
+            + sum(values.buffer_info()[1] * values.itemsize for values in (self.present, self.nones, self.ints))
+            + self.pool.nbytes() + sys.getsizeof(self.row_keys) + _deep_sizeof(self.extras) + index
+        )
+        sampled = [self.row_dict(row) for row in list(self.keys.values())[:sample]]
+        per_dict = sum(_deep_sizeof(_unshared(value)) for value in sampled) / len(sampled)
+        return {
+            "records": records,
+            "columnar_bytes_per_record": columnar / records,
+            "dict_bytes_per_record": per_dict + index / records,
+            "ratio": (per_dict + index / records) / (columnar / records),
+        }
+
+
+def _unshared(value: Any) -> Any:
+    """ 复制出不共享的字符串（与 JSON 解码、请求体解析得到的一样，每条记录有自己的字符串对象） """
+    if isinstance(value, str):
+        return "".join(list(value)) if len(value) > 1 else value
+    if isinstance(value, list):
+        return [_unshared(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _unshared(item) for key, item in value.items()}
+    return value
+
+
+def _deep_sizeof(value: Any) -> int:
+    """ 容器和其中值的大小；dict 的 key（字段名）是所有记录共享的，不计算 """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_sizeof(item) for item in value.values())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_sizeof(item) for item in value)
+    return size
@@ -0,0 +1,364 @@
+"""
+响应压缩（gzip / br / zstd）
+create_offer（嵌套的 Offer）、read_items6 这类接口返回的 JSON 都是原样发送的，内容高度重复（字段名、url 前缀），压缩后通常只有 10%~20%；
+Starlette 的 GZipMiddleware 只支持 gzip，而且在事件循环中同步压缩，大响应体会阻塞其他请求，相同的响应每次都要重新压缩。
+
+CompressionMiddleware 的处理方式：
+    1、按 Accept-Encoding（考虑 q 值）在可用的算法中选择：br（需要安装 brotli）> zstd（需要安装 zstandard）> gzip
+    2、小于 minimum_size 的响应、已经带 Content-Encoding 的响应（如 core.openapi 预先压缩好的文档）、
+       图片 / 压缩包等不可压缩的类型、文件零拷贝发送（http.response.zerocopysend）都原样发送
+    3、完整响应体大于 thread_size 时放到线程池中压缩（zlib / brotli / zstd 压缩时都会释放 GIL），不阻塞事件循环
+    4、GET 请求、状态码 200、不带 Set-Cookie、Cache-Control 没有 no-store / private 的响应，压缩结果按 (算法, 级别, 响应体摘要) 缓存，
+       相同的响应体（例如同一个 read_items6 查询）直接复用；缓存按总字节数 LRU 淘汰。
+       摘要用 hash()（SipHash，每个进程随机密钥，无法构造碰撞）+ 长度：216KB 的 create_offer 响应约 0.08ms，gzip:6 压缩约 1ms
+    5、流式响应（core.streaming 的 JSON 数组 / NDJSON）逐块压缩并 flush，客户端仍然能边收边解析
+    6、压缩后的响应去掉 Content-Length（完整响应体时重新计算），强 ETag 加上算法后缀，并添加 Vary: Accept-Encoding；
+       请求的 If-None-Match 中带当前算法后缀的 ETag 先还原成原始 ETag 再交给应用，304 响应的 ETag 再加回后缀。
+       If-Range 不还原：压缩后的字节和原文件的区间对不上，带后缀时按不匹配处理，返回整个响应
+配置：COMPRESS_MIN_SIZE=1024，COMPRESS_THREAD_SIZE=262144，COMPRESS_CACHE_BYTES=16777216，
+      COMPRESS_LEVELS=gzip:6,br:4,zstd:3（各算法级别的取舍见 python -m benchmarks.compression）
+用法：
+    install_compression(app)
+"""
+import os
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import anyio
+from fastapi import FastAPI
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+THREAD_SIZE = int(os.environ.get("COMPRESS_THREAD_SIZE", 256 * 1024))
+CACHE_BYTES = int(os.environ.get("COMPRESS_CACHE_BYTES", 16 * 1024 * 1024))
+DEFAULT_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
+# 可压缩的 Content-Type
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "application/problem+", "image/svg+xml")
+
+
+class Codec:
+    """ 一种压缩算法：一次性压缩，以及流式响应用的逐块压缩 """
+    name = ""
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        raise NotImplementedError
+
+    def compressor(self, level: int) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+        """ 返回 (压缩一块并 flush, 结束) 两个函数 """
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def compressor(self, level: int):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return (lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data, 47)
+
+
+class BrotliCodec(Codec):
+    name = "br"
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return brotli.compress(data, quality=level)
+
+    def compressor(self, level: int):
+        compressor = brotli.Compressor(quality=level)
+        return (lambda data: compressor.process(data) + compressor.flush()), compressor.finish
+
+    def decompress(self, data: bytes) -> bytes:
+        return brotli.decompress(data)
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    def compressor(self, level: int):
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return ((lambda data: compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)),
+                compressor.flush)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=1 << 30)
+
+
+# 按优先级排列
+CODECS: Dict[str, Codec] = {}
+if brotli is not None:
+    CODECS["br"] = BrotliCodec()
+if zstandard is not None:
+    CODECS["zstd"] = ZstdCodec()
+CODECS["gzip"] = GzipCodec()
+
+
+def parse_levels(value: Optional[str]) -> Dict[str, int]:
+    levels = dict(DEFAULT_LEVELS)
+    for part in (value or "").split(","):
+        name, _, level = part.partition(":")
+        if name.strip() and level.strip():
+            levels[name.strip()] = int(level)
+    return levels
+
+
+def negotiate(accept_encoding: str, encodings) -> str:
+    """ 按 Accept-Encoding（考虑 q=0）在 encodings 中选出第一个可接受的，都不接受时返回 identity """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.split(";")[0].endswith("+json")
+
+
+class CompressedCache:
+    """ 压缩结果的 LRU 缓存，按压缩后的总字节数限制大小 """
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, int, int, int], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(encoding: str, level: int, body: bytes) -> Tuple[str, int, int, int]:
+        return encoding, level, hash(body), len(body)
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Tuple, value: bytes) -> None:
+        if len(value) > self.max_bytes // 4 or key in self._entries:
+            return
+        self._entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def report(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+
+compressed_cache = CompressedCache()
+
+
+def strip_etag_suffix(scope: Scope, encoding: str) -> Optional[Scope]:
+    """ If-None-Match 中的 "<etag>-<encoding>" 还原为 "<etag>"，返回新的 scope；没有带后缀的 ETag 时返回 None """
+    suffix = f'-{encoding}"'.encode()
+    headers = scope["headers"]
+    for index, (name, value) in enumerate(headers):
+        if name != b"if-none-match" or suffix not in value:
+            continue
+        tags = [tag.strip() for tag in value.split(b",")]
+        tags = [tag[:-len(suffix)] + b'"' if tag.endswith(suffix) else tag for tag in tags]
+        headers = list(headers)
+        headers[index] = (name, b", ".join(tags))
+        return {**scope, "headers": headers}
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = MIN_SIZE, thread_size: int = THREAD_SIZE,
+                 levels: Optional[Dict[str, int]] = None, cache: Optional[CompressedCache] = compressed_cache):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_size = thread_size
+        self.levels = levels or parse_levels(os.environ.get("COMPRESS_LEVELS"))
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), CODECS)
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(self, scope, encoding, send)
+        revalidate_scope = strip_etag_suffix(scope, encoding)
+        if revalidate_scope is not None:
+            responder.revalidating = True
+            scope = revalidate_scope
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """ 一个响应的压缩过程：先保留 http.response.start，看到第一块响应体后决定是否压缩 """
+
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, encoding: str, send: Send):
+        self.middleware = middleware
+        self.codec = CODECS[encoding]
+        self.level = middleware.levels.get(encoding, DEFAULT_LEVELS[encoding])
+        self.cacheable_request = scope["method"] == "GET"
+        self._send = send
+        self.start: Optional[Message] = None
+        self.state = "start"    # start -> 等待第一块响应体；passthrough / stream -> 已经决定
+        self.chunk: Optional[Callable[[bytes], bytes]] = None
+        self.finish: Optional[Callable[[], bytes]] = None
+        # 请求的 If-None-Match 带当前算法后缀（已经还原），304 响应要把后缀加回去
+        self.revalidating = False
+
+    def _should_compress(self, headers: Headers) -> bool:
+        return ("content-encoding" not in headers
+                and is_compressible(headers.get("content-type", ""))
+                and self.start["status"] not in (204, 206, 304))
+
+    def _cacheable(self, headers: Headers) -> bool:
+        cache_control = headers.get("cache-control", "").lower()
+        return (self.cacheable_request and self.start["status"] == 200 and "set-cookie" not in headers
+                and "no-store" not in cache_control and "private" not in cache_control)
+
+    def _compressed_headers(self) -> MutableHeaders:
+        # 复制一份，不修改 Response 对象自己的 raw_headers
+        headers = MutableHeaders(raw=list(self.start["headers"]))
+        self.start = {**self.start, "headers": headers.raw}
+        headers["content-encoding"] = self.codec.name
+        vary = headers.get("vary")
+        if not vary:
+            headers["vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower():
+            headers["vary"] = vary + ", Accept-Encoding"
+        self._suffix_etag(headers)
+        return headers
+
+    def _suffix_etag(self, headers: MutableHeaders) -> None:
+        etag = headers.get("etag")
+        if etag and etag.endswith('"') and not etag.startswith("W/"):
+            headers["etag"] = f'{etag[:-1]}-{self.codec.name}"'
+
+    def _not_modified_start(self) -> Message:
+        headers = MutableHeaders(raw=list(self.start["headers"]))
+        self._suffix_etag(headers)
+        return {**self.start, "headers": headers.raw}
+
+    async def _compress(self, body: bytes) -> bytes:
+        if len(body) >= self.middleware.thread_size:
+            return await anyio.to_thread.run_sync(self.codec.compress, body, self.level)
+        return self.codec.compress(body, self.level)
+
+    async def _send_whole(self, body: bytes) -> None:
+        headers = Headers(raw=self.start["headers"])
+        if len(body) < self.middleware.minimum_size or not self._should_compress(headers):
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        cache = self.middleware.cache if self._cacheable(headers) else None
+        compressed = None
+        if cache is not None:
+            key = cache.key(self.codec.name, self.level, body)
+            compressed = cache.get(key)
+        if compressed is None:
+            compressed = await self._compress(body)
+            if cache is not None:
+                cache.set(key, compressed)
+        if len(compressed) >= len(body):
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        out_headers = self._compressed_headers()
+        out_headers["content-length"] = str(len(compressed))
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _start_stream(self, message: Message) -> None:
+        headers = Headers(raw=self.start["headers"])
+        if not self._should_compress(headers):
+            self.state = "passthrough"
+            await self._send(self.start)
+            await self._send(message)
+            return
+        self.state = "stream"
+        out_headers = self._compressed_headers()
+        del out_headers["content-length"]
+        self.chunk, self.finish = self.codec.compressor(self.level)
+        await self._send(self.start)
+        await self._send_chunk(message)
+
+    async def _send_chunk(self, message: Message) -> None:
+        body = message.get("body", b"")
+        if len(body) >= self.middleware.thread_size:
+            data = await anyio.to_thread.run_sync(self.chunk, body)
+        else:
+            data = self.chunk(body) if body else b""
+        more_body = message.get("more_body", False)
+        if not more_body:
+            data += self.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start = message
+            if self.revalidating and message["status"] == 304:
+                self.start = self._not_modified_start()
+        elif self.state == "start":
+            if message_type != "http.response.body":
+                # 零拷贝发送文件等扩展消息：不压缩
+                self.state = "passthrough"
+                await self._send(self.start)
+                await self._send(message)
+            elif not message.get("more_body", False):
+                self.state = "passthrough"
+                await self._send_whole(message.get("body", b""))
+            else:
+                await self._start_stream(message)
+        elif self.state == "stream" and message_type == "http.response.body":
+            await self._send_chunk(message)
+        else:
+            await self._send(message)
+
+
+def install_compression(app: FastAPI, **options) -> None:
+    """ 给 app 添加 CompressionMiddleware；在 install_metrics 之后调用时，/metrics 中统计的是压缩前的响应大小 """
+    app.add_middleware(CompressionMiddleware, **options)
@@ -0,0 +1,320 @@
+"""
+带类型分派缓存的 jsonable_encoder
+fastapi.encoders.jsonable_encoder 每处理一个值都要走一遍 isinstance 链（BaseModel、dataclass、Enum、PurePath、str/int/float、dict、list...），
+嵌套模型（Offer -> Item -> Image）会在 model_dump 之后再把得到的 dict 完整递归一遍。
+
+这里的 jsonable_encoder 和 FastAPI 的参数、输出完全一致（benchmarks/encoders.py 会逐一对比），区别在于：
+    1、每个类型第一次出现时确定它的编码函数，之后按 type(obj) 直接查表
+    2、pydantic 模型的 model_dump(mode="json") 结果已经是 JSON 兼容的，只需要处理 _sa 前缀和 None，
+       如果模型（包括嵌套模型）里没有 dict / Any 这类能产生任意 key 的字段，连这一步也可以省掉
+    3、传入 custom_encoder 时直接交给 FastAPI 的实现
+Config.json_encoders 由 pydantic 的 model_dump 处理，所以 Item.Config 中的 datetime 格式同样生效。
+"""
+import dataclasses
+import typing
+from collections import deque
+from enum import Enum
+from pathlib import PurePath
+from types import GeneratorType
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import encoders as fastapi_encoders
+from fastapi._compat import UndefinedType
+from pydantic import BaseModel, PlainSerializer, WrapSerializer
+
+_SERIALIZER_TYPES = (PlainSerializer, WrapSerializer)
+_LIST_TYPES = (list, set, frozenset, GeneratorType, tuple, deque)
+_SCALAR_TYPES = (str, int, float, type(None))
+
+
+class _Options:
+    __slots__ = ("include", "exclude", "by_alias", "exclude_unset", "exclude_defaults", "exclude_none",
+                 "sqlalchemy_safe", "_for_values")
+
+    def __init__(self, include=None, exclude=None, by_alias=True, exclude_unset=False, exclude_defaults=False,
+                 exclude_none=False, sqlalchemy_safe=True):
+        self.include = include
+        self.exclude = exclude
+        self.by_alias = by_alias
+        self.exclude_unset = exclude_unset
+        self.exclude_defaults = exclude_defaults
+        self.exclude_none = exclude_none
+        self.sqlalchemy_safe = sqlalchemy_safe
+        self._for_values = None
+
+    @property
+    def for_values(self) -> "_Options":
+        """ FastAPI 编码 dict 的 key/value 时不会继续传 include、exclude、exclude_defaults """
+        if self._for_values is None:
+            if self.include is None and self.exclude is None and not self.exclude_defaults:
+                self._for_values = self
+            else:
+                self._for_values = _get_options(None, None, self.by_alias, self.exclude_unset, False,
+                                                self.exclude_none, self.sqlalchemy_safe)
+        return self._for_values
+
+
+_options_cache: Dict[tuple, _Options] = {}
+
+
+def _get_options(include, exclude, by_alias, exclude_unset, exclude_defaults, exclude_none, sqlalchemy_safe):
+    if include is not None or exclude is not None:
+        # include / exclude 可能是 dict，不缓存
+        return _Options(include, exclude, by_alias, exclude_unset, exclude_defaults, exclude_none, sqlalchemy_safe)
+    key = (by_alias, exclude_unset, exclude_defaults, exclude_none, sqlalchemy_safe)
+    options = _options_cache.get(key)
+    if options is None:
+        options = _options_cache[key] = _Options(None, None, *key)
+    return options
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# 模型结构分析：model_dump(mode="json") 的结果里是否可能出现任意 key 的 dict
+# ---------------------------------------------------------------------------------------------------------------------
+_closed_models: Dict[type, bool] = {}
+
+
+def _annotation_is_closed(annotation: Any, seen: set) -> bool:
+    if annotation is Any or annotation is object:
+        return False
+    origin = typing.get_origin(annotation)
+    if origin is typing.Annotated:
+        inner, *metadata = typing.get_args(annotation)
+        if any(isinstance(item, _SERIALIZER_TYPES) for item in metadata):
+            return False
+        return _annotation_is_closed(inner, seen)
+    if origin is typing.Literal:
+        return True
+    if origin is not None:
+        if isinstance(origin, type) and issubclass(origin, (dict, typing.Mapping)):
+            return False
+        return all(_annotation_is_closed(arg, seen) for arg in typing.get_args(annotation) if arg is not Ellipsis)
+    if not isinstance(annotation, type):
+        return False
+    if issubclass(annotation, BaseModel):
+        return _check_model(annotation, seen)
+    if issubclass(annotation, dict) or dataclasses.is_dataclass(annotation):
+        return False
+    return True
+
+
+def _model_is_closed(model: type) -> bool:
+    closed = _closed_models.get(model)
+    if closed is None:
+        closed = _closed_models[model] = _check_model(model, set())
+    return closed
+
+
+def _check_model(model: type, seen: set) -> bool:
+    if model in seen:
+        # 循环引用，结果由其余字段决定
+        return True
+    seen.add(model)
+    decorators = model.__pydantic_decorators__
+    # 自定义序列化（json_encoders、field_serializer、computed_field 等）可能返回任意结构，保守处理
+    if (
+        model.__pydantic_root_model__
+        or model.model_config.get("json_encoders")
+        or model.model_computed_fields
+        or decorators.field_serializers
+        or decorators.model_serializers
+    ):
+        return False
+    return all(
+        not any(key and key.startswith("_sa") for key in (name, field.alias, field.serialization_alias))
+        and not any(isinstance(item, _SERIALIZER_TYPES) for item in field.metadata)
+        and _annotation_is_closed(field.annotation, seen)
+        for name, field in model.model_fields.items()
+    )
+
+
+def _clean_json(value: Any, exclude_none: bool, sqlalchemy_safe: bool) -> Any:
+    """ 对 model_dump(mode="json") 的结果做 FastAPI 的二次处理：去掉 _sa 开头的 key 和（可选）值为 None 的项 """
+    value_type = type(value)
+    if value_type is dict:
+        return {
+            key: _clean_json(item, exclude_none, sqlalchemy_safe)
+            for key, item in value.items()
+            if (item is not None or not exclude_none)
+            and (not sqlalchemy_safe or not isinstance(key, str) or not key.startswith("_sa"))
+        }
+    if value_type is list:
+        return [_clean_json(item, exclude_none, sqlalchemy_safe) for item in value]
+    return value
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# 各类型的编码函数，签名统一为 (obj, options)
+# ---------------------------------------------------------------------------------------------------------------------
+def _encode_model(obj: BaseModel, options: _Options) -> Any:
+    obj_dict = obj.model_dump(
+        mode="json",
+        include=options.include,
+        exclude=options.exclude,
+        by_alias=options.by_alias,
+        exclude_unset=options.exclude_unset,
+        exclude_none=options.exclude_none,
+        exclude_defaults=options.exclude_defaults,
+    )
+    if "__root__" in obj_dict:
+        obj_dict = obj_dict["__root__"]
+    if _model_is_closed(type(obj)):
+        return obj_dict
+    return _clean_json(obj_dict, options.exclude_none, options.sqlalchemy_safe)
+
+
+def _encode_dataclass(obj: Any, options: _Options) -> Any:
+    return _encode_dict(dataclasses.asdict(obj), options)
+
+
+def _encode_identity(obj: Any, options: _Options) -> Any:
+    return obj
+
+
+def _encode_enum(obj: Enum, options: _Options) -> Any:
+    return obj.value
+
+
+def _encode_str(obj: Any, options: _Options) -> Any:
+    return str(obj)
+
+
+def _encode_undefined(obj: Any, options: _Options) -> Any:
+    return None
+
+
+def _encode_dict(obj: dict, options: _Options) -> Any:
+    include, exclude = options.include, options.exclude
+    if include is not None or exclude is not None:
+        allowed_keys = set(obj.keys())
+        if include is not None:
+            allowed_keys &= set(include)
+        if exclude is not None:
+            allowed_keys -= set(exclude)
+    else:
+        allowed_keys = None
+
+    child = options.for_values
+    exclude_none = options.exclude_none
+    sqlalchemy_safe = options.sqlalchemy_safe
+    encoded = {}
+    for key, value in obj.items():
+        if exclude_none and value is None:
+            continue
+        if sqlalchemy_safe and isinstance(key, str) and key.startswith("_sa"):
+            continue
+        if allowed_keys is not None and key not in allowed_keys:
+            continue
+        key_type = type(key)
+        if key_type is not str:
+            key = _get_encoder(key_type)(key, child)
+        value_type = type(value)
+        if value_type is not str and value_type is not int and value_type is not float and value is not None:
+            value = _get_encoder(value_type)(value, child)
+        encoded[key] = value
+    return encoded
+
+
+def _encode_list(obj: Any, options: _Options) -> Any:
+    encoded = []
+    append = encoded.append
+    for item in obj:
+        item_type = type(item)
+        if item_type is str or item_type is int or item_type is float or item is None:
+            append(item)
+        else:
+            append(_get_encoder(item_type)(item, options))
+    return encoded
+
+
+def _wrap_plain(encoder: Callable[[Any], Any]) -> Callable[[Any, _Options], Any]:
+    def encode(obj: Any, options: _Options) -> Any:
+        return encoder(obj)
+    return encode
+
+
+def _encode_fallback(obj: Any, options: _Options) -> Any:
+    try:
+        data = dict(obj)
+    except Exception as e:
+        errors = [e]
+        try:
+            data = vars(obj)
+        except Exception as e:
+            errors.append(e)
+            raise ValueError(errors) from e
+    return _encode_dict(data, options)
+
+
+def _resolve(cls: type) -> Callable[[Any, _Options], Any]:
+    """ 按 FastAPI jsonable_encoder 的判断顺序，为 cls 确定编码函数 """
+    if issubclass(cls, BaseModel):
+        return _encode_model
+    if dataclasses.is_dataclass(cls):
+        return _encode_dataclass
+    if issubclass(cls, Enum):
+        return _encode_enum
+    if issubclass(cls, PurePath):
+        return _encode_str
+    if issubclass(cls, _SCALAR_TYPES):
+        return _encode_identity
+    if issubclass(cls, UndefinedType):
+        return _encode_undefined
+    if issubclass(cls, dict):
+        return _encode_dict
+    if issubclass(cls, _LIST_TYPES):
+        return _encode_list
+    if cls in fastapi_encoders.ENCODERS_BY_TYPE:
+        return _wrap_plain(fastapi_encoders.ENCODERS_BY_TYPE[cls])
+    for encoder, classes_tuple in fastapi_encoders.encoders_by_class_tuples.items():
+        if issubclass(cls, classes_tuple):
+            return _wrap_plain(encoder)
+    return _encode_fallback
+
+
+_encoders: Dict[type, Callable[[Any, _Options], Any]] = {}
+_encoders_version = len(fastapi_encoders.ENCODERS_BY_TYPE)
+
+
+def _get_encoder(cls: type) -> Callable[[Any, _Options], Any]:
+    encoder = _encoders.get(cls)
+    if encoder is None:
+        encoder = _encoders[cls] = _resolve(cls)
+    return encoder
+
+
+def clear_cache() -> None:
+    global _encoders_version
+    _encoders.clear()
+    _closed_models.clear()
+    _encoders_version = len(fastapi_encoders.ENCODERS_BY_TYPE)
+
+
+def jsonable_encoder(
+    obj: Any,
+    include: Any = None,
+    exclude: Any = None,
+    by_alias: bool = True,
+    exclude_unset: bool = False,
+    exclude_defaults: bool = False,
+    exclude_none: bool = False,
+    custom_encoder: Optional[Dict[Any, Callable[[Any], Any]]] = None,
+    sqlalchemy_safe: bool = True,
+) -> Any:
+    """ 与 fastapi.encoders.jsonable_encoder 的参数和输出一致 """
+    if custom_encoder:
+        return fastapi_encoders.jsonable_encoder(
+            obj, include=include, exclude=exclude, by_alias=by_alias, exclude_unset=exclude_unset,
+            exclude_defaults=exclude_defaults, exclude_none=exclude_none, custom_encoder=custom_encoder,
+            sqlalchemy_safe=sqlalchemy_safe,
+        )
+    if len(fastapi_encoders.ENCODERS_BY_TYPE) != _encoders_version:
+        # 有人往 ENCODERS_BY_TYPE 里注册了新的类型
+        clear_cache()
+
+    if include is not None and not isinstance(include, (set, dict)):
+        include = set(include)
+    if exclude is not None and not isinstance(exclude, (set, dict)):
+        exclude = set(exclude)
+    options = _get_options(include, exclude, by_alias, exclude_unset, exclude_defaults, exclude_none, sqlalchemy_safe)
+    return _get_encoder(type(obj))(obj, options)
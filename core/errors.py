@@ -0,0 +1,201 @@
+"""
+错误响应渲染（422 / HTTPException 快速路径）
+handle_errors.py 中的 validation_exception_handler 每次 422 都要 jsonable_encoder({"detail": exc.errors(), "body": exc.body})，
+请求体有多大就原样回显多大、再编码一遍；大量错误请求（客户端 bug、恶意流量）时，错误响应反而比正常响应更耗 CPU。
+
+ErrorRenderer 的处理方式：
+    1、每个错误按 (type, loc, msg, ctx) 缓存预编码好的 JSON 片段，只有 input 需要每次编码（int_parsing、missing 这类错误只是拼接 bytes）
+    2、input 和 body 的回显有上限（max_echo 字节）：超过上限时不编码，输出 {"truncated": true, "size": ...}；
+       body 的大小优先用 Content-Length 判断，不需要先编码再丢弃
+    3、compact 模式：只输出 {"detail": [{"type": ..., "loc": [...]}]}，不回显 msg / input / body，整个响应体按错误签名缓存
+    4、错误数超过 max_errors 时只输出前面的，并带上 "errors_truncated"
+    5、HTTPException 的 detail 是字符串时（如 "Item not found"），响应体按 (状态码, detail) 只编码一次
+配置：ERROR_MODE=default|compact，ERROR_MAX_ECHO=1024，ERROR_MAX_ERRORS=20
+用法：
+    install_error_renderer(app)
+    或在自定义的异常处理器中：return error_renderer.validation_error(request, exc)
+"""
+import json
+import os
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+MEDIA_TYPE = "application/json"
+
+
+def _dumps(value: Any) -> bytes:
+    # 与 JSONResponse.render 的格式一致
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _hashable(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _hashable(v)) for k, v in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+
+
+def _exceeds(value: Any, budget: int) -> bool:
+    """ 估算 value 编码后是否超过 budget 字节，超出预算就提前返回，耗时与 budget 成正比而不是与 value 的大小成正比 """
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (str, bytes)):
+            budget -= len(value) + 2
+        elif isinstance(value, dict):
+            budget -= 2 + len(value)
+            for key, item in value.items():
+                budget -= len(str(key)) + 3
+                stack.append(item)
+                if budget < 0:
+                    return True
+        elif isinstance(value, (list, tuple, set)):
+            budget -= 2 + len(value)
+            if budget < 0:
+                return True
+            stack.extend(value)
+        else:
+            budget -= 8
+        if budget < 0:
+            return True
+    return False
+
+
+class ErrorRenderer:
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        max_echo: Optional[int] = None,
+        max_errors: Optional[int] = None,
+        max_templates: int = 4096,
+    ):
+        self.mode = mode or os.environ.get("ERROR_MODE", "default")
+        if self.mode not in ("default", "compact"):
+            raise ValueError(f"未知的错误渲染模式: {self.mode}")
+        self.max_echo = max_echo if max_echo is not None else int(os.environ.get("ERROR_MAX_ECHO", 1024))
+        self.max_errors = max_errors if max_errors is not None else int(os.environ.get("ERROR_MAX_ERRORS", 20))
+        self.max_templates = max_templates
+        # 错误签名 -> (input 之前的 bytes, input 之后的 bytes)；没有 input 时第二项为 None
+        self._templates: Dict[Hashable, Tuple[bytes, Optional[bytes]]] = {}
+        # compact 模式：整个错误列表的签名 -> 响应体
+        self._compact: Dict[Hashable, bytes] = {}
+        # (状态码, detail) -> 响应体
+        self._http: Dict[Tuple[int, str], bytes] = {}
+
+    # ---------------- 缓存 ----------------
+    def _remember(self, cache: Dict, key: Hashable, value: Any) -> None:
+        # msg 中可能包含用户输入（例如 email 校验），缓存数量有上限，满了就清空重新积累
+        if len(cache) >= self.max_templates:
+            cache.clear()
+        cache[key] = value
+
+    def _template(self, error: Dict[str, Any]) -> Tuple[bytes, Optional[bytes]]:
+        key = tuple((k, _hashable(v)) for k, v in error.items() if k != "input")
+        template = self._templates.get(key)
+        if template is not None:
+            return template
+
+        if "input" not in error:
+            template = (_dumps(jsonable_encoder(error)), None)
+        else:
+            # 用占位值编码一次，再从占位处切开
+            marker = "\x00input\x00"
+            encoded = _dumps(jsonable_encoder({k: (marker if k == "input" else v) for k, v in error.items()}))
+            before, _, after = encoded.partition(_dumps(marker))
+            template = (before, after)
+        self._remember(self._templates, key, template)
+        return template
+
+    # ---------------- 回显 ----------------
+    def _truncated(self, size: Optional[int]) -> bytes:
+        return _dumps({"truncated": True, "size": size})
+
+    def _echo(self, value: Any) -> bytes:
+        """ 编码回显的值，超过 max_echo 字节时输出截断标记；先粗略估算大小，明显过大的值不编码 """
+        if _exceeds(value, self.max_echo):
+            return self._truncated(None)
+        encoded = _dumps(jsonable_encoder(value))
+        if len(encoded) > self.max_echo:
+            return self._truncated(len(encoded))
+        return encoded
+
+    def _echo_body(self, request: Optional[Request], body: Any) -> bytes:
+        if body is None:
+            return b"null"
+        if request is not None:
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_echo:
+                return self._truncated(int(content_length))
+        return self._echo(body)
+
+    # ---------------- 渲染 ----------------
+    def render_errors(self, errors: Sequence[Dict[str, Any]]) -> bytes:
+        parts: List[bytes] = []
+        for error in errors[:self.max_errors]:
+            before, after = self._template(error)
+            if after is None:
+                parts.append(before)
+            else:
+                parts.append(before + self._echo(error["input"]) + after)
+        return b"[" + b",".join(parts) + b"]"
+
+    def validation_error(self, request: Optional[Request], exc: RequestValidationError) -> Response:
+        errors = exc.errors()
+        truncated = len(errors) - self.max_errors
+
+        if self.mode == "compact":
+            key = tuple((e.get("type"), _hashable(e.get("loc"))) for e in errors[:self.max_errors])
+            body = self._compact.get((key, truncated))
+            if body is None:
+                detail = [{"type": e.get("type"), "loc": list(e.get("loc", ()))} for e in errors[:self.max_errors]]
+                payload = {"detail": detail}
+                if truncated > 0:
+                    payload["errors_truncated"] = truncated
+                body = _dumps(jsonable_encoder(payload))
+                self._remember(self._compact, (key, truncated), body)
+            return Response(body, status_code=422, media_type=MEDIA_TYPE)
+
+        body = b'{"detail":' + self.render_errors(errors)
+        if truncated > 0:
+            body += b',"errors_truncated":' + str(truncated).encode()
+        body += b',"body":' + self._echo_body(request, exc.body) + b"}"
+        return Response(body, status_code=422, media_type=MEDIA_TYPE)
+
+    def http_exception(self, exc: StarletteHTTPException) -> Response:
+        headers = getattr(exc, "headers", None)
+        if exc.status_code in (204, 304):
+            return Response(status_code=exc.status_code, headers=headers)
+        if isinstance(exc.detail, str):
+            key = (exc.status_code, exc.detail)
+            body = self._http.get(key)
+            if body is None:
+                body = _dumps({"detail": exc.detail})
+                self._remember(self._http, key, body)
+        else:
+            body = _dumps(jsonable_encoder({"detail": exc.detail}))
+        return Response(body, status_code=exc.status_code, headers=headers, media_type=MEDIA_TYPE)
+
+    # ---------------- 异常处理器 ----------------
+    async def validation_exception_handler(self, request: Request, exc: RequestValidationError) -> Response:
+        return self.validation_error(request, exc)
+
+    async def http_exception_handler(self, request: Request, exc: StarletteHTTPException) -> Response:
+        return self.http_exception(exc)
+
+
+error_renderer = ErrorRenderer()
+
+
+def install_error_renderer(app: FastAPI, renderer: ErrorRenderer = error_renderer) -> None:
+    """ 用 renderer 接管 app 的 422 和 HTTPException 响应 """
+    app.add_exception_handler(RequestValidationError, renderer.validation_exception_handler)
+    app.add_exception_handler(StarletteHTTPException, renderer.http_exception_handler)
@@ -0,0 +1,225 @@
+"""
+同步视图函数的线程池（按路由 / 按 tag 分池、排队上限、耗时统计、内联执行）
+return_int ~ return_pydantic（api_return.py）、read_item（path_params.py）、update_item（jsonable_encoder.py）这类 def 视图函数，
+FastAPI 都用 run_in_threadpool 放到 AnyIO 默认的线程限制器（40 个线程）中执行：
+慢接口会占满线程，其他同步接口跟着排队；排队没有上限，过载时请求越积越多；也看不出时间花在排队还是执行上；
+而 return_int 这种只返回常量的函数，切换线程的开销（约 50us）比函数本身大得多。
+
+ExecutorRoute 在创建路由时把同步视图函数换成异步的包装函数，按以下顺序决定在哪里执行：
+    1、视图函数上的标记：@executors.inline（直接在事件循环中执行）或 @executors.run_in("slow")
+    2、EXECUTOR_ROUTES 中按视图函数名（模块.函数名）或 tag 指定的池，如 "lessons.path_params.read_item=slow,tag:items=io"
+    3、default 池
+每个池是一个 anyio.CapacityLimiter（线程数）+ 排队上限：执行中和排队的请求数达到 threads + queue 时直接返回 503（带 Retry-After），
+不再继续积压；每个池统计排队等待时间和执行时间（/metrics 中的 executor_* 指标）。
+视图函数改为异步后，response_model 的校验和序列化也在事件循环中进行（FastAPI 对同步视图函数会再切换一次线程）。
+同步的依赖函数不经过这里，仍然使用 AnyIO 默认的线程限制器，EXECUTOR_DEFAULT_THREADS 可以调整它的大小（install_executors 中设置）。
+
+配置：EXECUTOR_POOLS="default=40:100,slow=4:8"（池名=线程数:排队上限），EXECUTOR_ROUTES（见上），
+      EXECUTOR_RETRY_AFTER=1（秒），EXECUTOR_DEFAULT_THREADS（AnyIO 默认线程数）
+用法：
+    router = APIRouter(route_class=ExecutorRoute)   # 在声明路由之前设置，可以和其他路由类组合（多继承）
+
+    @router.get("/return_int")
+    @executors.inline
+    def return_int():
+        ...
+"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import anyio
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException
+from fastapi.routing import APIRoute
+
+from core.metrics import LATENCY_BUCKETS, Histogram
+
+INLINE = "inline"
+DEFAULT = "default"
+DEFAULT_THREADS = 40
+DEFAULT_QUEUE = 100
+
+
+class PoolStats:
+    __slots__ = ("submitted", "rejected", "in_flight", "wait", "run")
+
+    def __init__(self):
+        self.submitted = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.wait = Histogram(LATENCY_BUCKETS)    # 提交 -> 在线程中开始执行
+        self.run = Histogram(LATENCY_BUCKETS)     # 开始执行 -> 结果回到事件循环
+
+
+class ExecutorPool:
+    """ 一组线程（CapacityLimiter）加上排队上限；统计只在事件循环中修改，不需要加锁 """
+
+    def __init__(self, name: str, threads: int = DEFAULT_THREADS, queue: int = DEFAULT_QUEUE, retry_after: int = 1):
+        self.name = name
+        self.threads = threads
+        self.queue = queue
+        self.retry_after = retry_after
+        self.stats = PoolStats()
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        # CapacityLimiter 需要在事件循环中创建
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.threads)
+        return self._limiter
+
+    @property
+    def running(self) -> int:
+        return int(self._limiter.borrowed_tokens) if self._limiter is not None else 0
+
+    async def run(self, call: Callable, kwargs: Dict[str, Any]) -> Any:
+        stats = self.stats
+        if stats.in_flight >= self.threads + self.queue:
+            stats.rejected += 1
+            raise HTTPException(
+                status_code=503, detail="Server busy, retry later", headers={"Retry-After": str(self.retry_after)}
+            )
+        stats.submitted += 1
+        stats.in_flight += 1
+        submitted = time.perf_counter()
+        started = 0.0
+
+        def target():
+            nonlocal started
+            started = time.perf_counter()
+            return call(**kwargs)
+
+        try:
+            return await anyio.to_thread.run_sync(target, limiter=self.limiter)
+        finally:
+            stats.in_flight -= 1
+            if started:
+                stats.wait.observe(started - submitted)
+                stats.run.observe(time.perf_counter() - started)
+
+
+class InlinePool:
+    """ 直接在事件循环中执行，只适合耗时可以忽略的函数（不做 I/O、不做大量计算） """
+    name = INLINE
+    threads = 0
+    queue = 0
+    running = 0
+
+    def __init__(self):
+        self.stats = PoolStats()
+
+    async def run(self, call: Callable, kwargs: Dict[str, Any]) -> Any:
+        stats = self.stats
+        stats.submitted += 1
+        start = time.perf_counter()
+        try:
+            return call(**kwargs)
+        finally:
+            stats.run.observe(time.perf_counter() - start)
+
+
+def parse_pools(value: Optional[str]) -> Dict[str, Tuple[int, int]]:
+    """ "default=40:100,slow=4:8" -> {"default": (40, 100), "slow": (4, 8)} """
+    pools = {}
+    for part in (value or "").split(","):
+        name, _, spec = part.partition("=")
+        if not name.strip() or not spec.strip():
+            continue
+        threads, _, queue = spec.partition(":")
+        pools[name.strip()] = (int(threads), int(queue) if queue.strip() else DEFAULT_QUEUE)
+    return pools
+
+
+def parse_routes(value: Optional[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """ "lessons.path_params.read_item=slow,tag:items=io" -> ({视图函数名: 池}, {tag: 池}) """
+    routes, tags = {}, {}
+    for part in (value or "").split(","):
+        key, _, pool = part.partition("=")
+        key, pool = key.strip(), pool.strip()
+        if not key or not pool:
+            continue
+        if key.startswith("tag:"):
+            tags[key[4:]] = pool
+        else:
+            routes[key] = pool
+    return routes, tags
+
+
+class ExecutorRegistry:
+    def __init__(self, pools: Optional[str] = None, routes: Optional[str] = None, retry_after: Optional[int] = None):
+        self.retry_after = retry_after or int(os.environ.get("EXECUTOR_RETRY_AFTER", 1))
+        self.configured = parse_pools(pools if pools is not None else os.environ.get("EXECUTOR_POOLS"))
+        self.routes, self.tags = parse_routes(routes if routes is not None else os.environ.get("EXECUTOR_ROUTES"))
+        self.pools: Dict[str, Any] = {INLINE: InlinePool()}
+
+    def pool(self, name: str):
+        pool = self.pools.get(name)
+        if pool is None:
+            threads, queue = self.configured.get(name, (DEFAULT_THREADS, DEFAULT_QUEUE))
+            pool = self.pools[name] = ExecutorPool(name, threads, queue, self.retry_after)
+        return pool
+
+    def run_in(self, name: str) -> Callable:
+        """ 标记视图函数在指定的池中执行 """
+
+        def decorator(func: Callable) -> Callable:
+            func.__executor__ = name
+            return func
+
+        return decorator
+
+    def inline(self, func: Callable) -> Callable:
+        """ 标记视图函数直接在事件循环中执行（不切换线程） """
+        func.__executor__ = INLINE
+        return func
+
+    def resolve(self, route: APIRoute) -> str:
+        endpoint = route.endpoint
+        name = getattr(endpoint, "__executor__", None)
+        if name:
+            return name
+        name = self.routes.get(f"{endpoint.__module__}.{endpoint.__qualname__}")
+        if name:
+            return name
+        for tag in route.tags or ():
+            name = self.tags.get(str(tag))
+            if name:
+                return name
+        return DEFAULT
+
+    def wrap(self, route: APIRoute, call: Callable) -> Callable:
+        pool = self.pool(self.resolve(route))
+
+        async def pooled_call(**kwargs):
+            return await pool.run(call, kwargs)
+
+        pooled_call.__wrapped__ = call
+        return pooled_call
+
+
+executors = ExecutorRegistry()
+
+
+class ExecutorRoute(APIRoute):
+    """ 同步视图函数改为在 executors 选出的池中执行（或内联执行） """
+    executors: ExecutorRegistry = executors
+
+    def get_route_handler(self) -> Callable:
+        call = self.dependant.call
+        if call is not None and not asyncio.iscoroutinefunction(call):
+            self.dependant.call = self.executors.wrap(self, call)
+        return super().get_route_handler()
+
+
+def install_executors(app: FastAPI) -> None:
+    """ 设置了 EXECUTOR_DEFAULT_THREADS 时，启动时调整 AnyIO 默认线程限制器（同步依赖、UploadFile 等使用）的大小 """
+    default_threads = os.environ.get("EXECUTOR_DEFAULT_THREADS")
+
+    async def configure_default_limiter() -> None:
+        if default_threads:
+            anyio.to_thread.current_default_thread_limiter().total_tokens = int(default_threads)
+
+    app.add_event_handler("startup", configure_default_limiter)
@@ -0,0 +1,268 @@
+"""
+零拷贝文件下载
+Starlette 的 FileResponse 每次请求都要 os.stat，并且用 anyio 按 64KB 读文件（每块都从内核复制到 Python bytes，再交给 socket），
+也不支持 Range 请求和 If-None-Match。
+
+serve_file() 的处理方式：
+    1、文件元数据（ETag、Last-Modified、Content-Type）缓存在 FileMetaCache 中；每次请求先打开文件，用 fstat 的大小 / mtime
+       和缓存比较，不同时刷新（ETag 随之变化），之后发送的也是这个打开的文件，文件在 ttl 内被截断或替换也不会发出错误的 Content-Length
+    2、If-None-Match 命中返回 304；支持单个 Range（bytes=0-99、bytes=100-、bytes=-100），If-Range 不匹配时返回整个文件
+    3、ASGI 服务器支持 http.response.zerocopysend 扩展时，直接交给服务器用 os.sendfile 发送；
+       否则把文件 mmap 到内存，按块发送 memoryview 切片（数据来自页缓存，不经过 read() 复制）
+"""
+import mmap
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from mimetypes import guess_type
+from typing import BinaryIO, Mapping, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from starlette.types import Receive, Scope, Send
+
+
+class FileMeta:
+    __slots__ = ("path", "size", "mtime_ns", "etag", "last_modified", "content_type", "checked_at")
+
+    def __init__(self, path: str, stat_result: os.stat_result):
+        self.path = path
+        self.size = stat_result.st_size
+        self.mtime_ns = stat_result.st_mtime_ns
+        self.etag = f'"{self.mtime_ns:x}-{self.size:x}"'
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.content_type = guess_type(path)[0] or "application/octet-stream"
+        self.checked_at = time.monotonic()
+
+
+class FileMetaCache:
+    """ 文件元数据的 LRU 缓存，ttl 秒内不重复 stat；传入 stat_result（打开的文件的 fstat）时直接用它校验缓存 """
+
+    def __init__(self, ttl: float = 1.0, maxsize: int = 4096):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, FileMeta]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat_result: Optional[os.stat_result] = None) -> FileMeta:
+        """ 文件不存在或不是普通文件时抛出 FileNotFoundError """
+        now = time.monotonic()
+        with self._lock:
+            meta = self._items.get(path)
+            if stat_result is None and meta is not None and now - meta.checked_at < self.ttl:
+                self._items.move_to_end(path)
+                return meta
+
+        if stat_result is None:
+            try:
+                stat_result = os.stat(path)
+            except (FileNotFoundError, NotADirectoryError):
+                self.invalidate(path)
+                raise FileNotFoundError(path)
+        if not stat.S_ISREG(stat_result.st_mode):
+            self.invalidate(path)
+            raise FileNotFoundError(path)
+
+        if meta is not None and meta.mtime_ns == stat_result.st_mtime_ns and meta.size == stat_result.st_size:
+            meta.checked_at = now
+        else:
+            meta = FileMeta(path, stat_result)
+        with self._lock:
+            self._items[path] = meta
+            self._items.move_to_end(path)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return meta
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._items.clear()
+            else:
+                self._items.pop(path, None)
+
+
+file_meta_cache = FileMetaCache()
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析 Range 头，返回 (start, end)，end 包含在内
+    多个区间（bytes=0-1,5-6）或无法识别的单位返回 None，按整个文件响应（RFC 7233 允许服务器忽略 Range）
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, sep, last = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # bytes=-N：最后 N 个字节
+            length = int(last)
+            if length == 0:
+                raise RangeNotSatisfiable()
+            start = max(size - length, 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start < 0 or start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match 使用弱比较
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class ZeroCopyFileResponse(Response):
+    chunk_size = 1024 * 1024
+
+    def __init__(
+        self,
+        meta: FileMeta,
+        status_code: int = 200,
+        start: int = 0,
+        end: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        file: Optional[BinaryIO] = None,
+    ):
+        """ file 是 serve_file 已经打开并用 fstat 校验过的文件，发送后关闭；为 None 时按 meta.path 打开 """
+        self.meta = meta
+        self.file = file
+        self.status_code = status_code
+        self.start = start
+        self.end = meta.size - 1 if end is None else end
+        self.background = None
+        self.media_type = meta.content_type
+        self.body = b""
+        self.init_headers(headers)
+        self.headers["content-length"] = str(max(self.end - self.start + 1, 0))
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["etag"] = meta.etag
+        self.headers["last-modified"] = meta.last_modified
+        if status_code == status.HTTP_206_PARTIAL_CONTENT:
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{meta.size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        file = self.file if self.file is not None else open(self.meta.path, "rb")
+        with file:
+            await self._send_file(file, scope, send)
+
+    async def _send_file(self, file: BinaryIO, scope: Scope, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if scope["method"].upper() == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": file.fileno(),
+                "offset": self.start,
+                "count": count,
+                "more_body": False,
+            })
+            return
+
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            view = memoryview(mapped)
+            end = self.end + 1
+            for offset in range(self.start, end, self.chunk_size):
+                stop = min(offset + self.chunk_size, end)
+                await send({"type": "http.response.body", "body": view[offset:stop], "more_body": stop < end})
+            del view
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                # 传输层还持有切片（发送缓冲区），等引用释放后由 GC 关闭
+                pass
+
+
+def resolve_path(root: str, file_path: str) -> str:
+    """ 把 URL 中的路径限制在 root 目录之内，防止 ../ 穿越 """
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, file_path))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "File not found")
+    return path
+
+
+def _is_hidden(root: str, path: str) -> bool:
+    """ 相对 root 的路径中有以 . 开头的部分（.git/、.env 等） """
+    relative = os.path.relpath(path, os.path.realpath(root))
+    return any(part.startswith(".") for part in relative.split(os.sep))
+
+
+def _open_file(path: str) -> BinaryIO:
+    """ 打开普通文件；O_NONBLOCK 防止打开 FIFO 时阻塞，不存在或不是普通文件时抛出 FileNotFoundError """
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+        raise FileNotFoundError(path)
+    return os.fdopen(fd, "rb")
+
+
+def serve_file(root: str, file_path: str, request: Request, cache: FileMetaCache = file_meta_cache) -> Response:
+    """ 发送 root 目录中的文件；路径跳出 root、文件或目录名以 . 开头时返回 404 """
+    path = resolve_path(root, file_path)
+    if _is_hidden(root, path):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "File not found")
+    try:
+        file = _open_file(path)
+    except FileNotFoundError:
+        cache.invalidate(path)
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "File not found")
+    try:
+        response = _file_response(path, file, request, cache)
+    except BaseException:
+        file.close()
+        raise
+    if not isinstance(response, ZeroCopyFileResponse):
+        file.close()
+    return response
+
+
+def _file_response(path: str, file: BinaryIO, request: Request, cache: FileMetaCache) -> Response:
+    """ 按打开的文件的 fstat 取元数据，返回 304 / 416 / 206 / 200 """
+    try:
+        meta = cache.get(path, os.fstat(file.fileno()))
+    except FileNotFoundError:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "File not found")
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, meta.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"etag": meta.etag})
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == meta.etag):
+        try:
+            byte_range = parse_range(range_header, meta.size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"content-range": f"bytes */{meta.size}"},
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            return ZeroCopyFileResponse(meta, status.HTTP_206_PARTIAL_CONTENT, start, end, file=file)
+
+    return ZeroCopyFileResponse(meta, file=file)
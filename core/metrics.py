@@ -0,0 +1,363 @@
+"""
+请求耗时与热点路径监控，输出 Prometheus 文本格式（/metrics）
+MetricsMiddleware 记录每个请求，按路由（路由模板，而不是实际路径，避免标签数量无限增长）统计：
+    http_requests_in_flight                         正在处理的请求数
+    http_requests_total{route,method,status}        请求数
+    http_request_duration_seconds{route,method}     总耗时
+    http_request_phase_seconds{route,method,phase}  分阶段耗时：
+        routing        中间件 -> 路由匹配完成（包括其他中间件、Mount 和懒加载课程模块的导入）
+        validation     路由匹配完成 -> 调用视图函数（读取请求体、Path/Query/Body/Form 参数校验、依赖注入）
+        handler        视图函数本身
+        serialization  视图函数返回 -> 开始发送响应（response_model 校验和序列化）
+    http_request_size_bytes / http_response_size_bytes{route,method}
+另外输出 core.cache 响应缓存的计数器，以及 core.executors 各线程池的排队 / 执行情况（executor_*{pool}）
+分阶段耗时需要在路由上打桩（替换 route.app 和 dependant.call），install_metrics 会处理 app 上已有的路由，
+懒加载的课程模块在第一次请求结束后打桩，从第二次请求开始才有分阶段数据。
+
+记录路径上不为每个请求创建对象：
+    1、每个路由、每个方法的统计（RouteMetrics，含直方图的桶）在打桩时预先分配，挂在路由上，记录时直接找到，不拼 (路由, 方法) 的 key
+    2、RequestTiming 放在空闲列表中复用，receive / send 的包装是它预先绑定好的方法，不为每个请求创建闭包
+    剩下的分配来自解释器本身：perf_counter() 和累加得到的 float、ContextVar.set 的 Token。
+用法：
+    install_metrics(app)     # 添加中间件，并注册 GET /metrics
+"""
+import asyncio
+import contextvars
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PHASES = ("routing", "validation", "handler", "serialization")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+UNMATCHED = "<unmatched>"
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str, lines: List[str]) -> None:
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+
+
+class RouteMetrics:
+    __slots__ = ("route", "method", "statuses", "duration", "phases", "request_size", "response_size")
+
+    def __init__(self, route: str, method: str):
+        self.route = route
+        self.method = method
+        self.statuses: Dict[int, int] = {}
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.phases = [Histogram(LATENCY_BUCKETS) for _ in PHASES]
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+
+
+class RequestTiming:
+    """
+    一个请求各阶段的时间点（perf_counter），由中间件和路由上的桩填写；同时包装 receive / send，统计状态码和请求 / 响应大小
+    对象在请求之间复用（MetricsRegistry.acquire / release）
+    """
+    __slots__ = ("start", "routed", "call_start", "call_end", "response_start", "route", "prefix",
+                 "status", "request_size", "response_size", "_receive", "_send", "receive", "send")
+
+    def __init__(self):
+        self._receive: Optional[Receive] = None
+        self._send: Optional[Send] = None
+        # 预先绑定，每个请求直接把这两个方法交给下游应用
+        self.receive = self.receive_wrapper
+        self.send = self.send_wrapper
+        self.reset(0.0, None, None)
+
+    def reset(self, start: float, receive: Optional[Receive], send: Optional[Send]) -> None:
+        self.start = start
+        self.routed = 0.0
+        self.call_start = 0.0
+        self.call_end = 0.0
+        self.response_start = 0.0
+        self.route = None
+        self.prefix = ""
+        self.status = 500
+        self.request_size = 0
+        self.response_size = 0
+        self._receive = receive
+        self._send = send
+
+    async def receive_wrapper(self) -> Message:
+        message = await self._receive()
+        if message["type"] == "http.request":
+            self.request_size += len(message.get("body", b""))
+        return message
+
+    async def send_wrapper(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.response_start = time.perf_counter()
+            self.status = message["status"]
+        elif message_type == "http.response.body":
+            self.response_size += len(message.get("body", b""))
+        await self._send(message)
+
+
+_current_timing: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar("request_timing", default=None)
+
+
+def instrument_route(route: APIRoute, prefix: str = "", registry: "Optional[MetricsRegistry]" = None) -> None:
+    """
+    在路由上打桩：route.app 记录路由匹配完成的时间，dependant.call 记录视图函数的开始和结束时间；
+    并为路由的每个方法预先分配统计（prefix 是路由所在子应用的挂载路径）
+    """
+    (registry or metrics).prepare(route, prefix)
+    if getattr(route, "__metrics_instrumented__", False):
+        return
+    route.__metrics_instrumented__ = True
+    route_app = route.app
+
+    async def timed_app(scope: Scope, receive: Receive, send: Send) -> None:
+        timing = scope.get("metrics.timing")
+        if timing is not None:
+            timing.routed = time.perf_counter()
+            timing.route = route
+            timing.prefix = scope.get("root_path", "")
+            _current_timing.set(timing)
+        await route_app(scope, receive, send)
+
+    call = route.dependant.call
+    if asyncio.iscoroutinefunction(call):
+        async def timed_call(*args, **kwargs):
+            timing = _current_timing.get()
+            if timing is None:
+                return await call(*args, **kwargs)
+            timing.call_start = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                timing.call_end = time.perf_counter()
+    else:
+        # 同步视图函数在线程池中执行，contextvars 会被复制过去，RequestTiming 是同一个对象
+        def timed_call(*args, **kwargs):
+            timing = _current_timing.get()
+            if timing is None:
+                return call(*args, **kwargs)
+            timing.call_start = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                timing.call_end = time.perf_counter()
+
+    timed_call.__wrapped__ = call
+    route.app = timed_app
+    route.dependant.call = timed_call
+
+
+def instrument_routes(routes, prefix: str = "", registry: "Optional[MetricsRegistry]" = None) -> None:
+    for route in routes:
+        if isinstance(route, APIRoute):
+            instrument_route(route, prefix, registry)
+        elif hasattr(getattr(route, "app", None), "routes"):
+            # Mount 的子应用（FastAPI / Router）
+            instrument_routes(route.app.routes, prefix + route.path, registry)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.in_flight = 0
+        # 路由标签 -> 方法 -> 统计；同一个路由模板的多个路由（如 read_item 和 read_item_int）共用一份
+        self._routes: Dict[str, Dict[str, RouteMetrics]] = {}
+        self._free: List[RequestTiming] = []
+
+    # ---------------- RequestTiming 复用 ----------------
+    def acquire(self, receive: Receive, send: Send) -> RequestTiming:
+        timing = self._free.pop() if self._free else RequestTiming()
+        timing.reset(time.perf_counter(), receive, send)
+        return timing
+
+    def release(self, timing: RequestTiming) -> None:
+        timing.reset(0.0, None, None)
+        self._free.append(timing)
+
+    # ---------------- 预先分配的统计 ----------------
+    def _series(self, label: str, methods) -> Dict[str, RouteMetrics]:
+        by_method = self._routes.setdefault(label, {})
+        for method in methods:
+            if method not in by_method:
+                by_method[method] = RouteMetrics(label, method)
+        return by_method
+
+    def prepare(self, route: APIRoute, prefix: str) -> Dict[str, RouteMetrics]:
+        """ 为路由在 prefix 下的每个方法分配统计，记在 route.__metrics_series__[prefix] 中 """
+        series = route.__dict__.setdefault("__metrics_series__", {})
+        if prefix not in series:
+            series[prefix] = self._series(prefix + route.path_format, route.methods)
+        return series[prefix]
+
+    def record(self, timing: RequestTiming, root_path: str, method: str, end: float) -> None:
+        route = timing.route
+        if route is None:
+            by_method = self._routes.get(UNMATCHED) or self._series(UNMATCHED, ())
+        else:
+            # root_path 为空时切片返回的是同一个字符串
+            prefix = timing.prefix[len(root_path):]
+            by_method = route.__dict__.get("__metrics_series__", {}).get(prefix) or self.prepare(route, prefix)
+        metrics = by_method.get(method)
+        if metrics is None:
+            # 未匹配的请求，或者路由没有声明的方法（例如 405）
+            label = UNMATCHED if route is None else timing.prefix[len(root_path):] + route.path_format
+            metrics = self._series(label, (method,))[method]
+        metrics.statuses[timing.status] = metrics.statuses.get(timing.status, 0) + 1
+        metrics.duration.observe(end - timing.start)
+        metrics.request_size.observe(timing.request_size)
+        metrics.response_size.observe(timing.response_size)
+        if timing.routed:
+            response_start = timing.response_start or end
+            phases = metrics.phases
+            phases[0].observe(timing.routed - timing.start)
+            if timing.call_start:
+                phases[1].observe(timing.call_start - timing.routed)
+                phases[2].observe(timing.call_end - timing.call_start)
+                phases[3].observe(max(response_start - timing.call_end, 0.0))
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being processed.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+        ]
+        # 预先分配但还没有请求的统计不输出
+        routes = sorted((m for by_method in self._routes.values() for m in by_method.values() if m.duration.count),
+                        key=lambda m: (m.route, m.method))
+
+        lines += ["# HELP http_requests_total Requests by route, method and status.", "# TYPE http_requests_total counter"]
+        for m in routes:
+            for status, count in sorted(m.statuses.items()):
+                lines.append(f'http_requests_total{{route="{_escape(m.route)}",method="{m.method}",status="{status}"}} {count}')
+
+        for name, help_text, attr in (
+            ("http_request_duration_seconds", "Total request latency.", "duration"),
+            ("http_request_size_bytes", "Request body size.", "request_size"),
+            ("http_response_size_bytes", "Response body size.", "response_size"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for m in routes:
+                getattr(m, attr).render(name, f'route="{_escape(m.route)}",method="{m.method}"', lines)
+
+        lines += ["# HELP http_request_phase_seconds Request latency by phase.", "# TYPE http_request_phase_seconds histogram"]
+        for m in routes:
+            for phase, histogram in zip(PHASES, m.phases):
+                if histogram.count:
+                    histogram.render("http_request_phase_seconds",
+                                     f'route="{_escape(m.route)}",method="{m.method}",phase="{phase}"', lines)
+
+        lines += _cache_metrics()
+        lines += _executor_metrics()
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _cache_metrics() -> List[str]:
+    """ core.cache 响应缓存的计数器 """
+    from core.cache import CacheStats, response_cache
+
+    lines = []
+    for field in CacheStats.__slots__:
+        name = f"response_cache_{field}_total"
+        lines += [f"# TYPE {name} counter"]
+        for endpoint, stats in sorted(response_cache.stats.items()):
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {getattr(stats, field)}')
+    return lines
+
+
+def _executor_metrics() -> List[str]:
+    """ core.executors 各线程池的排队 / 执行情况 """
+    from core.executors import executors
+
+    pools = sorted(executors.pools.values(), key=lambda pool: pool.name)
+    lines = []
+    for name, kind, value in (
+        ("executor_threads", "gauge", lambda pool: pool.threads),
+        ("executor_in_flight", "gauge", lambda pool: pool.stats.in_flight),
+        ("executor_running", "gauge", lambda pool: pool.running),
+        ("executor_submitted_total", "counter", lambda pool: pool.stats.submitted),
+        ("executor_rejected_total", "counter", lambda pool: pool.stats.rejected),
+    ):
+        lines += [f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{pool="{pool.name}"}} {value(pool)}' for pool in pools]
+    for name, help_text, attr in (
+        ("executor_queue_wait_seconds", "Time from submit to start in a worker thread.", "wait"),
+        ("executor_run_seconds", "Handler execution time in the pool.", "run"),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for pool in pools:
+            histogram = getattr(pool.stats, attr)
+            if histogram.count:
+                histogram.render(name, f'pool="{pool.name}"', lines)
+    return lines
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("warmup"):
+            # core.warmup 启动时回放的请求不计入统计
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        # 路由匹配时 Mount 会修改 scope 中的 root_path，先记下中间件看到的
+        root_path = scope.get("root_path", "")
+        timing = scope["metrics.timing"] = registry.acquire(receive, send)
+        registry.in_flight += 1
+        try:
+            await self.app(scope, timing.receive, timing.send)
+        finally:
+            registry.in_flight -= 1
+            route = scope.get("route")
+            if timing.route is None and isinstance(route, APIRoute):
+                # 懒加载的课程模块：这次没有分阶段数据，打桩后下一次请求开始记录
+                timing.route = route
+                timing.prefix = scope.get("root_path", "")
+                instrument_route(route, timing.prefix[len(root_path):], registry)
+            registry.record(timing, root_path, scope["method"], time.perf_counter())
+            registry.release(timing)
+
+
+def install_metrics(app: FastAPI, path: str = "/metrics", registry: MetricsRegistry = metrics) -> None:
+    """ 给 app 添加 MetricsMiddleware，对已注册的路由打桩，并注册 GET /metrics """
+
+    async def metrics_endpoint(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    app.add_api_route(path, metrics_endpoint, methods=["GET"], include_in_schema=False)
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    instrument_routes(app.routes, registry=registry)
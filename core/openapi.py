@@ -0,0 +1,298 @@
+"""
+OpenAPI 文档缓存
+FastAPI 的 /openapi.json 虽然把 schema dict 缓存在 app.openapi_schema 中，但每个请求都要 JSONResponse 重新 json.dumps 一遍，
+schema_extra.py、path_operation_decorator.py 这类带大量 example / summary / description / tags 的应用文档很大，
+而且没有 ETag，浏览器每次打开 /docs 都要完整下载；/docs、/redoc 的 JS / CSS 来自 CDN，内网环境打不开。
+
+install_openapi_cache(app) 的处理方式：
+    1、schema 按「应用版本」只构建一次：指纹包括 app 的标题 / 版本、每个路由的路径 / 方法 / 名称，
+       以及视图函数和请求体 / 响应模型所在源文件的 mtime 和大小；路由被添加、删除、替换，或者路径 / 方法 / 名称被修改时重新计算指纹
+    2、构建时直接序列化成 bytes，同时生成 gzip（以及安装了 brotli 时的 br）压缩版本，按 Accept-Encoding 选择，不再每次压缩
+    3、每个版本有自己的强 ETag（压缩版本带后缀），If-None-Match 命中返回 304；Cache-Control: no-cache 让浏览器每次带 ETag 重新验证
+    4、挂载在子路径下（root_path，如懒加载的课程模块）时，与 FastAPI 一样把 root_path 加进 servers，每个 root_path 各缓存一份
+    5、设置了 OPENAPI_CACHE_DIR 时把三个版本写到磁盘（文件名包含指纹），下次启动指纹没变就直接读取，不需要重新生成 schema
+    6、DOCS_ASSETS_DIR（默认 static/docs）中有 Swagger UI / ReDoc 的文件时，/docs、/redoc 改用本地文件（/docs-assets/...），
+       文件通过 core.files.serve_file 发送（ETag、零拷贝）；下载文件：python -m core.openapi download-assets
+用法：
+    install_openapi_cache(app)     # 在声明完路由之后调用；app 启动时会预先构建并写入磁盘
+    课程模块的子应用由 core.registry 执行 startup 事件：预加载的在启动时构建，懒加载的在第一次请求导入模块时构建
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import fastapi
+import pydantic
+from fastapi import FastAPI, Request, Response
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+from fastapi.routing import APIRoute
+from starlette.routing import Route
+
+from core.compression import negotiate
+from core.files import _etag_matches, serve_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = "OPENAPI_CACHE_DIR"
+ASSETS_DIR_ENV = "DOCS_ASSETS_DIR"
+DEFAULT_ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "docs")
+ASSETS_PATH = "/docs-assets"
+# 按优先级排列
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+SUFFIXES = {"identity": ".json", "gzip": ".json.gz", "br": ".json.br"}
+
+
+class SchemaVariants:
+    """ 同一份 schema 的原始 / gzip / br 三个版本，以及各自的 ETag """
+    __slots__ = ("bodies", "etags")
+
+    def __init__(self, bodies: Dict[str, bytes]):
+        self.bodies = bodies
+        digest = hashlib.sha256(bodies["identity"]).hexdigest()[:20]
+        self.etags = {encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+                      for encoding in bodies}
+
+    @classmethod
+    def build(cls, schema: Dict[str, Any]) -> "SchemaVariants":
+        body = json.dumps(schema, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body, quality=11)
+        return cls(bodies)
+
+    def save(self, stem: str) -> None:
+        for encoding, body in self.bodies.items():
+            tmp = f"{stem}{SUFFIXES[encoding]}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, stem + SUFFIXES[encoding])
+
+    @classmethod
+    def load(cls, stem: str) -> Optional["SchemaVariants"]:
+        bodies = {}
+        for encoding, suffix in SUFFIXES.items():
+            if encoding != "identity" and encoding not in ENCODINGS:
+                continue
+            try:
+                with open(stem + suffix, "rb") as f:
+                    bodies[encoding] = f.read()
+            except FileNotFoundError:
+                return None
+        return cls(bodies)
+
+
+def _source_file(obj: Any) -> Optional[str]:
+    module = sys.modules.get(getattr(obj, "__module__", None) or "")
+    return getattr(module, "__file__", None)
+
+
+def fingerprint(app: FastAPI) -> str:
+    """ 应用版本的指纹：路由定义或相关源文件变化时改变 """
+    digest = hashlib.sha256()
+    digest.update(repr((app.title, app.version, app.openapi_version, app.description, app.servers,
+                        fastapi.__version__, pydantic.VERSION)).encode())
+    files = set()
+    for route in app.routes:
+        digest.update(repr((getattr(route, "path", None), sorted(getattr(route, "methods", None) or ()),
+                            getattr(route, "name", None), getattr(route, "include_in_schema", None))).encode())
+        if isinstance(route, APIRoute):
+            for obj in (route.endpoint, route.response_model,
+                        *(param.field_info.annotation for param in route.dependant.body_params)):
+                path = _source_file(obj)
+                if path:
+                    files.add(path)
+    for path in sorted(files):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()[:16]
+
+
+class OpenAPICache:
+    def __init__(self, app: FastAPI, cache_dir: Optional[str] = None):
+        self.app = app
+        self.cache_dir = cache_dir
+        self._version: Optional[str] = None
+        self._route_key: Tuple = ()
+        self._variants: Dict[str, SchemaVariants] = {}   # root_path -> 各版本
+
+    def _check_version(self) -> None:
+        # 每次请求只比较路由对象和它们的路径 / 方法 / 名称，有变化时才重新计算指纹（需要 stat 源文件）
+        route_key = tuple((id(route), getattr(route, "path", None), getattr(route, "methods", None),
+                           getattr(route, "name", None)) for route in self.app.routes)
+        if route_key == self._route_key:
+            return
+        self._route_key = route_key
+        version = fingerprint(self.app)
+        if version != self._version:
+            self._version = version
+            self._variants.clear()
+            self.app.openapi_schema = None
+
+    def _servers(self, root_path: str) -> list:
+        # 与 FastAPI.setup 中 openapi() 的处理一致，但不修改 app.servers
+        servers = list(self.app.servers)
+        if root_path and self.app.root_path_in_servers and root_path not in {s.get("url") for s in servers}:
+            servers.insert(0, {"url": root_path})
+        return servers
+
+    def _stem(self, root_path: str) -> str:
+        slug = "".join(c if c.isalnum() else "-" for c in self.app.title.lower()).strip("-") or "app"
+        key = hashlib.sha256(f"{self._version}:{root_path}".encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"openapi-{slug}-{key}")
+
+    def variants(self, root_path: str = "") -> SchemaVariants:
+        self._check_version()
+        variants = self._variants.get(root_path)
+        if variants is not None:
+            return variants
+
+        stem = self._stem(root_path) if self.cache_dir else None
+        if stem is not None:
+            variants = SchemaVariants.load(stem)
+        if variants is None:
+            start = time.perf_counter()
+            schema = dict(self.app.openapi())
+            servers = self._servers(root_path)
+            if servers:
+                schema["servers"] = servers
+            variants = SchemaVariants.build(schema)
+            logger.info("openapi schema for %s%s built in %.1fms (%s bytes)", self.app.title, root_path or "",
+                        (time.perf_counter() - start) * 1000, len(variants.bodies["identity"]))
+            if stem is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                variants.save(stem)
+        self._variants[root_path] = variants
+        return variants
+
+    def response(self, request: Request) -> Response:
+        variants = self.variants(request.scope.get("root_path", "").rstrip("/"))
+        encoding = negotiate(request.headers.get("accept-encoding", ""), ENCODINGS)
+        etag = variants.etags[encoding]
+        headers = {"etag": etag, "vary": "Accept-Encoding", "cache-control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        return Response(variants.bodies[encoding], media_type="application/json", headers=headers)
+
+
+def _replace_route(app: FastAPI, path: Optional[str], endpoint) -> None:
+    if not path:
+        return
+    for index, route in enumerate(app.router.routes):
+        if isinstance(route, Route) and not isinstance(route, APIRoute) and route.path == path:
+            app.router.routes[index] = Route(path, endpoint, include_in_schema=False)
+            return
+
+
+def _install_local_docs(app: FastAPI, assets_dir: str) -> None:
+    """ 有本地的 Swagger UI / ReDoc 文件时，/docs、/redoc 改用本地文件 """
+    has = lambda name: os.path.isfile(os.path.join(assets_dir, name))
+    swagger = has("swagger-ui-bundle.js") and has("swagger-ui.css")
+    redoc = has("redoc.standalone.js")
+    if not (swagger or redoc):
+        return
+    favicon = "favicon.png" if has("favicon.png") else None
+
+    async def docs_assets(request: Request) -> Response:
+        return serve_file(assets_dir, request.path_params["file_path"], request)
+
+    app.router.routes.append(Route(ASSETS_PATH + "/{file_path:path}", docs_assets, include_in_schema=False))
+
+    def asset_url(root_path: str, name: Optional[str], default: str) -> str:
+        return f"{root_path}{ASSETS_PATH}/{name}" if name else default
+
+    if swagger and app.docs_url:
+        async def swagger_ui_html(request: Request) -> Response:
+            root_path = request.scope.get("root_path", "").rstrip("/")
+            oauth2_redirect_url = app.swagger_ui_oauth2_redirect_url
+            return get_swagger_ui_html(
+                openapi_url=root_path + app.openapi_url,
+                title=f"{app.title} - Swagger UI",
+                swagger_js_url=f"{root_path}{ASSETS_PATH}/swagger-ui-bundle.js",
+                swagger_css_url=f"{root_path}{ASSETS_PATH}/swagger-ui.css",
+                swagger_favicon_url=asset_url(root_path, favicon, "https://fastapi.tiangolo.com/img/favicon.png"),
+                oauth2_redirect_url=root_path + oauth2_redirect_url if oauth2_redirect_url else None,
+                init_oauth=app.swagger_ui_init_oauth,
+                swagger_ui_parameters=app.swagger_ui_parameters,
+            )
+
+        _replace_route(app, app.docs_url, swagger_ui_html)
+
+    if redoc and app.redoc_url:
+        async def redoc_html(request: Request) -> Response:
+            root_path = request.scope.get("root_path", "").rstrip("/")
+            return get_redoc_html(
+                openapi_url=root_path + app.openapi_url,
+                title=f"{app.title} - ReDoc",
+                redoc_js_url=f"{root_path}{ASSETS_PATH}/redoc.standalone.js",
+                redoc_favicon_url=asset_url(root_path, favicon, "https://fastapi.tiangolo.com/img/favicon.png"),
+                with_google_fonts=False,
+            )
+
+        _replace_route(app, app.redoc_url, redoc_html)
+
+
+def install_openapi_cache(app: FastAPI, cache_dir: Optional[str] = None, assets_dir: Optional[str] = None) -> OpenAPICache:
+    """ 用缓存的 bytes 响应 /openapi.json，并在有本地文件时让 /docs、/redoc 使用本地的 JS / CSS """
+    cache = OpenAPICache(app, cache_dir or os.environ.get(CACHE_DIR_ENV))
+    if app.openapi_url:
+        async def openapi(request: Request) -> Response:
+            return cache.response(request)
+
+        _replace_route(app, app.openapi_url, openapi)
+
+        async def build_on_startup() -> None:
+            cache.variants()
+
+        app.add_event_handler("startup", build_on_startup)
+    _install_local_docs(app, assets_dir or os.environ.get(ASSETS_DIR_ENV, DEFAULT_ASSETS_DIR))
+    return cache
+
+
+def download_assets(assets_dir: str) -> None:
+    """ 从 FastAPI 默认使用的 CDN 地址下载 Swagger UI / ReDoc 文件 """
+    import inspect
+
+    import httpx
+
+    swagger = inspect.signature(get_swagger_ui_html).parameters
+    redoc = inspect.signature(get_redoc_html).parameters
+    urls = {
+        "swagger-ui-bundle.js": swagger["swagger_js_url"].default,
+        "swagger-ui.css": swagger["swagger_css_url"].default,
+        "favicon.png": swagger["swagger_favicon_url"].default,
+        "redoc.standalone.js": redoc["redoc_js_url"].default,
+    }
+    os.makedirs(assets_dir, exist_ok=True)
+    with httpx.Client(follow_redirects=True, timeout=60) as client:
+        for name, url in urls.items():
+            response = client.get(url)
+            response.raise_for_status()
+            with open(os.path.join(assets_dir, name), "wb") as f:
+                f.write(response.content)
+            print(f"{name:<24} {len(response.content):>10} bytes  <- {url}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OpenAPI 文档缓存工具")
+    parser.add_argument("command", choices=["download-assets"])
+    parser.add_argument("--dir", default=os.environ.get(ASSETS_DIR_ENV, DEFAULT_ASSETS_DIR))
+    args = parser.parse_args()
+    download_assets(args.dir)
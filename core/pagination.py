@@ -0,0 +1,161 @@
+"""
+游标分页（keyset pagination）
+query_params.py 中的 read_items 用 skip / limit 分页：任何真实的存储都要先跳过 skip 条记录（dict 要遍历，SQL 的 OFFSET 要逐行扫描），
+越往后翻越慢，翻到第 100 万条时每一页都要先扫描 100 万条；翻页期间插入 / 删除数据还会导致重复或漏掉。
+
+CursorPaginator 作为依赖使用，按 key 排序、记住上一页最后一个 key：
+    1、下一页：key > 上一页最后一个 key 的前 limit 条；上一页：key < 本页第一个 key 的最后 limit 条
+       由 ItemStore.page 实现（MemoryStore 用有序 key 列表 + bisect，SQLiteStore 用主键范围查询），代价只和页大小有关
+    2、游标对客户端不透明：base64url(JSON) + HMAC-SHA256 签名，客户端不能伪造任意位置；
+       游标中带有路径和其他查询参数（过滤条件）的摘要，换了过滤条件后旧游标失效
+    3、每页多取一条判断是否还有下一页 / 上一页，响应中带上 next / prev 链接
+    4、limit 超过 max_limit 时返回 422，和 Query(le=max_limit) 的报错格式一致
+签名密钥来自环境变量 PAGINATION_SECRET；没有设置时每个进程随机生成一个（core.supervisor 启动多个 worker 时会统一设置）。
+用法：
+    paginator = CursorPaginator(max_limit=100)
+
+    @app.get("/items/page/", response_model=CursorPage)
+    async def read_items_page(page: PageRequest = Depends(paginator), store: ItemStore = Depends(items_db)):
+        return await page.fetch(store)
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import secrets
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel
+
+from core.storage import ItemStore
+
+SECRET_ENV = "PAGINATION_SECRET"
+CURSOR_PARAM = "cursor"
+LIMIT_PARAM = "limit"
+
+
+class CursorPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next: Optional[str] = None
+    prev: Optional[str] = None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class CursorSigner:
+    """ 游标的编码、签名和校验 """
+
+    def __init__(self, secret: Optional[str] = None):
+        secret = secret or os.environ.get(SECRET_ENV)
+        self.secret = secret.encode() if secret else secrets.token_bytes(32)
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self.secret, payload, hashlib.sha256).digest()[:16]
+
+    def encode(self, direction: str, key: str, scope: str) -> str:
+        payload = json.dumps([direction, key, scope], separators=(",", ":")).encode()
+        return _b64encode(payload) + "." + _b64encode(self._sign(payload))
+
+    def decode(self, cursor: str, scope: str) -> Tuple[str, str]:
+        """ 返回 (方向, key)；签名不对、格式不对或者不属于当前查询时抛出 ValueError """
+        try:
+            payload_part, signature_part = cursor.split(".")
+            payload, signature = _b64decode(payload_part), _b64decode(signature_part)
+        except (ValueError, binascii.Error):
+            raise ValueError("malformed cursor")
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            raise ValueError("bad signature")
+        direction, key, cursor_scope = json.loads(payload)
+        if cursor_scope != scope or direction not in ("next", "prev"):
+            raise ValueError("cursor does not belong to this query")
+        return direction, key
+
+
+class PageRequest:
+    """ 一次分页请求：由 CursorPaginator 解析游标得到，fetch 时从存储中取出一页并生成 next / prev 链接 """
+
+    def __init__(self, request: Request, paginator: "CursorPaginator", limit: int,
+                 direction: Optional[str] = None, key: Optional[str] = None, scope: str = ""):
+        self.request = request
+        self.paginator = paginator
+        self.limit = limit
+        self.direction = direction
+        self.key = key
+        self.scope = scope
+
+    def link(self, direction: str, key: str) -> str:
+        cursor = self.paginator.signer.encode(direction, key, self.scope)
+        return str(self.request.url.include_query_params(**{CURSOR_PARAM: cursor, LIMIT_PARAM: self.limit}))
+
+    async def fetch(self, store: ItemStore) -> Dict[str, Any]:
+        limit = self.limit
+        if self.direction == "prev":
+            rows = await store.page(before=self.key, limit=limit + 1)
+            has_prev = len(rows) > limit
+            rows = rows[-limit:] if has_prev else rows
+            has_next = True
+        else:
+            rows = await store.page(after=self.key, limit=limit + 1)
+            has_next = len(rows) > limit
+            rows = rows[:limit]
+            has_prev = self.key is not None
+        page: Dict[str, Any] = {"items": [value for _, value in rows], "next": None, "prev": None}
+        if rows:
+            if has_next:
+                page["next"] = self.link("next", rows[-1][0])
+            if has_prev:
+                page["prev"] = self.link("prev", rows[0][0])
+        elif self.direction == "next" and self.key is not None:
+            # 最后一页之后（例如数据被删除了），仍然可以往回翻
+            page["prev"] = self.link("prev", self.key)
+        return page
+
+
+def _limit_error(error_type: str, word: str, op: str, bound: int, limit: int) -> RequestValidationError:
+    return RequestValidationError([{
+        "type": error_type,
+        "loc": ("query", LIMIT_PARAM),
+        "msg": f"Input should be {word} than or equal to {bound}",
+        "input": str(limit),
+        "ctx": {op: bound},
+    }])
+
+
+class CursorPaginator:
+    def __init__(self, default_limit: int = 10, max_limit: int = 100, secret: Optional[str] = None):
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.signer = CursorSigner(secret)
+
+    @staticmethod
+    def scope_for(request: Request) -> str:
+        """ 路径和除 cursor / limit 以外的查询参数的摘要，游标只在同一个查询中有效 """
+        params = sorted((k, v) for k, v in request.query_params.multi_items() if k not in (CURSOR_PARAM, LIMIT_PARAM))
+        raw = json.dumps([request.url.path, params], separators=(",", ":")).encode()
+        return _b64encode(hashlib.sha256(raw).digest()[:9])
+
+    async def __call__(self, request: Request, cursor: Optional[str] = None, limit: Optional[int] = None) -> PageRequest:
+        if limit is None:
+            limit = self.default_limit
+        if limit < 1:
+            raise _limit_error("greater_than_equal", "greater", "ge", 1, limit)
+        if limit > self.max_limit:
+            raise _limit_error("less_than_equal", "less", "le", self.max_limit, limit)
+        scope = self.scope_for(request)
+        if not cursor:
+            return PageRequest(request, self, limit, scope=scope)
+        try:
+            direction, key = self.signer.decode(cursor, scope)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return PageRequest(request, self, limit, direction, key, scope)
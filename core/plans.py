@@ -0,0 +1,211 @@
+"""
+参数提取计划：每个路由只分析一次 Path / Query / Header / Cookie / Body 参数
+FastAPI 每个请求都要经过通用的 solve_dependencies：逐个参数判断位置、取值（request.query_params / headers / cookies 每次都新建对象），
+再逐个 field.validate，每个参数单独生成一次错误列表；update_item（multi_params.py）这种 path + query + 两个请求体参数的路由，
+参数提取和校验比视图函数本身慢得多。
+
+PlanRoute 在创建路由时把参数编译成 ParamPlan：
+    1、每个位置要读取的键：路径参数名、查询参数别名（如 item-query）、请求头（已经按 convert_underscores 转换并转为小写 bytes，
+       直接扫描 ASGI 的原始请求头）、Cookie 名；哪些是列表参数（x_token: List[str] 重复的请求头全部保留）
+    2、请求体的布局：只有一个请求体参数且没有 embed 时，整个 JSON 就是这个参数；否则按别名从 JSON 对象中取
+    3、所有参数合成一个 pydantic 模型（别名、约束、默认值与原参数相同），请求时一次校验
+请求时按计划把原始值放进一个 dict，一次校验后直接调用视图函数（core.plans.stripped_handler：去掉了参数的 Dependant，
+FastAPI 不再提取、校验参数，只负责调用视图函数和生成响应）。取值规则与 FastAPI 一致：查询参数重复时取最后一个、请求头取第一个，
+列表为空、值缺失时使用默认值，请求体中值为 null 视为没有提供。
+校验失败、请求体不是 JSON 等情况交给 FastAPI 原来的处理函数，报错的内容和格式与原来完全一样。
+只处理没有依赖函数（Depends / Security / 路由级 dependencies）的路由，Form / File 参数由 core.forms.FastFormRoute 处理。
+用法：
+    app = FastAPI()
+    app.router.route_class = PlanRoute   # 在声明路由之前设置，可以和 FastBodyRoute 等组合（多继承，PlanRoute 放在前面）
+"""
+import asyncio
+import copy
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi import Request, Response, params
+from fastapi.dependencies.utils import is_scalar_sequence_field
+from fastapi.routing import APIRoute
+from pydantic import ConfigDict, ValidationError, create_model
+from pydantic.fields import FieldInfo
+from starlette.requests import cookie_parser
+
+from core.bodies import MAX_BYTES, MAX_DEPTH, exceeds_depth, get_decoder, is_json_content_type, read_body
+
+VALUES_KEY = "route.values"
+
+
+def with_scope_values(dependant, request_param: str, remove_request: bool) -> Callable:
+    """ 视图函数的包装：从 scope 中取出已经校验好的参数；每次调用时才读取 dependant.call（core.metrics 会替换它） """
+    if asyncio.iscoroutinefunction(dependant.call):
+        async def endpoint(**values):
+            request = values.pop(request_param) if remove_request else values[request_param]
+            return await dependant.call(**values, **request.scope[VALUES_KEY])
+    else:
+        def endpoint(**values):
+            request = values.pop(request_param) if remove_request else values[request_param]
+            return dependant.call(**values, **request.scope[VALUES_KEY])
+    endpoint.__wrapped__ = dependant.call
+    return endpoint
+
+
+def stripped_handler(route: APIRoute, get_handler: Callable[[], Callable], body_only: bool = False) -> Callable:
+    """
+    用去掉了参数（body_only=True 时只去掉请求体参数）的 Dependant 生成路由处理函数：FastAPI 不再提取、校验这些参数，
+    由 with_scope_values 从 request.scope[VALUES_KEY] 补上；get_handler 是路由类中 super().get_route_handler
+    """
+    dependant, body_field = route.dependant, route.body_field
+    fast = copy.copy(dependant)
+    fast.body_params = []
+    if not body_only:
+        fast.path_params, fast.query_params, fast.header_params, fast.cookie_params = [], [], [], []
+    remove_request = dependant.request_param_name is None
+    fast.request_param_name = dependant.request_param_name or "__route_request__"
+    fast.call = with_scope_values(dependant, fast.request_param_name, remove_request)
+    route.dependant, route.body_field = fast, None
+    try:
+        return get_handler()
+    finally:
+        # OpenAPI 文档、core.metrics 等仍然使用原来的 Dependant
+        route.dependant, route.body_field = dependant, body_field
+
+
+def _plan_field(param) -> Tuple[Any, FieldInfo]:
+    """ 原参数的类型和约束，别名用 FastAPI 转换后的（如 user_agent -> user-agent） """
+    info = FieldInfo.merge_field_infos(param.field_info, alias=param.alias, validation_alias=param.alias)
+    return param.field_info.annotation, info
+
+
+class ParamPlan:
+    __slots__ = ("path", "query", "headers", "cookies", "body", "body_single", "model", "names", "decoder",
+                 "max_bytes", "max_depth")
+
+    def __init__(self, route: APIRoute, max_bytes: int = MAX_BYTES, max_depth: int = MAX_DEPTH):
+        dependant = route.dependant
+        self.path = tuple(param.alias for param in dependant.path_params)
+        self.query = {param.alias: is_scalar_sequence_field(param) for param in dependant.query_params}
+        self.headers = {param.alias.lower().encode("latin-1"): (param.alias, is_scalar_sequence_field(param))
+                        for param in dependant.header_params}
+        self.cookies = tuple(param.alias for param in dependant.cookie_params)
+        body_params = dependant.body_params
+        self.body = tuple(param.alias for param in body_params)
+        # 与 fastapi.dependencies.utils.request_body_to_args 的判断一致
+        self.body_single = len(body_params) == 1 and not getattr(body_params[0].field_info, "embed", None)
+
+        all_params = [*dependant.path_params, *dependant.query_params, *dependant.header_params,
+                      *dependant.cookie_params, *body_params]
+        self.model = create_model(
+            f"Plan_{route.unique_id}",
+            __config__=ConfigDict(arbitrary_types_allowed=True),
+            **{f"p{index}": _plan_field(param) for index, param in enumerate(all_params)},
+        )
+        self.names = tuple((param.name, f"p{index}") for index, param in enumerate(all_params))
+        self.decoder = get_decoder()
+        self.max_bytes = max_bytes
+        self.max_depth = max_depth
+
+    @classmethod
+    def compile(cls, route: APIRoute) -> Optional["ParamPlan"]:
+        """ 不满足条件（有依赖函数、表单参数、别名冲突）时返回 None """
+        dependant = route.dependant
+        if dependant.dependencies or dependant.security_requirements:
+            return None
+        if route.body_field is not None and isinstance(route.body_field.field_info, params.Form):
+            return None
+        aliases = [param.alias for param in (*dependant.path_params, *dependant.query_params,
+                                             *dependant.header_params, *dependant.cookie_params,
+                                             *dependant.body_params)]
+        if not aliases or len(set(aliases)) != len(aliases):
+            return None
+        return cls(route)
+
+    async def _body(self, request: Request, raw: Dict[str, Any]) -> bool:
+        body = await read_body(request, self.max_bytes)
+        if not body:
+            return True
+        if not is_json_content_type(request) or exceeds_depth(body, self.max_depth):
+            return False
+        try:
+            data = self.decoder(body)
+        except json.JSONDecodeError:
+            return False
+        if self.body_single:
+            if data is not None:
+                raw[self.body[0]] = data
+            return True
+        if not isinstance(data, dict):
+            return False
+        for alias in self.body:
+            value = data.get(alias)
+            if value is not None:
+                raw[alias] = value
+        return True
+
+    async def values(self, request: Request) -> Optional[Dict[str, Any]]:
+        """ 按计划取值并一次校验，返回视图函数的参数；需要 FastAPI 生成报错时返回 None """
+        scope = request.scope
+        raw: Dict[str, Any] = {}
+        if self.path:
+            path_params = scope["path_params"]
+            for alias in self.path:
+                raw[alias] = path_params[alias]
+        if self.query and scope["query_string"]:
+            query = self.query
+            lists: Dict[str, List[str]] = {}
+            for name, value in parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True):
+                is_list = query.get(name)
+                if is_list is None:
+                    continue
+                if is_list:
+                    lists.setdefault(name, []).append(value)
+                else:
+                    raw[name] = value    # 与 QueryParams.get 一致：重复时取最后一个
+            raw.update(lists)
+        if self.headers:
+            headers = self.headers
+            lists = {}
+            for key, value in scope["headers"]:
+                found = headers.get(key)
+                if found is None:
+                    continue
+                alias, is_list = found
+                if is_list:
+                    lists.setdefault(alias, []).append(value.decode("latin-1"))
+                elif alias not in raw:
+                    raw[alias] = value.decode("latin-1")    # 与 Headers.get 一致：取第一个
+            raw.update(lists)
+        if self.cookies:
+            cookie_header = next((value for key, value in scope["headers"] if key == b"cookie"), None)
+            if cookie_header is not None:
+                cookies = cookie_parser(cookie_header.decode("latin-1"))
+                for alias in self.cookies:
+                    if alias in cookies:
+                        raw[alias] = cookies[alias]
+        if self.body and not await self._body(request, raw):
+            return None
+        try:
+            model = self.model.model_validate(raw)
+        except ValidationError:
+            return None
+        return {name: getattr(model, field) for name, field in self.names}
+
+
+class PlanRoute(APIRoute):
+    """ 参数按预先编译好的 ParamPlan 提取、一次校验 """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        plan = ParamPlan.compile(self)
+        if plan is None:
+            return handler
+        fast_handler = stripped_handler(self, super().get_route_handler)
+
+        async def route_handler(request: Request) -> Response:
+            values = await plan.values(request)
+            if values is None:
+                return await handler(request)
+            request.scope[VALUES_KEY] = values
+            return await fast_handler(request)
+
+        return route_handler
@@ -0,0 +1,351 @@
+"""
+基于前缀树（radix tree）的路由索引
+Starlette 的路由匹配是按声明顺序逐条尝试正则（first-match），路由越多越慢，而且先声明的路由会遮蔽后声明的路由，
+例如 lessons/path_params.py 中 read_item 会拦截所有 /items/{item_id} 的请求，read_item_int 永远匹配不到。
+
+RadixRouter 在启动时把所有路由编译成一棵前缀树：
+    1、每一段路径是一个节点，节点按类型区分：静态段 > Enum > int > float > str > path
+       类型来自路径转换器（{x:int}、{x:path}）或视图函数参数的注解（item_id: int、model_name: ModelName）
+    2、查找时按优先级回溯，得到候选路由后再调用 route.matches() 做最终确认，所以路径参数的转换、405 等行为不变
+    3、索引不到的请求（如 /items/{id}.json 这类混合段、Host 路由）退回到原来的线性匹配
+启动时会报告：
+    unreachable: 签名完全相同的路由，后声明的永远匹配不到（在前缀树里也一样）
+    shadowed:    线性匹配时被遮蔽、但前缀树能按类型区分开的路由
+    unindexed:   没有进入索引的路由
+使用方式（可选开启）：
+    install_radix_router(app)
+"""
+import logging
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.routing import APIRouter
+from starlette.routing import BaseRoute, Match, Mount, Router, get_route_path
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# 节点类型，数值越小优先级越高
+STATIC, ENUM, INT, FLOAT, STR, PATH = range(6)
+KIND_NAMES = {STATIC: "static", ENUM: "enum", INT: "int", FLOAT: "float", STR: "str", PATH: "path"}
+
+
+def _is_int(value: str) -> bool:
+    try:
+        int(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_float(value: str) -> bool:
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+class Segment:
+    """ 路径中的一段，kind 为节点类型，value 为静态文本或 Enum 类 """
+    __slots__ = ("kind", "value")
+
+    def __init__(self, kind: int, value: Any = None):
+        self.kind = kind
+        self.value = value
+
+    def key(self) -> Tuple[int, Any]:
+        return self.kind, self.value
+
+    def __repr__(self):
+        if self.kind == STATIC:
+            return self.value
+        if self.kind == ENUM:
+            return "{%s}" % self.value.__name__
+        return "{%s}" % KIND_NAMES[self.kind]
+
+
+def _template(route: BaseRoute) -> Optional[str]:
+    if isinstance(route, Mount):
+        return route.path + "/{path:path}"
+    return getattr(route, "path", None)
+
+
+def _param_annotations(route: BaseRoute) -> Dict[str, Any]:
+    """ 路径参数名 -> 视图函数中的注解类型（只有 APIRoute 才有） """
+    dependant = getattr(route, "dependant", None)
+    if dependant is None:
+        return {}
+    return {field.alias: field.field_info.annotation for field in dependant.path_params}
+
+
+def parse_route(route: BaseRoute) -> Optional[List[Segment]]:
+    """ 把路由模板解析成 Segment 列表；无法索引的路由返回 None """
+    template = _template(route)
+    if template is None or not template.startswith("/"):
+        return None
+
+    annotations = _param_annotations(route)
+    segments = []
+    parts = template[1:].split("/")
+    for i, part in enumerate(parts):
+        if "{" not in part:
+            segments.append(Segment(STATIC, part))
+            continue
+        if not (part.startswith("{") and part.endswith("}")) or part.count("{") > 1:
+            return None  # 混合段，如 {id}.json
+
+        name, _, convertor = part[1:-1].partition(":")
+        convertor = convertor or "str"
+        if convertor == "path":
+            if i != len(parts) - 1:
+                return None
+            segments.append(Segment(PATH))
+        elif convertor == "int":
+            segments.append(Segment(INT))
+        elif convertor == "float":
+            segments.append(Segment(FLOAT))
+        elif convertor == "str":
+            annotation = annotations.get(name)
+            if isinstance(annotation, type) and issubclass(annotation, Enum):
+                segments.append(Segment(ENUM, annotation))
+            elif annotation is int:
+                segments.append(Segment(INT))
+            elif annotation is float:
+                segments.append(Segment(FLOAT))
+            else:
+                segments.append(Segment(STR))
+        else:
+            return None
+    return segments
+
+
+class Node:
+    __slots__ = ("static", "typed", "routes")
+
+    def __init__(self):
+        self.static: Dict[str, "Node"] = {}
+        # [(kind, value, enum 取值集合, node)]，按优先级排好序
+        self.typed: List[Tuple[int, Any, Optional[frozenset], "Node"]] = []
+        self.routes: List[BaseRoute] = []
+
+    def child(self, segment: Segment) -> "Node":
+        if segment.kind == STATIC:
+            return self.static.setdefault(segment.value, Node())
+        for kind, value, _, node in self.typed:
+            if kind == segment.kind and value is segment.value:
+                return node
+        node = Node()
+        values = frozenset(m.value for m in segment.value) if segment.kind == ENUM else None
+        self.typed.append((segment.kind, segment.value, values, node))
+        self.typed.sort(key=lambda t: t[0])
+        return node
+
+
+class RouteList(list):
+    """ 记录修改次数的路由列表：RadixRouter 按 version 判断索引是否过期，替换、调整顺序而数量不变时也能发现 """
+    version = 0
+
+
+def _counted(name: str):
+    method = getattr(list, name)
+
+    def mutate(self: RouteList, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    mutate.__name__ = name
+    return mutate
+
+
+for _name in ("__setitem__", "__delitem__", "__iadd__", "__imul__", "append", "extend", "insert", "pop",
+              "remove", "clear", "sort", "reverse"):
+    setattr(RouteList, _name, _counted(_name))
+
+
+class RouteIndex:
+    def __init__(self, routes: List[BaseRoute]):
+        self.root = Node()
+        self.size = len(routes)
+        # 编译时的路由列表及其 version
+        self.routes = routes
+        self.version = getattr(routes, "version", 0)
+        self.unindexed: List[BaseRoute] = []
+        self.unreachable: List[Tuple[BaseRoute, BaseRoute]] = []
+        self.shadowed: List[Tuple[BaseRoute, BaseRoute]] = []
+
+        compiled: List[Tuple[BaseRoute, List[Segment]]] = []
+        for route in routes:
+            segments = parse_route(route)
+            if segments is None:
+                self.unindexed.append(route)
+                continue
+            node = self.root
+            for segment in segments:
+                node = node.child(segment)
+            node.routes.append(route)
+            compiled.append((route, segments))
+
+        self._find_conflicts(compiled)
+
+    def candidates(self, path: str) -> List[BaseRoute]:
+        """ 按优先级返回可能匹配 path 的路由 """
+        found: List[BaseRoute] = []
+        self._walk(self.root, path[1:].split("/"), 0, found)
+        return found
+
+    def _walk(self, node: Node, parts: List[str], i: int, found: List[BaseRoute]) -> None:
+        if i == len(parts):
+            found.extend(node.routes)
+            return
+
+        part = parts[i]
+        child = node.static.get(part)
+        if child is not None:
+            self._walk(child, parts, i + 1, found)
+
+        for kind, _, values, child in node.typed:
+            if kind == PATH:
+                found.extend(child.routes)
+            elif not part:
+                continue
+            elif kind == STR or (kind == ENUM and part in values) or (kind == INT and _is_int(part)) \
+                    or (kind == FLOAT and _is_float(part)):
+                self._walk(child, parts, i + 1, found)
+
+    def _find_conflicts(self, compiled: List[Tuple[BaseRoute, List[Segment]]]) -> None:
+        for j, (later, later_segments) in enumerate(compiled):
+            for earlier, earlier_segments in compiled[:j]:
+                if not _methods_overlap(earlier, later):
+                    continue
+                if [s.key() for s in earlier_segments] == [s.key() for s in later_segments]:
+                    self.unreachable.append((earlier, later))
+                    break
+                if _linear_covers(earlier_segments, later_segments):
+                    self.shadowed.append((earlier, later))
+                    break
+
+    def report(self) -> str:
+        lines = [f"radix route index: {self.size} routes, {len(self.unindexed)} unindexed"]
+        for earlier, later in self.unreachable:
+            lines.append(f"  unreachable: {_describe(later)} (same signature as {_describe(earlier)})")
+        for earlier, later in self.shadowed:
+            lines.append(f"  shadowed:    {_describe(later)} by {_describe(earlier)} under first-match scan, "
+                         f"resolved by type in the index")
+        for route in self.unindexed:
+            lines.append(f"  unindexed:   {_describe(route)}")
+        return "\n".join(lines)
+
+
+def _methods_overlap(a: BaseRoute, b: BaseRoute) -> bool:
+    methods_a = getattr(a, "methods", None)
+    methods_b = getattr(b, "methods", None)
+    if not methods_a or not methods_b:
+        return True
+    return bool(methods_a & methods_b)
+
+
+def _linear_covers(earlier: List[Segment], later: List[Segment]) -> bool:
+    """ Starlette 线性匹配时（只看转换器的正则，不看注解），earlier 是否能匹配到 later 的全部请求 """
+    for i, seg in enumerate(earlier):
+        if seg.kind == PATH:
+            return True
+        if i >= len(later):
+            return False
+        other = later[i]
+        if seg.kind == STATIC:
+            if other.kind != STATIC or other.value != seg.value:
+                return False
+        elif seg.kind in (STR, ENUM):
+            # 注解为 Enum / int 时，Starlette 层面仍然是 str 转换器
+            if other.kind == PATH or (other.kind == STATIC and not other.value):
+                return False
+        elif seg.kind == INT:
+            if not (other.kind == INT or (other.kind == STATIC and other.value.isdigit())):
+                return False
+        elif seg.kind == FLOAT:
+            if other.kind not in (FLOAT, INT):
+                return False
+    return len(earlier) == len(later)
+
+
+def _describe(route: BaseRoute) -> str:
+    methods = ",".join(sorted(getattr(route, "methods", None) or [])) or "*"
+    name = getattr(route, "name", None) or type(route).__name__
+    return f"{methods} {_template(route)} ({name})"
+
+
+class RadixRouter(APIRouter):
+    """
+    用前缀树索引代替线性匹配的 APIRouter
+    路由列表变化（include_router、懒加载挂载、直接替换 / 调整 routes 中的路由等）后，下一次请求会自动重新编译索引
+    """
+    _index: Optional[RouteIndex] = None
+
+    @property
+    def routes(self) -> RouteList:
+        return self.__dict__["routes"]
+
+    @routes.setter
+    def routes(self, routes: List[BaseRoute]) -> None:
+        self.__dict__["routes"] = routes if isinstance(routes, RouteList) else RouteList(routes)
+
+    def compile(self) -> RouteIndex:
+        self._index = RouteIndex(self.routes)
+        logger.info(self._index.report())
+        return self._index
+
+    @property
+    def index(self) -> RouteIndex:
+        index = self._index
+        routes = self.routes
+        if index is None or index.routes is not routes or index.version != routes.version:
+            index = self.compile()
+        return index
+
+    def lookup(self, scope: Scope) -> Tuple[Optional[BaseRoute], Scope]:
+        """ 返回完全匹配的路由及其 child_scope，找不到时返回 (None, {}) """
+        for route in self.index.candidates(get_route_path(scope)):
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return route, child_scope
+        return None, {}
+
+    async def app(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await super().app(scope, receive, send)
+            return
+
+        if "router" not in scope:
+            scope["router"] = self
+
+        route, child_scope = self.lookup(scope)
+        if route is None:
+            # 405、重定向斜杠、未索引的路由、类型不符（返回 422）等情况交给原来的线性匹配
+            await super().app(scope, receive, send)
+            return
+
+        scope.update(child_scope)
+        await route.handle(scope, receive, send)
+
+
+def install_radix_router(app: FastAPI) -> RadixRouter:
+    """ 把 app 的路由器换成 RadixRouter，启动时编译索引并输出冲突报告 """
+    router = app.router
+    router.__class__ = RadixRouter
+    # 换成记录修改次数的列表
+    router.routes = router.__dict__["routes"]
+    # Router.__init__ 里已经把 self.app 绑定到了 middleware_stack，需要重新指向新的 app
+    router.middleware_stack = router.app
+    router.on_startup.append(router.compile)
+    return router
+
+
+def linear_lookup(router: Router, scope: Scope) -> Optional[BaseRoute]:
+    """ Starlette 原来的匹配方式，供基准测试对比 """
+    for route in router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+    return None
@@ -0,0 +1,183 @@
+"""
+课程路由注册表
+runserver 不再 `from lessons.xxx import *`（每个 worker 启动时都要导入全部课程模块，而且课程模块反过来 import runserver.app，形成循环导入），
+改为在这里登记「模块路径 + 前缀」，由注册表决定何时导入：
+    1、预加载（allow-list）：启动时立即导入，并通过 include_router 挂到主 app 上（会出现在 /docs 中）
+    2、懒加载：先挂一个占位的 Mount，第一次有请求命中该前缀时才导入模块
+课程模块可以暴露 `router = APIRouter()`，也可以保留自己的 `app = FastAPI()`（方便 `uvicorn lessons.xxx:app` 单独运行），
+注册表优先使用 router，没有 router 时把 app 作为子应用挂载。
+Starlette 不会把 lifespan 事件转发给 Mount 的子应用，子应用的 startup / shutdown 事件（例如 core.openapi 预先构建文档）由注册表执行：
+预加载的在主 app 启动时，懒加载的在导入之后、处理第一个请求之前；已经启动的子应用在主 app 关闭时执行 shutdown。
+"""
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import APIRouter, FastAPI
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# 环境变量指定预加载的模块，逗号分隔；"*" 表示全部预加载
+PRELOAD_ENV = "LESSONS_PRELOAD"
+
+
+class LessonEntry:
+    def __init__(self, module: str, prefix: str):
+        self.module = module
+        self.prefix = prefix
+        self.target: Optional[ASGIApp] = None
+        self.loaded_at: Optional[str] = None     # "startup" | "lazy"
+        self.import_ms: float = 0.0
+        self.new_modules: int = 0                # 本次导入新增的 sys.modules 数量
+        self.alloc_kb: Optional[float] = None    # 只有开启 tracemalloc 时才有
+        self.started = False                     # 子应用的 startup 事件是否已经执行
+        self._lock = threading.Lock()
+        self._startup_lock = asyncio.Lock()
+
+    def load(self, when: str) -> ASGIApp:
+        """ 导入模块并返回 router / app，只会真正导入一次 """
+        if self.target is not None:
+            return self.target
+
+        with self._lock:
+            if self.target is not None:
+                return self.target
+
+            modules_before = len(sys.modules)
+            tracing = tracemalloc.is_tracing()
+            mem_before = tracemalloc.get_traced_memory()[0] if tracing else 0
+            start = time.perf_counter()
+
+            module = importlib.import_module(self.module)
+
+            self.import_ms = (time.perf_counter() - start) * 1000
+            self.new_modules = len(sys.modules) - modules_before
+            if tracing:
+                self.alloc_kb = (tracemalloc.get_traced_memory()[0] - mem_before) / 1024
+
+            target = getattr(module, "router", None) or getattr(module, "app", None)
+            if target is None:
+                raise RuntimeError(f"{self.module} 既没有 router 也没有 app，无法挂载")
+
+            self.loaded_at = when
+            self.target = target
+            logger.info("lesson %s loaded (%s) in %.1fms", self.module, when, self.import_ms)
+            return target
+
+    async def startup(self) -> None:
+        """ 执行子应用的 startup 事件，只执行一次；APIRouter 的事件在 include_router 时已经合并到主 app 上 """
+        if self.started:
+            return
+        async with self._startup_lock:
+            if self.started or not isinstance(self.target, FastAPI):
+                self.started = True
+                return
+            await self.target.router.startup()
+            self.started = True
+
+    async def shutdown(self) -> None:
+        if self.started and isinstance(self.target, FastAPI):
+            await self.target.router.shutdown()
+        self.started = False
+
+
+class LazyLessonApp:
+    """ 占位的 ASGI 应用，第一次被调用时才导入课程模块 """
+
+    def __init__(self, entry: LessonEntry):
+        self.entry = entry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        entry = self.entry
+        target = entry.target or entry.load("lazy")
+        if not entry.started:
+            await entry.startup()
+        await target(scope, receive, send)
+
+
+class LessonRegistry:
+    def __init__(self):
+        self._entries: Dict[str, LessonEntry] = {}
+
+    def register(self, module: str, prefix: Optional[str] = None) -> LessonEntry:
+        """
+        登记一个课程模块
+        :param module: 模块路径，如 "lessons.body_params"
+        :param prefix: 挂载前缀，默认 "/lessons/body_params"；"" 表示挂在根路径上（只能预加载）
+        """
+        if prefix is None:
+            prefix = "/" + module.replace(".", "/")
+        if prefix and not prefix.startswith("/"):
+            raise ValueError(f"prefix 必须以 / 开头: {prefix!r}")
+
+        entry = LessonEntry(module, prefix.rstrip("/"))
+        self._entries[module] = entry
+        return entry
+
+    @property
+    def entries(self) -> List[LessonEntry]:
+        return list(self._entries.values())
+
+    def _resolve_preload(self, preload: Iterable[str]) -> set:
+        env = os.environ.get(PRELOAD_ENV)
+        names = set(preload)
+        if env:
+            names.update(name.strip() for name in env.split(",") if name.strip())
+        if "*" in names:
+            return set(self._entries)
+        return names
+
+    def install(self, app: FastAPI, preload: Iterable[str] = ()) -> None:
+        """
+        把登记的模块挂到 app 上
+        注意：挂在根路径（prefix=""）的模块必须预加载，因为空前缀的 Mount 会拦截所有请求
+        """
+        names = self._resolve_preload(preload)
+        unknown = names - set(self._entries)
+        if unknown:
+            raise ValueError(f"预加载的模块未登记: {sorted(unknown)}")
+
+        for entry in self._entries.values():
+            if entry.module in names or not entry.prefix:
+                target = entry.load("startup")
+                if isinstance(target, APIRouter):
+                    app.include_router(target, prefix=entry.prefix)
+                else:
+                    app.mount(entry.prefix or "/", target)
+            else:
+                app.router.routes.append(Mount(entry.prefix, app=LazyLessonApp(entry)))
+
+        async def startup() -> None:
+            for entry in self._entries.values():
+                if entry.target is not None:
+                    await entry.startup()
+
+        async def shutdown() -> None:
+            for entry in self._entries.values():
+                await entry.shutdown()
+
+        app.add_event_handler("startup", startup)
+        app.add_event_handler("shutdown", shutdown)
+        logger.info("lesson registry installed:\n%s", self.report())
+
+    def report(self) -> str:
+        """ 每个模块的导入耗时报告，懒加载还未命中的显示为 pending """
+        lines = [f"{'module':<40} {'prefix':<36} {'loaded':<8} {'ms':>8} {'modules':>8} {'alloc_kb':>9}"]
+        total = 0.0
+        for e in self._entries.values():
+            alloc = f"{e.alloc_kb:.1f}" if e.alloc_kb is not None else "-"
+            lines.append(
+                f"{e.module:<40} {e.prefix or '/':<36} {e.loaded_at or 'pending':<8} "
+                f"{e.import_ms:>8.1f} {e.new_modules:>8} {alloc:>9}"
+            )
+            total += e.import_ms
+        lines.append(f"total import: {total:.1f}ms")
+        return "\n".join(lines)
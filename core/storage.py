@@ -0,0 +1,755 @@
+"""
+可插拔的异步存储
+handle_errors.py、partial_update.py、response_model.py、jsonable_encoder.py 都用模块级 dict（items、fake_db）当数据库，
+每个 uvicorn worker 各有一份，重启就丢失。这里把它们抽象成 ItemStore，通过 Depends 注入视图函数：
+    MemoryStore: 直接包装原来的 dict（默认，行为不变）
+    SQLiteStore: 多个 worker 共享同一个 SQLite 文件（WAL 模式）
+        1、有上限的连接池，每个连接在线程池中执行（sqlite3 是阻塞的），SQL 语句固定，由 sqlite3 的语句缓存复用预编译结果
+        2、写入先进入待写队列，batch_window 秒内（或攒够 batch_size 条）合并成一个事务 executemany，写入完成后 put() 才返回
+        3、读取时先查待写队列，保证读到自己刚写入的数据
+    SharedMemoryStore: 多个 worker 共享同一个 mmap 文件（默认在 /dev/shm），适合读多写少的参考数据
+        1、value 以紧凑的 JSON bytes 保存在共享内存中，哈希索引也在共享内存中，所有 worker 共用一份，worker 的内存不随数据量增加
+        2、读不加锁：读取前后比较文件头中的版本号 seq（seqlock），写入时版本号变化的读取会重读，读取约几微秒
+        3、写加 fcntl 文件锁，只追加；一个 worker 的修改其他 worker 下一次读取时就能看到
+page(after, before, limit) 按 key 排序做 keyset 分页（core.pagination 使用）：
+    MemoryStore、SharedMemoryStore 维护一份有序的 key 列表，用 bisect 定位；SQLiteStore 用主键 (namespace, key) 做范围查询，
+    两者的代价都只和页大小有关，与翻到第几页无关
+
+通过环境变量选择后端：
+    STORAGE_URL=memory://                                       （默认）
+    STORAGE_URL=sqlite:///tmp/lessons.db?pool_size=4&batch_window=0.002
+    STORAGE_URL=columnar://                                     （按列保存在内存中，见 core.columnar）
+    STORAGE_URL=shm:///dev/shm/lessons?size=16777216                （文件为 /dev/shm/lessons.<namespace>，size 为初始大小）
+用法：
+    items_db = StoreProvider("handle_errors.items", initial=items)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: str, store: ItemStore = Depends(items_db)):
+        return await store.get(item_id)
+
+    install_storage(app)    # 应用关闭时关闭所有 StoreProvider 创建的存储
+"""
+import abc
+import asyncio
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import anyio
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+STORAGE_URL_ENV = "STORAGE_URL"
+SHM_DIR = "/dev/shm"
+
+
+def _dumps(value: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class ItemStore(abc.ABC):
+    """ 以字符串为 key、JSON 兼容的 dict 为 value 的异步存储 """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {key: value for key in keys if (value := await self.get(key)) is not None}
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        await self.put_many({key: value})
+
+    @abc.abstractmethod
+    async def put_many(self, values: Dict[str, Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def contains(self, key: str) -> bool:
+        return await self.get(key) is not None
+
+    @abc.abstractmethod
+    async def seed(self, values: Dict[str, Dict[str, Any]]) -> None:
+        """ 写入初始数据，已存在的 key 不覆盖 """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def page(
+        self, after: Optional[str] = None, before: Optional[str] = None, limit: int = 10
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        按 key 升序分页：after 不为空时返回 key > after 的前 limit 条；
+        before 不为空时返回 key < before 的最后 limit 条（仍按升序排列）
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryStore(ItemStore):
+    def __init__(self, data: Optional[Dict[str, Dict[str, Any]]] = None):
+        # 不复制，直接使用模块中的 dict，其他代码读到的仍然是同一份数据
+        self.data = data if data is not None else {}
+        # 分页用的有序 key 列表，第一次分页时才建立；put_many / delete 时同步维护，
+        # 其他代码直接修改 dict 导致数量对不上时重新建立
+        self._keys: Optional[List[str]] = None
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.data.get(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        data = self.data
+        return {key: data[key] for key in keys if key in data}
+
+    async def put_many(self, values: Dict[str, Dict[str, Any]]) -> None:
+        if self._keys is not None:
+            new_keys = [key for key in values if key not in self.data]
+            if len(new_keys) > 64:
+                # 新 key 很多时逐个 insort 比重新排序还慢，下次分页时再重建
+                self._keys = None
+            else:
+                for key in new_keys:
+                    insort(self._keys, key)
+        self.data.update(values)
+
+    async def delete(self, key: str) -> None:
+        if self._keys is not None and key in self.data:
+            index = bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+        self.data.pop(key, None)
+
+    async def contains(self, key: str) -> bool:
+        return key in self.data
+
+    async def seed(self, values: Dict[str, Dict[str, Any]]) -> None:
+        for key, value in values.items():
+            self.data.setdefault(key, value)
+
+    def _sorted_keys(self) -> List[str]:
+        if self._keys is None or len(self._keys) != len(self.data):
+            self._keys = sorted(self.data)
+        return self._keys
+
+    async def page(
+        self, after: Optional[str] = None, before: Optional[str] = None, limit: int = 10
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        data = self.data
+        keys = self._sorted_keys()
+        if before is not None:
+            end = bisect_left(keys, before)
+            selected = keys[max(end - limit, 0):end]
+        else:
+            start = bisect_right(keys, after) if after is not None else 0
+            selected = keys[start:start + limit]
+        rows = [(key, data[key]) for key in selected if key in data]
+        if len(rows) != len(selected):
+            # 有 key 被直接从 dict 中删除了，重建索引再查一次
+            self._keys = None
+            return await self.page(after, before, limit)
+        return rows
+
+
+class SQLiteStore(ItemStore):
+    CREATE_SQL = (
+        "CREATE TABLE IF NOT EXISTS kv ("
+        "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (namespace, key)"
+        ") WITHOUT ROWID"
+    )
+    GET_SQL = "SELECT value FROM kv WHERE namespace = ? AND key = ?"
+    PUT_SQL = "INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)"
+    SEED_SQL = "INSERT OR IGNORE INTO kv (namespace, key, value) VALUES (?, ?, ?)"
+    DELETE_SQL = "DELETE FROM kv WHERE namespace = ? AND key = ?"
+    PAGE_AFTER_SQL = "SELECT key, value FROM kv WHERE namespace = ? AND key > ? ORDER BY key LIMIT ?"
+    PAGE_BEFORE_SQL = "SELECT key, value FROM kv WHERE namespace = ? AND key < ? ORDER BY key DESC LIMIT ?"
+    PAGE_FIRST_SQL = "SELECT key, value FROM kv WHERE namespace = ? ORDER BY key LIMIT ?"
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        pool_size: int = 4,
+        batch_window: float = 0.002,
+        batch_size: int = 256,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.pool_size = pool_size
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self._pool: Optional[asyncio.Queue] = None
+        self._created = 0
+        self._connections: List[sqlite3.Connection] = []
+        # 待写队列：key -> 序列化后的 value（None 表示删除）
+        self._pending: Dict[str, Optional[str]] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # 同一时间只有一个事务在写：两个事务各自在不同的连接上提交，先后顺序不确定，旧值可能覆盖新值
+        self._flush_lock = asyncio.Lock()
+
+    # ---------------- 连接池 ----------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=32, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(self.CREATE_SQL)
+        return conn
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[sqlite3.Connection]:
+        if self._pool is None:
+            self._pool = asyncio.Queue()
+        if self._pool.empty() and self._created < self.pool_size:
+            self._created += 1
+            try:
+                conn = await anyio.to_thread.run_sync(self._connect)
+            except BaseException:
+                self._created -= 1
+                raise
+            self._connections.append(conn)
+        else:
+            conn = await self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put_nowait(conn)
+
+    async def _run(self, func, *args):
+        async with self.connection() as conn:
+            return await anyio.to_thread.run_sync(func, conn, *args)
+
+    # ---------------- 读 ----------------
+    def _select(self, conn: sqlite3.Connection, keys: List[str]) -> Dict[str, str]:
+        rows = {}
+        for key in keys:
+            row = conn.execute(self.GET_SQL, (self.namespace, key)).fetchone()
+            if row is not None:
+                rows[key] = row[0]
+        return rows
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        result: Dict[str, str] = {}
+        missing = []
+        for key in keys:
+            if key in self._pending:
+                if self._pending[key] is not None:
+                    result[key] = self._pending[key]
+            else:
+                missing.append(key)
+        if missing:
+            result.update(await self._run(self._select, missing))
+        return {key: json.loads(value) for key, value in result.items()}
+
+    def _page(self, conn: sqlite3.Connection, after: Optional[str], before: Optional[str],
+              limit: int) -> List[Tuple[str, str]]:
+        if before is not None:
+            rows = conn.execute(self.PAGE_BEFORE_SQL, (self.namespace, before, limit)).fetchall()
+            rows.reverse()
+        elif after is not None:
+            rows = conn.execute(self.PAGE_AFTER_SQL, (self.namespace, after, limit)).fetchall()
+        else:
+            rows = conn.execute(self.PAGE_FIRST_SQL, (self.namespace, limit)).fetchall()
+        return rows
+
+    async def page(
+        self, after: Optional[str] = None, before: Optional[str] = None, limit: int = 10
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        if self._waiters:
+            # 先把待写队列写进去，分页结果才包含刚写入的数据
+            await self._flush()
+        rows = await self._run(self._page, after, before, limit)
+        return [(key, json.loads(value)) for key, value in rows]
+
+    # ---------------- 批量写 ----------------
+    async def put_many(self, values: Dict[str, Dict[str, Any]]) -> None:
+        for key, value in values.items():
+            self._pending[key] = json.dumps(value)
+        await self._wait_flush()
+
+    async def delete(self, key: str) -> None:
+        self._pending[key] = None
+        await self._wait_flush()
+
+    async def _wait_flush(self) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        if len(self._pending) >= self.batch_size:
+            await self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        await future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        self._flush_task = None
+        await self._flush()
+
+    def _write(self, conn: sqlite3.Connection, pending: Dict[str, Optional[str]]) -> None:
+        upserts = [(self.namespace, key, value) for key, value in pending.items() if value is not None]
+        deletes = [(self.namespace, key) for key, value in pending.items() if value is None]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if upserts:
+                conn.executemany(self.PUT_SQL, upserts)
+            if deletes:
+                conn.executemany(self.DELETE_SQL, deletes)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    async def _flush(self) -> None:
+        """ 把待写队列合并成一个事务写入，结果（或异常）通知给所有等待的 put() """
+        async with self._flush_lock:
+            await self._flush_locked()
+
+    async def _flush_locked(self) -> None:
+        # 等锁期间上一个事务可能已经把这些 put 写进去了
+        if not self._waiters:
+            return
+        snapshot, waiters = dict(self._pending), self._waiters
+        self._waiters = []
+        error: Optional[BaseException] = None
+        try:
+            await self._run(self._write, snapshot)
+        except Exception as exc:
+            error = exc
+        finally:
+            # 写入期间可能有新的 put 覆盖了同一个 key，只删除已经写入的那个版本
+            for key, value in snapshot.items():
+                if key in self._pending and self._pending[key] is value:
+                    del self._pending[key]
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if error is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(error)
+
+    async def seed(self, values: Dict[str, Dict[str, Any]]) -> None:
+        rows = [(self.namespace, key, json.dumps(value)) for key, value in values.items()]
+
+        def insert(conn: sqlite3.Connection) -> None:
+            conn.executemany(self.SEED_SQL, rows)
+
+        await self._run(insert)
+
+    async def close(self) -> None:
+        if self._waiters:
+            await self._flush()
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+        self._pool = None
+        self._created = 0
+
+
+class _Busy(Exception):
+    """ SharedMemoryStore 需要等待：文件锁被其他写入者持有，或者 seq 长时间是奇数（写入者可能没写完就退出了） """
+
+
+class SharedMemoryStore(ItemStore):
+    """
+    多个 worker 共享的 mmap 文件（默认放在 /dev/shm，即共享内存），数据和索引都在文件中，worker 中不保存任何副本
+    文件布局：
+        文件头（magic、seq、data_end、capacity、slots、used）
+        哈希表：slots 个 u64，记录的偏移（0 表示空），key 用 crc32 定位、线性探测（每个进程的 hash() 不同，不能用）
+        只追加的记录：[key 长度 u32][value 长度 u32][key][value]，value 是紧凑的 JSON（有 orjson 时用 orjson），
+        长度为 0xFFFFFFFF 表示已删除
+    读（不加锁，seqlock）：读取前后比较文件头中的 seq，seq 为奇数（正在写）或前后不一致时重读；每次读取都从共享内存解码
+    写（fcntl 文件锁）：seq 加 1 -> 追加记录、修改哈希表中的偏移 -> seq 再加 1；同一个 key 再次写入时追加新记录，槽位指向新记录。
+        空间不够或哈希表过满时重建：只保留每个 key 最新的记录，需要时把文件、哈希表扩大一倍；其他进程发现文件变大后重新 mmap
+        写先在事件循环中尝试不阻塞地加锁（LOCK_NB），锁被占用时改到线程池中等待，事件循环不会等文件锁；
+        同一进程的多个线程共用一个 fd，flock 挡不住它们，另加一个线程锁
+    写入进程中途退出（seq 停在奇数）：
+        读最多自旋 SPIN_SECONDS，之后在线程池中加文件锁再读；拿到文件锁说明没有活着的写入者，
+        这时（写入时也一样）按顺序扫描 data_end 之前的记录，重建哈希表，丢弃没有写完的那次写入，再把 seq 改回偶数
+    """
+    MAGIC = b"LSNSHM02"
+    HEADER = struct.Struct("<8sQQQQQ")
+    SLOT = struct.Struct("<Q")
+    RECORD = struct.Struct("<II")
+    DELETED = 0xFFFFFFFF
+    MIN_SLOTS = 1024
+    SPIN_SECONDS = 0.001
+
+    def __init__(self, path: str, size: int = 16 * 1024 * 1024):
+        if fcntl is None:
+            raise RuntimeError("SharedMemoryStore 需要 fcntl（仅支持 Unix）")
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._thread_lock = threading.Lock()
+        with self._locked():
+            if os.fstat(self._fd).st_size < self.HEADER.size:
+                capacity = max(size, self._data_start(self.MIN_SLOTS) * 2)
+                os.ftruncate(self._fd, capacity)
+                self._mm = mmap.mmap(self._fd, 0)
+                self.HEADER.pack_into(self._mm, 0, self.MAGIC, 0, self._data_start(self.MIN_SLOTS), capacity,
+                                      self.MIN_SLOTS, 0)
+            else:
+                self._mm = mmap.mmap(self._fd, 0)
+                if self._mm[:8] != self.MAGIC:
+                    raise ValueError(f"不是 SharedMemoryStore 文件: {path}")
+        # 分页用的有序 key 列表和生成它时的 seq
+        self._keys: Optional[List[str]] = None
+        self._keys_seq = -1
+
+    def _data_start(self, slots: int) -> int:
+        return self.HEADER.size + slots * self.SLOT.size
+
+    @contextmanager
+    def _locked(self, blocking: bool = True) -> Iterator[None]:
+        """ blocking=False 时锁被占用立即抛出 _Busy """
+        if not self._thread_lock.acquire(blocking):
+            raise _Busy
+        try:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise _Busy
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+    def _remap(self) -> None:
+        # 不关闭旧的 mmap：其他线程可能正在读它，读完之后比较 seq 会重读；没有引用时自动释放
+        self._mm = mmap.mmap(self._fd, 0)
+
+    def _header(self) -> Tuple[int, int, int, int, int]:
+        """
+        返回 (seq, data_end, capacity, slots, used)；其他进程正在写时等待，文件变大时重新 mmap
+        seq 超过 SPIN_SECONDS 仍是奇数时抛出 _Busy，由调用者在线程池中加文件锁后重试（_with_lock）
+        """
+        deadline = None
+        while True:
+            _, seq, end, capacity, slots, used = self.HEADER.unpack_from(self._mm, 0)
+            if seq & 1:
+                if deadline is None:
+                    deadline = time.monotonic() + self.SPIN_SECONDS
+                elif time.monotonic() > deadline:
+                    raise _Busy
+                time.sleep(0)
+                continue
+            if capacity != len(self._mm):
+                self._remap()
+                continue
+            return seq, end, capacity, slots, used
+
+    def _repair(self) -> None:
+        """ 持有文件锁时调用：seq 为奇数说明上一个写入者没写完就退出了，按顺序扫描记录重建哈希表 """
+        if os.fstat(self._fd).st_size != len(self._mm):
+            self._remap()
+        mm, record = self._mm, self.RECORD
+        _, seq, end, capacity, slots, _ = self.HEADER.unpack_from(mm, 0)
+        if not seq & 1:
+            return
+        capacity = len(mm)
+        start = self._data_start(slots)
+        end = min(end, capacity)
+        latest: Dict[bytes, int] = {}
+        offset = start
+        # 记录只追加，同一个 key 后面的记录更新；data_end 在每次写入的最后才更新，之后的记录都属于没写完的写入
+        while offset + record.size <= end:
+            key_size, value_size = record.unpack_from(mm, offset)
+            size = record.size + key_size + (0 if value_size == self.DELETED else value_size)
+            if offset + size > end:
+                break
+            latest[bytes(mm[offset + record.size:offset + record.size + key_size])] = offset
+            offset += size
+        if offset != end:
+            logger.error("shared store %s: records after offset %s are corrupt and were dropped", self.path, offset)
+        mm[self.HEADER.size:start] = bytes(start - self.HEADER.size)
+        for key, position in latest.items():
+            slot_position, _ = self._find(key, slots)
+            self.SLOT.pack_into(mm, slot_position, position)
+        self.HEADER.pack_into(mm, 0, self.MAGIC, seq + 1, offset, capacity, slots, len(latest))
+        logger.warning("shared store %s: repaired after an interrupted write (%s keys)", self.path, len(latest))
+
+    def _with_lock(self, func, *args):
+        """ 加文件锁（修复中断的写入）后执行 func，在线程池中调用 """
+        with self._locked():
+            self._repair()
+            return func(*args)
+
+    async def _call(self, func, *args):
+        """ 读：通常直接执行；写入者停在中途时改为在线程池中加锁执行 """
+        try:
+            return func(*args)
+        except _Busy:
+            return await anyio.to_thread.run_sync(self._with_lock, func, *args)
+
+    async def _write_async(self, values: Dict[str, Optional[bytes]], only_new: bool = False) -> None:
+        try:
+            self._write(values, only_new, blocking=False)
+        except _Busy:
+            await anyio.to_thread.run_sync(self._write, values, only_new)
+
+    def _find(self, key: bytes, slots: int) -> Tuple[int, int]:
+        """ 返回 (槽位, 记录偏移)，没有这个 key 时返回第一个空槽位和 0 """
+        mm, slot, record = self._mm, self.SLOT, self.RECORD
+        mask = slots - 1
+        index = zlib.crc32(key) & mask
+        size = len(key)
+        while True:
+            position = self.HEADER.size + index * slot.size
+            offset = slot.unpack_from(mm, position)[0]
+            if offset == 0:
+                return position, 0
+            key_size = record.unpack_from(mm, offset)[0]
+            start = offset + record.size
+            if key_size == size and mm[start:start + size] == key:
+                return position, offset
+            index = (index + 1) & mask
+
+    def _value(self, offset: int) -> Optional[bytes]:
+        key_size, value_size = self.RECORD.unpack_from(self._mm, offset)
+        if value_size == self.DELETED:
+            return None
+        start = offset + self.RECORD.size + key_size
+        return self._mm[start:start + value_size]
+
+    def _read(self, key: str) -> Optional[bytes]:
+        key_bytes = key.encode()
+        while True:
+            seq, _, _, slots, _ = self._header()
+            try:
+                _, offset = self._find(key_bytes, slots)
+                value = self._value(offset) if offset else None
+            except (struct.error, ValueError):
+                # 读到了正在改写的数据，下面比较 seq 后重读
+                value = None
+            if self.HEADER.unpack_from(self._mm, 0)[1] == seq:
+                return value
+
+    def _live(self, slots: int) -> Iterator[Tuple[bytes, bytes]]:
+        """ 所有未删除的 (key, value)，持有文件锁或在 seqlock 内调用 """
+        mm, record = self._mm, self.RECORD
+        for index in range(slots):
+            offset = self.SLOT.unpack_from(mm, self.HEADER.size + index * self.SLOT.size)[0]
+            if offset:
+                key_size, value_size = record.unpack_from(mm, offset)
+                if value_size != self.DELETED:
+                    start = offset + record.size
+                    yield mm[start:start + key_size], mm[start + key_size:start + key_size + value_size]
+
+    def _rebuild(self, seq: int, slots: int, capacity: int, extra_keys: int, extra_bytes: int) -> None:
+        """ 持有文件锁、seq 为奇数时调用：丢弃旧记录和已删除的 key，需要时扩大哈希表和文件 """
+        live = list(self._live(slots))
+        while slots < (len(live) + extra_keys) * 2:
+            slots *= 2
+        data = b"".join(self.RECORD.pack(len(key), len(value)) + key + value for key, value in live)
+        start = self._data_start(slots)
+        while capacity < start + (len(data) + extra_bytes) * 2:
+            capacity *= 2
+        if capacity != len(self._mm):
+            os.ftruncate(self._fd, capacity)
+            self._remap()
+        mm = self._mm
+        mm[self.HEADER.size:start] = bytes(start - self.HEADER.size)
+        end = start
+        for key, value in live:
+            position, _ = self._find(key, slots)
+            self.SLOT.pack_into(mm, position, end)
+            size = self.RECORD.size + len(key) + len(value)
+            mm[end:end + size] = self.RECORD.pack(len(key), len(value)) + key + value
+            end += size
+        self.HEADER.pack_into(mm, 0, self.MAGIC, seq, end, capacity, slots, len(live))
+
+    def _write(self, values: Dict[str, Optional[bytes]], only_new: bool = False, blocking: bool = True) -> None:
+        """ value 为 None 表示删除；only_new=True 时不覆盖已有的 key（seed）；blocking=False 时锁被占用抛出 _Busy """
+        items = [(key.encode(), value) for key, value in values.items()]
+        size = sum(self.RECORD.size + len(key) + len(value or b"") for key, value in items)
+        with self._locked(blocking):
+            self._repair()
+            seq, end, capacity, slots, used = self._header()
+            seq += 1
+            self.SLOT.pack_into(self._mm, 8, seq)
+            try:
+                if end + size > capacity or (used + len(items)) * 2 > slots:
+                    self._rebuild(seq, slots, capacity, len(items), size)
+                    _, seq, end, capacity, slots, used = self.HEADER.unpack_from(self._mm, 0)
+                mm = self._mm
+                for key, value in items:
+                    position, offset = self._find(key, slots)
+                    if offset:
+                        exists = self.RECORD.unpack_from(mm, offset)[1] != self.DELETED
+                        if (only_new and exists) or (value is None and not exists):
+                            continue
+                    elif value is None:
+                        continue
+                    else:
+                        used += 1
+                    if value is None:
+                        record = self.RECORD.pack(len(key), self.DELETED) + key
+                    else:
+                        record = self.RECORD.pack(len(key), len(value)) + key + value
+                    mm[end:end + len(record)] = record
+                    self.SLOT.pack_into(mm, position, end)
+                    end += len(record)
+            finally:
+                self.HEADER.pack_into(self._mm, 0, self.MAGIC, seq + 1, end, capacity, slots, used)
+
+    def _read_many(self, keys: List[str]) -> Dict[str, bytes]:
+        return {key: value for key in keys if (value := self._read(key)) is not None}
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self._call(self._read, key)
+        return _loads(value) if value is not None else None
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {key: _loads(value) for key, value in (await self._call(self._read_many, keys)).items()}
+
+    async def contains(self, key: str) -> bool:
+        return await self._call(self._read, key) is not None
+
+    async def put_many(self, values: Dict[str, Dict[str, Any]]) -> None:
+        await self._write_async({key: _dumps(value) for key, value in values.items()})
+
+    async def delete(self, key: str) -> None:
+        await self._write_async({key: None})
+
+    async def seed(self, values: Dict[str, Dict[str, Any]]) -> None:
+        await self._write_async({key: _dumps(value) for key, value in values.items()}, only_new=True)
+
+    def _sorted_keys(self) -> List[str]:
+        while True:
+            seq, _, _, slots, _ = self._header()
+            if seq == self._keys_seq:
+                return self._keys
+            try:
+                keys = sorted(key.decode() for key, _ in self._live(slots))
+            except (struct.error, ValueError, UnicodeDecodeError):
+                keys = None
+            if self.HEADER.unpack_from(self._mm, 0)[1] == seq:
+                self._keys, self._keys_seq = keys, seq
+                return keys
+
+    async def page(
+        self, after: Optional[str] = None, before: Optional[str] = None, limit: int = 10
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        keys = await self._call(self._sorted_keys)
+        if before is not None:
+            end = bisect_left(keys, before)
+            selected = keys[max(end - limit, 0):end]
+        else:
+            start = bisect_right(keys, after) if after is not None else 0
+            selected = keys[start:start + limit]
+        values = await self.get_many(selected)
+        return [(key, values[key]) for key in selected if key in values]
+
+    async def close(self) -> None:
+        if self._fd >= 0:
+            self._mm.close()
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_store(namespace: str, url: Optional[str] = None) -> ItemStore:
+    url = url or os.environ.get(STORAGE_URL_ENV, "memory://")
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryStore()
+    if parsed.scheme == "sqlite":
+        options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        path = parsed.path or ":memory:"
+        return SQLiteStore(
+            path=path,
+            namespace=namespace,
+            # 内存数据库每个连接各是一份，只能用一个连接
+            pool_size=1 if path == ":memory:" else int(options.get("pool_size", 4)),
+            batch_window=float(options.get("batch_window", 0.002)),
+            batch_size=int(options.get("batch_size", 256)),
+        )
+    if parsed.scheme == "columnar":
+        from core.columnar import ColumnarStore  # core.columnar 依赖本模块
+
+        return ColumnarStore()
+    if parsed.scheme == "shm":
+        options = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        prefix = parsed.path or os.path.join(SHM_DIR if os.path.isdir(SHM_DIR) else tempfile.gettempdir(), "lessons")
+        # 每个命名空间一个文件
+        return SharedMemoryStore(f"{prefix}.{namespace}", size=int(options.get("size", 16 * 1024 * 1024)))
+    raise ValueError(f"不支持的存储: {url}")
+
+
+class StoreProvider:
+    """
+    用作 Depends 的存储提供者
+    第一次调用时才创建存储并写入初始数据（uvicorn 多 worker 时，每个 worker fork 之后各自建立连接）
+    """
+    instances: "List[StoreProvider]" = []
+
+    def __init__(self, namespace: str, initial: Optional[Dict[str, Dict[str, Any]]] = None, url: Optional[str] = None):
+        self.namespace = namespace
+        self.initial = initial if initial is not None else {}
+        self.url = url
+        self.store: Optional[ItemStore] = None
+        self._lock = asyncio.Lock()
+        StoreProvider.instances.append(self)
+
+    async def __call__(self) -> ItemStore:
+        if self.store is not None:
+            return self.store
+        async with self._lock:
+            if self.store is None:
+                store = create_store(self.namespace, self.url)
+                if isinstance(store, MemoryStore):
+                    store.data = self.initial
+                else:
+                    await store.seed(self.initial)
+                self.store = store
+        return self.store
+
+    async def close(self) -> None:
+        if self.store is not None:
+            await self.store.close()
+            self.store = None
+
+
+async def close_stores() -> None:
+    """ 关闭所有已经创建的存储（写完 SQLiteStore 的待写队列、关闭连接） """
+    for provider in list(StoreProvider.instances):
+        await provider.close()
+
+
+def install_storage(app) -> None:
+    """ 应用关闭时关闭所有存储；课程模块大多作为子应用懒加载，它们自己的 shutdown 事件不会执行，所以挂在主应用上 """
+    app.add_event_handler("shutdown", close_stores)
@@ -0,0 +1,168 @@
+"""
+流式 JSON 响应（NDJSON / 分块输出的 JSON 数组）
+返回 list 时，FastAPI 要先把所有元素都生成出来、jsonable_encoder 一遍、json.dumps 成一个完整的 bytes，才开始发送第一个字节：
+limit=100000 时首字节时间和峰值内存都随 limit 线性增长。
+
+StreamingJSONResponse 接收同步或异步的可迭代对象（通常是生成器），每生成一个元素就序列化一个：
+    1、format="ndjson"：每个元素一行（application/x-ndjson）
+       format="array"：输出一个普通的 JSON 数组，客户端看到的和返回 list 一样；envelope="files" 时输出 {"files": [...]}
+    2、元素是 pydantic 模型或者指定了 model 时用预编译的 TypeAdapter.dump_json（core.serializers），否则用 core.encoders.jsonable_encoder
+    3、序列化好的元素攒够 chunk_size 字节发送一次（第一个元素立即发送，首字节时间不受 limit 影响）；
+       同步生成器每次在线程池里取一批元素，而不是每个元素切换一次线程
+    4、背压：每个分块都要等 send 返回才继续从生成器取数据，uvicorn 的写缓冲区满了（客户端读得慢）时 send 会等待，
+       生成器也就停在原处，内存中最多只有一个分块；客户端断开时生成器会被关闭
+用法：
+    return StreamingJSONResponse(iter_items(skip, limit))
+    return stream_json(request, iter_items(skip, limit))     # 按 Accept 头选择 ndjson / array
+"""
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Union
+
+from anyio import to_thread
+from fastapi import Request
+from pydantic import BaseModel
+from starlette.responses import StreamingResponse
+
+from core.encoders import jsonable_encoder
+from core.serializers import get_serializer
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+CHUNK_SIZE = 64 * 1024
+# 同步生成器每次在线程池中最多取多少个元素
+THREAD_BATCH = 1024
+
+_STOP = object()
+
+
+def _dumps(value: Any) -> bytes:
+    # 与 JSONResponse.render 的格式一致
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class ItemEncoder:
+    """ 把单个元素编码成 bytes；同一个模型的序列化器只取一次 """
+
+    def __init__(self, model: Any = None):
+        self.model = model
+        self._serializer = get_serializer(model) if model is not None else None
+        self._last_type: Optional[type] = None
+        self._last_serializer = None
+
+    def __call__(self, item: Any) -> bytes:
+        if self._serializer is not None:
+            return self._serializer.dumps(item)
+        if isinstance(item, BaseModel):
+            cls = type(item)
+            if cls is not self._last_type:
+                self._last_type = cls
+                self._last_serializer = get_serializer(cls)
+            return self._last_serializer.adapter.dump_json(item)
+        return _dumps(jsonable_encoder(item))
+
+
+def _next_batch(iterator: Iterator[Any]) -> List[Any]:
+    """ 在线程池中执行：取出最多 THREAD_BATCH 个元素，取完时在末尾放 _STOP """
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= THREAD_BATCH:
+            return batch
+    batch.append(_STOP)
+    return batch
+
+
+async def _iterate(content: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if hasattr(content, "__aiter__"):
+        async for item in content:
+            yield item
+        return
+    iterator = iter(content)
+    try:
+        while True:
+            batch = await to_thread.run_sync(_next_batch, iterator)
+            for item in batch:
+                if item is _STOP:
+                    return
+                yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+class StreamingJSONResponse(StreamingResponse):
+    def __init__(
+        self,
+        content: Union[Iterable[Any], AsyncIterable[Any]],
+        format: str = "array",
+        model: Any = None,
+        envelope: Optional[str] = None,
+        chunk_size: int = CHUNK_SIZE,
+        status_code: int = 200,
+        headers: Optional[dict] = None,
+    ):
+        if format not in ("array", "ndjson"):
+            raise ValueError(f"未知的流式格式: {format}")
+        self.format = format
+        self.envelope = envelope
+        self.chunk_size = chunk_size
+        self.encode = ItemEncoder(model)
+        media_type = NDJSON_MEDIA_TYPE if format == "ndjson" else JSON_MEDIA_TYPE
+        super().__init__(self._chunks(content), status_code=status_code, headers=headers, media_type=media_type)
+
+    async def _chunks(self, content: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[bytes]:
+        ndjson = self.format == "ndjson"
+        if ndjson:
+            opening, separator, closing = b"", b"\n", b"\n"
+        elif self.envelope is not None:
+            opening, separator, closing = b"{" + _dumps(self.envelope) + b":[", b",", b"]}"
+        else:
+            opening, separator, closing = b"[", b",", b"]"
+
+        encode = self.encode
+        chunk_size = self.chunk_size
+        parts: List[bytes] = [opening]
+        size = len(opening)
+        first = True
+        empty = True
+        items = _iterate(content)
+        try:
+            async for item in items:
+                data = encode(item)
+                if not empty:
+                    parts.append(separator)
+                    size += len(separator)
+                empty = False
+                parts.append(data)
+                size += len(data)
+                if first or size >= chunk_size:
+                    first = False
+                    yield b"".join(parts)
+                    parts.clear()
+                    size = 0
+        finally:
+            # 客户端断开或序列化出错时关闭生成器，同步生成器的 finally 也会执行
+            await items.aclose()
+        if not (ndjson and empty):
+            parts.append(closing)
+        if parts:
+            yield b"".join(parts)
+
+
+def wants_ndjson(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return NDJSON_MEDIA_TYPE in accept or "application/jsonl" in accept
+
+
+def stream_json(
+    request: Request,
+    content: Union[Iterable[Any], AsyncIterable[Any]],
+    model: Any = None,
+    envelope: Optional[str] = None,
+    **kwargs: Any,
+) -> StreamingJSONResponse:
+    """ Accept 中包含 application/x-ndjson 时输出 NDJSON，否则输出 JSON 数组（有 envelope 时为 {envelope: [...]}） """
+    if wants_ndjson(request):
+        return StreamingJSONResponse(content, format="ndjson", model=model, **kwargs)
+    return StreamingJSONResponse(content, format="array", model=model, envelope=envelope, **kwargs)
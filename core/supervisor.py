@@ -0,0 +1,341 @@
+"""
+多 worker 启动器（生产模式）
+uvicorn.run(reload=True) 只有一个进程；uvicorn --workers 虽然能启动多个进程，但不能按内存 / 请求数回收 worker，也不能平滑重启。
+Supervisor 的做法：
+    1、预先启动 N 个 worker（默认等于 CPU 核数），每个 worker 是 spawn 出来的新解释器，自己导入应用
+    2、每个 worker 用 SO_REUSEPORT 各自绑定同一个端口，由内核在 worker 之间分配连接；可选把第 i 个 worker 绑定到第 i 个 CPU
+    3、worker 处理完 max_requests（加上随机抖动，避免同时回收）个请求、或 RSS 超过 max_memory_mb 时由 Supervisor 回收：
+       先启动新 worker，新 worker 就绪后再让旧 worker 优雅退出（处理完手上的请求），回收期间端口上始终有 worker 在监听
+       （不用 uvicorn 的 limit_max_requests，它会让 worker 直接退出，新 worker 启动前这个槽位是空的）
+    4、收到 SIGHUP 时滚动重启：逐个替换 worker，始终有 worker 在监听，重新导入的代码在新 worker 中生效
+       收到 SIGTERM / SIGINT 时优雅退出所有 worker
+    5、主循环不会阻塞在某一个 worker 上：新 worker 的启动、旧 worker 的退出都是登记下来、每轮轮询一次状态，
+       替换期间仍然能及时重启崩溃的 worker、响应信号
+仅支持提供 SO_REUSEPORT 的系统（Linux、macOS）；CPU 绑定和 RSS 读取只支持 Linux。
+
+用法：
+python -m core.supervisor runserver:app --port 8080 --workers 8 --pin-cpus --max-requests 10000 --max-memory-mb 512
+python runserver.py --workers 8 --pin-cpus     # 等价
+kill -HUP <supervisor pid>                     # 滚动重启
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import secrets
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def create_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("当前系统不支持 SO_REUSEPORT")
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    # proto 必须显式指定为 TCP，否则 asyncio 不会给 accept 到的连接设置 TCP_NODELAY（响应头和响应体分两次发送时会被 Nagle + 延迟 ACK 拖慢约 40ms）
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def rss_mb(pid: int) -> float:
+    """ 不包括共享内存的页（RssShmem，例如 core.storage.SharedMemoryStore 的文件），这部分所有 worker 共用一份，回收 worker 也不会释放 """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "RssShmem:")):
+                    name, value = line.split()[:2]
+                    values[name] = int(value)
+    except OSError:
+        pass
+    return (values.get("VmRSS:", 0) - values.get("RssShmem:", 0)) / 1024
+
+
+class RequestCounter:
+    """ 统计 worker 处理的请求数，达到上限时通知 Supervisor 回收（worker 继续处理请求，直到被替换） """
+
+    def __init__(self, app, limit: int, retire):
+        self.app = app
+        self.limit = limit
+        self.retire = retire
+        self.count = 0
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            self.count += 1
+            if self.count == self.limit:
+                self.retire.set()
+        await self.app(scope, receive, send)
+
+
+def worker_main(app: str, host: str, port: int, cpu: Optional[int], max_requests: Optional[int],
+                log_level: str, ready, retire) -> None:
+    """ worker 进程入口：绑定端口（SO_REUSEPORT），启动 uvicorn，启动完成后通知 Supervisor """
+    import uvicorn
+    from uvicorn.importer import import_from_string
+
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+    sys.path.insert(0, os.getcwd())
+
+    asgi_app = import_from_string(app)
+    if max_requests:
+        asgi_app = RequestCounter(asgi_app, max_requests, retire)
+    sock = create_socket(host, port)
+    config = uvicorn.Config(asgi_app, loop="auto", log_level=log_level, timeout_graceful_shutdown=30)
+    server = uvicorn.Server(config)
+
+    async def serve() -> None:
+        task = asyncio.create_task(server.serve(sockets=[sock]))
+        while not server.started and not task.done():
+            await asyncio.sleep(0.05)
+        if server.started:
+            ready.set()
+        await task
+
+    # 与 Server.run 一样先设置事件循环（loop="auto"：安装了 uvloop 时使用 uvloop）
+    config.setup_event_loop()
+    asyncio.run(serve())
+
+
+class Worker:
+    def __init__(self, process: multiprocessing.Process, ready, retire, cpu: Optional[int]):
+        self.process = process
+        self.ready = ready
+        self.retire = retire
+        self.cpu = cpu
+        self.started_at = time.monotonic()
+        self.retiring = False
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+
+class Supervisor:
+    def __init__(
+        self,
+        app: str,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        workers: Optional[int] = None,
+        pin_cpus: bool = False,
+        max_requests: Optional[int] = None,
+        max_requests_jitter: int = 0,
+        max_memory_mb: Optional[float] = None,
+        check_interval: float = 1.0,
+        ready_timeout: float = 60.0,
+        log_level: str = "info",
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.pin_cpus = pin_cpus
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_memory_mb = max_memory_mb
+        self.check_interval = check_interval
+        self.ready_timeout = ready_timeout
+        self.log_level = log_level
+        self._context = multiprocessing.get_context("spawn")
+        self._slots: Dict[int, Worker] = {}    # 槽位下标 -> worker，槽位决定绑定哪个 CPU
+        self._starting: Dict[int, Tuple[Worker, float, str]] = {}  # 槽位 -> (正在启动的新 worker, 就绪期限, 原因)
+        self._draining: List[Tuple[Worker, float]] = []           # (已发送 SIGTERM 的 worker, SIGKILL 期限)
+        self._reload_slots: List[int] = []                         # 滚动重启还没有替换的槽位
+        self._stopping = False
+        self._reload_requested = False
+        self._next_check = 0.0
+
+    # ---------------- worker 管理 ----------------
+    def _cpu_for(self, slot: int) -> Optional[int]:
+        if not self.pin_cpus or not hasattr(os, "sched_getaffinity"):
+            return None
+        cpus = sorted(os.sched_getaffinity(0))
+        return cpus[slot % len(cpus)]
+
+    def _spawn(self, slot: int) -> Worker:
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+        ready = self._context.Event()
+        retire = self._context.Event()
+        cpu = self._cpu_for(slot)
+        process = self._context.Process(
+            target=worker_main,
+            args=(self.app, self.host, self.port, cpu, max_requests, self.log_level, ready, retire),
+            name=f"worker-{slot}",
+            daemon=False,
+        )
+        process.start()
+        logger.info("worker %s started (pid %s, cpu %s)", slot, process.pid, cpu)
+        return Worker(process, ready, retire, cpu)
+
+    def _terminate(self, worker: Worker, timeout: float = 35.0) -> None:
+        """ SIGTERM 让 uvicorn 停止接收新连接、处理完手上的请求再退出；不等待，超时后由 _poll_draining 发送 SIGKILL """
+        if worker.process.is_alive():
+            os.kill(worker.pid, signal.SIGTERM)
+        self._draining.append((worker, time.monotonic() + timeout))
+
+    def _stop(self, worker: Worker, timeout: float = 35.0) -> None:
+        """ 同 _terminate，但等待 worker 退出（只在 Supervisor 退出时使用） """
+        if worker.process.is_alive():
+            os.kill(worker.pid, signal.SIGTERM)
+        worker.process.join(timeout)
+        if worker.process.is_alive():
+            logger.warning("worker %s did not exit in %ss, killing", worker.pid, timeout)
+            worker.process.kill()
+            worker.process.join()
+
+    def _replace(self, slot: int, reason: str) -> None:
+        """ 先启动新 worker，就绪后（_poll_starting）再停掉旧 worker，槽位上始终有进程在监听 """
+        if slot in self._starting:
+            return
+        old = self._slots.get(slot)
+        if old is not None:
+            old.retiring = True
+        logger.info("replacing worker %s (%s)", old.pid if old else None, reason)
+        self._starting[slot] = (self._spawn(slot), time.monotonic() + self.ready_timeout, reason)
+
+    def _poll_starting(self) -> None:
+        for slot, (new, deadline, reason) in list(self._starting.items()):
+            old = self._slots.get(slot)
+            if new.ready.is_set():
+                del self._starting[slot]
+                self._slots[slot] = new
+                if old is not None:
+                    self._terminate(old)
+            elif not new.process.is_alive() or time.monotonic() > deadline:
+                del self._starting[slot]
+                logger.error("new worker %s failed to start (%s), keeping the old one", new.pid, reason)
+                self._terminate(new, timeout=5)
+                if old is not None:
+                    old.retiring = False
+
+    def _poll_draining(self) -> None:
+        now = time.monotonic()
+        draining = []
+        for worker, deadline in self._draining:
+            if not worker.process.is_alive():
+                worker.process.join()
+            elif now > deadline:
+                logger.warning("worker %s did not exit in time, killing", worker.pid)
+                worker.process.kill()
+                worker.process.join()
+            else:
+                draining.append((worker, deadline))
+        self._draining = draining
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        check_limits = now >= self._next_check
+        if check_limits:
+            self._next_check = now + self.check_interval
+        for slot, worker in list(self._slots.items()):
+            if self._stopping:
+                return
+            if not worker.process.is_alive():
+                # worker 异常退出；正在替换它的新 worker 还没有就绪时也要先补上一个
+                logger.warning("worker %s exited with %s", worker.pid, worker.process.exitcode)
+                worker.process.join()
+                self._slots[slot] = self._spawn(slot)
+                continue
+            if worker.retiring or not check_limits:
+                continue
+            if worker.retire.is_set():
+                self._replace(slot, "max requests reached")
+            elif self.max_memory_mb:
+                rss = rss_mb(worker.pid)
+                if rss > self.max_memory_mb:
+                    self._replace(slot, f"rss {rss:.0f}MB > {self.max_memory_mb}MB")
+
+    def reload(self) -> None:
+        """ 滚动重启所有 worker：逐个替换，上一个槽位的新 worker 就绪后才替换下一个 """
+        self._reload_slots = sorted(self._slots)
+
+    def _poll_reload(self) -> None:
+        while self._reload_slots and not self._starting:
+            self._replace(self._reload_slots.pop(0), "reload")
+
+    # ---------------- 主循环 ----------------
+    def _on_reload(self, signum, frame) -> None:
+        self._reload_requested = True
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        # 先在主进程里绑定一次，端口被占用时尽早报错
+        create_socket(self.host, self.port).close()
+        # 所有 worker 使用同一个游标签名密钥（core.pagination），否则一个 worker 签发的游标到了另一个 worker 会失效
+        os.environ.setdefault("PAGINATION_SECRET", secrets.token_hex(32))
+
+        logger.info("starting %s workers for %s on %s:%s", self.workers, self.app, self.host, self.port)
+        for slot in range(self.workers):
+            self._slots[slot] = self._spawn(slot)
+        try:
+            while not self._stopping:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.reload()
+                self._poll_starting()
+                self._poll_draining()
+                self._check()
+                self._poll_reload()
+                # 轮询间隔要短：新 worker 就绪、旧 worker 退出都在这里发现；按请求数 / 内存回收仍然每 check_interval 检查一次
+                time.sleep(min(self.check_interval, 0.1))
+        finally:
+            logger.info("stopping workers")
+            workers: List[Worker] = list(self._slots.values())
+            workers += [worker for worker, _, _ in self._starting.values()]
+            workers += [worker for worker, _ in self._draining]
+            for worker in workers:
+                if worker.process.is_alive():
+                    os.kill(worker.pid, signal.SIGTERM)
+            for worker in workers:
+                self._stop(worker)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="多 worker 启动器")
+    parser.add_argument("app", help="应用的导入路径，如 runserver:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="默认等于 CPU 核数")
+    parser.add_argument("--pin-cpus", action="store_true", help="每个 worker 绑定一个 CPU")
+    parser.add_argument("--max-requests", type=int, default=None, help="worker 处理这么多请求后重启")
+    parser.add_argument("--max-requests-jitter", type=int, default=0)
+    parser.add_argument("--max-memory-mb", type=float, default=None, help="worker 的 RSS 超过该值时重启")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [supervisor] %(message)s")
+    Supervisor(
+        args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        pin_cpus=args.pin_cpus,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        max_memory_mb=args.max_memory_mb,
+        log_level=args.log_level,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+流式 multipart 上传
+File(...) 声明为 bytes 时整个文件都在内存里；UploadFile 虽然超过 1MB 会落到 SpooledTemporaryFile，但 await file.read() 又会把整个文件读回内存，
+并发上传大文件时 worker 的 RSS 会随文件大小线性增长。
+
+save_multipart(request) 直接读取 request.stream()，边解析边处理：
+    1、文件内容按块计算 sha256 和大小，写入有上限的缓冲区，缓冲区满了就在线程池中写到磁盘
+    2、每个请求从进程级的内存预算（MemoryBudget）里预留一个缓冲区，预算用完时新请求会等待（不再读取 socket，形成背压）
+    3、文件大小、普通字段大小、文件数、字段数超过限制时立即返回 413 / 400，并删除已经写入的文件
+    4、请求体格式错误或不完整（没有结束分隔符）时返回 400，同样删除已经写入的文件
+注意：视图函数不能再声明 File / Form 参数，否则 FastAPI 会先把整个表单读完。
+"""
+import asyncio
+import codecs
+import hashlib
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+import anyio
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, Field
+
+try:
+    from python_multipart.multipart import MultipartParseError, MultipartParser, MultipartState, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParseError, MultipartParser, MultipartState, parse_options_header
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "fastapi-uploads"))
+
+
+class UploadLimits(BaseModel):
+    buffer_size: int = 1024 * 1024            # 每个请求的写缓冲区（也是每个请求占用的内存上限）
+    max_file_size: int = 4 * 1024 ** 3        # 单个文件的大小上限
+    max_field_size: int = 64 * 1024           # 普通表单字段的大小上限
+    max_files: int = 100
+    max_fields: int = 100
+
+
+class StoredFile(BaseModel):
+    field_name: str
+    filename: str
+    content_type: Optional[str] = None
+    path: str = Field(exclude=True)     # 服务器上的路径，只给视图函数使用，不出现在响应中
+    size: int
+    sha256: str
+
+
+class StreamedForm(BaseModel):
+    files: List[StoredFile] = []
+    fields: Dict[str, List[str]] = {}
+
+
+class MemoryBudget:
+    """ 进程级的缓冲区内存预算（字节），预留不到时等待其他请求释放 """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size: int) -> None:
+        if size > self.limit:
+            raise ValueError(f"buffer size {size} exceeds memory budget {self.limit}")
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+
+    async def release(self, size: int) -> None:
+        async with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+
+DEFAULT_LIMITS = UploadLimits()
+memory_budget = MemoryBudget(int(os.environ.get("UPLOAD_MEMORY_BUDGET", 64 * 1024 * 1024)))
+
+
+class _Part:
+    def __init__(self):
+        self.disposition = b""
+        self.content_type: Optional[str] = None
+        self.header_name = b""
+        self.header_value = b""
+        self.field_name = ""
+        self.filename: Optional[str] = None
+        self.data = bytearray()     # 普通字段的值
+        self.file = None            # 文件句柄
+        self.path = ""
+        self.size = 0
+        self.sha256 = None
+
+
+class _MultipartStream:
+    def __init__(self, boundary: bytes, charset: str, upload_dir: str, limits: UploadLimits):
+        self.charset = charset
+        self.upload_dir = upload_dir
+        self.limits = limits
+        self.form = StreamedForm()
+        self.part = _Part()
+        self.buffer = bytearray()
+        self.paths: List[str] = []
+        # 解析器的回调是同步的，事件先记下来，每喂完一块数据再异步处理（写文件需要 await）
+        self.events: List[tuple] = []
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        })
+
+    # ---------------- 解析器回调 ----------------
+    def on_part_begin(self) -> None:
+        self.events.append(("begin", _Part()))
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.events.append(("header_field", data[start:end]))
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.events.append(("header_value", data[start:end]))
+
+    def on_header_end(self) -> None:
+        self.events.append(("header_end", None))
+
+    def on_headers_finished(self) -> None:
+        self.events.append(("headers_finished", None))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self.events.append(("data", data[start:end]))
+
+    def on_part_end(self) -> None:
+        self.events.append(("end", None))
+
+    # ---------------- 异步处理 ----------------
+    def decode(self, value: bytes) -> str:
+        try:
+            return value.decode(self.charset)
+        except UnicodeDecodeError:
+            return value.decode("latin-1")
+
+    async def feed(self, chunk: bytes) -> None:
+        self.parser.write(chunk)
+        events, self.events = self.events, []
+        for event, value in events:
+            await getattr(self, f"handle_{event}")(value)
+
+    async def handle_begin(self, part: _Part) -> None:
+        self.part = part
+
+    async def handle_header_field(self, value: bytes) -> None:
+        self.part.header_name += value
+
+    async def handle_header_value(self, value: bytes) -> None:
+        self.part.header_value += value
+
+    async def handle_header_end(self, _) -> None:
+        part = self.part
+        name = part.header_name.lower()
+        if name == b"content-disposition":
+            part.disposition = part.header_value
+        elif name == b"content-type":
+            part.content_type = self.decode(part.header_value)
+        part.header_name = b""
+        part.header_value = b""
+
+    async def handle_headers_finished(self, _) -> None:
+        part = self.part
+        _, options = parse_options_header(part.disposition)
+        if b"name" not in options:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, 'Content-Disposition 缺少 "name"')
+        part.field_name = self.decode(options[b"name"])
+
+        if b"filename" not in options:
+            if sum(len(v) for v in self.form.fields.values()) >= self.limits.max_fields:
+                raise HTTPException(status.HTTP_400_BAD_REQUEST, f"表单字段数超过 {self.limits.max_fields}")
+            return
+
+        if len(self.form.files) >= self.limits.max_files:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, f"文件数超过 {self.limits.max_files}")
+        part.filename = self.decode(options[b"filename"])
+        part.sha256 = hashlib.sha256()
+        # 不使用客户端提供的文件名作为路径，避免路径穿越
+        fd, part.path = tempfile.mkstemp(dir=self.upload_dir, prefix="upload-")
+        self.paths.append(part.path)
+        part.file = os.fdopen(fd, "wb", buffering=0)
+
+    async def handle_data(self, data: bytes) -> None:
+        part = self.part
+        if part.file is None:
+            if len(part.data) + len(data) > self.limits.max_field_size:
+                raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"字段 {part.field_name} 过大")
+            part.data += data
+            return
+
+        part.size += len(data)
+        if part.size > self.limits.max_file_size:
+            raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, f"文件 {part.filename} 过大")
+        part.sha256.update(data)
+        if len(self.buffer) + len(data) > self.limits.buffer_size:
+            await self.flush()
+        self.buffer += data
+
+    async def flush(self) -> None:
+        if self.buffer and self.part.file is not None:
+            await anyio.to_thread.run_sync(self.part.file.write, bytes(self.buffer))
+        self.buffer.clear()
+
+    async def handle_end(self, _) -> None:
+        part = self.part
+        if part.file is None:
+            self.form.fields.setdefault(part.field_name, []).append(self.decode(bytes(part.data)))
+            return
+
+        await self.flush()
+        await anyio.to_thread.run_sync(part.file.close)
+        part.file = None
+        self.form.files.append(StoredFile(
+            field_name=part.field_name,
+            filename=part.filename,
+            content_type=part.content_type,
+            path=part.path,
+            size=part.size,
+            sha256=part.sha256.hexdigest(),
+        ))
+
+    def finish(self) -> None:
+        """ 请求体读完后调用：必须已经读到结束分隔符，否则是被截断的请求体 """
+        self.parser.finalize()
+        if self.parser.state != MultipartState.END:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, "multipart 请求体不完整")
+
+    def abort(self) -> None:
+        if self.part.file is not None:
+            self.part.file.close()
+            self.part.file = None
+        for path in self.paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+async def save_multipart(
+    request: Request,
+    upload_dir: Optional[str] = None,
+    limits: UploadLimits = DEFAULT_LIMITS,
+    budget: MemoryBudget = memory_budget,
+) -> StreamedForm:
+    """ 流式解析 multipart/form-data 请求体，文件写入 upload_dir，返回文件信息和普通字段 """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "需要 multipart/form-data 请求体")
+    charset = params.get(b"charset", b"utf-8").decode("latin-1")
+    try:
+        codecs.lookup(charset)
+        # hex / rot13 这类非文本编码 lookup 能找到，decode 时才抛出 LookupError（空字节串不会检查编码）
+        b"a".decode(charset, "replace")
+    except LookupError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, f"不支持的字符集：{charset}")
+
+    upload_dir = upload_dir or UPLOAD_DIR
+    os.makedirs(upload_dir, exist_ok=True)
+    stream = _MultipartStream(params[b"boundary"], charset, upload_dir, limits)
+
+    await budget.acquire(limits.buffer_size)
+    try:
+        async for chunk in request.stream():
+            await stream.feed(chunk)
+        stream.finish()
+    except MultipartParseError as exc:
+        stream.abort()
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, f"multipart 请求体格式错误：{exc}")
+    except BaseException:
+        stream.abort()
+        raise
+    finally:
+        with anyio.CancelScope(shield=True):
+            await budget.release(limits.buffer_size)
+    return stream.form
@@ -0,0 +1,376 @@
+"""
+启动预热
+第一个请求往往比后面的慢：懒加载的课程模块要导入、各种缓存（core.encoders 的类型编码器、core.serializers 的序列化器、
+响应缓存等）还是空的；更糟的是在视图函数里定义模型类，例如 api_return.py 的 return_pydantic 原来在函数体中定义 class User(BaseModel)，
+每个请求都要重新构建一次 pydantic 模型（生成 core schema、校验器、序列化器），单这一步就约 1ms，而且永远不会变快。
+
+install_warmup(app) 在应用启动（startup 事件）时：
+    1、遍历已注册的路由，确保请求体 / 响应模型都已完整构建（有前向引用、defer_build 的模型在这里 model_rebuild），
+       编译 response_model 的序列化器（core.serializers）
+    2、静态检查：视图函数和它的依赖的字节码中有 LOAD_BUILD_CLASS（函数体中有 class 语句）时打印警告
+    3、回放样例请求（直接调用 ASGI 应用，不经过网络）：
+       WARMUP_REQUESTS 指定的样例文件（.http 格式，如 test_main.http；或 RequestRecorder 录制的 .jsonl），
+       没有指定时回放所有不需要参数的 GET 路由；默认只回放 GET / HEAD，WARMUP_UNSAFE=1 时也回放其他方法（会修改数据）
+       每个样例回放两次，第二次仍然创建了新的 pydantic 模型类时打印警告（运行时检查，能发现静态检查看不到的情况）
+    supervisor 在 worker 的 startup 完成后才认为 worker 就绪，所以滚动重启时新 worker 接到的第一个请求已经是预热过的
+录制样例：WARMUP_RECORD=/tmp/samples.jsonl 时 RequestRecorder 按 (方法, 路径) 各记录一个请求（最多 WARMUP_RECORD_LIMIT 个）
+    JSON 请求体、表单（urlencoded）和查询字符串中名字含 password、token、secret 等的字段，值替换为 "redacted" 后再写入文件
+    （WARMUP_REDACT_FIELDS 可以追加，逗号分隔）；无法逐字段处理的请求体（multipart、其他类型、解析失败）不录制
+配置：WARMUP=0 关闭预热
+"""
+import asyncio
+import base64
+import dis
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from fastapi import FastAPI
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.routing import Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.serializers import serializer_for_route
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD")
+# 录制时保留的请求头
+RECORDED_HEADERS = ("accept", "content-type", "accept-encoding")
+MAX_RECORDED_BODY = 64 * 1024
+# 录制时字段名（小写）包含这些词的值会被替换
+SENSITIVE_FIELDS = ("password", "passwd", "secret", "token", "api_key", "apikey", "authorization", "credential")
+REDACTED = "redacted"
+
+
+class Sample:
+    """ 一个样例请求 """
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, path: str, query: str = "", headers: Optional[Dict[str, str]] = None,
+                 body: bytes = b""):
+        self.method = method.upper()
+        self.path = path
+        self.query = query
+        self.headers = headers or {}
+        self.body = body
+
+    @property
+    def label(self) -> str:
+        return f"{self.method} {self.path}" + (f"?{self.query}" if self.query else "")
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"method": self.method, "path": self.path, "query": self.query, "headers": self.headers,
+                "body": base64.b64encode(self.body).decode("ascii")}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Sample":
+        return cls(data["method"], data["path"], data.get("query", ""), data.get("headers"),
+                   base64.b64decode(data.get("body", "")))
+
+
+# ---------------- 样例文件 ----------------
+def parse_http_file(text: str) -> List[Sample]:
+    """ 解析 .http 文件（JetBrains / VS Code REST Client 格式）：### 分隔请求，# 开头是注释 """
+    samples = []
+    for block in text.split("###"):
+        lines = [line for line in block.strip().splitlines() if not line.startswith("#")]
+        while lines and not lines[0].strip():
+            lines.pop(0)
+        if not lines:
+            continue
+        method, url = lines[0].split(None, 1)
+        parts = urlsplit(url.strip())
+        headers = {}
+        index = 1
+        while index < len(lines) and lines[index].strip():
+            name, _, value = lines[index].partition(":")
+            headers[name.strip().lower()] = value.strip()
+            index += 1
+        body = "\n".join(lines[index + 1:]).strip().encode()
+        samples.append(Sample(method, parts.path or "/", parts.query, headers, body))
+    return samples
+
+
+def load_samples(path: str) -> List[Sample]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".jsonl"):
+        return [Sample.from_json(json.loads(line)) for line in text.splitlines() if line.strip()]
+    return parse_http_file(text)
+
+
+def default_samples(app: FastAPI) -> List[Sample]:
+    """ 不需要任何参数的 GET 路由 """
+    samples = []
+    for prefix, route in iter_routes(app.routes):
+        if "GET" not in route.methods or route.param_convertors:
+            continue
+        dependant = route.dependant
+        params = dependant.query_params + dependant.header_params + dependant.cookie_params + dependant.body_params
+        for sub in dependant.dependencies:
+            params += sub.query_params + sub.header_params + sub.cookie_params + sub.body_params
+        if any(param.required for param in params):
+            continue
+        samples.append(Sample("GET", prefix + route.path))
+    return samples
+
+
+# ---------------- 路由 ----------------
+def iter_routes(routes: Iterable[Any], prefix: str = "") -> Iterable[Tuple[str, APIRoute]]:
+    """ (挂载前缀, 路由)，包括 Mount 的子应用中的路由；懒加载还没导入的课程模块没有路由 """
+    for route in routes:
+        if isinstance(route, APIRoute):
+            yield prefix, route
+        elif isinstance(route, Mount) and hasattr(route.app, "routes"):
+            yield from iter_routes(route.app.routes, prefix + route.path)
+
+
+def _models(annotation: Any, seen: Set[type]) -> Iterable[type]:
+    """ 注解中出现的 pydantic 模型（包括 List[Item]、Optional[Item] 等） """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        if annotation not in seen:
+            seen.add(annotation)
+            yield annotation
+            for field in annotation.model_fields.values():
+                yield from _models(field.annotation, seen)
+        return
+    for arg in getattr(annotation, "__args__", ()) or ():
+        yield from _models(arg, seen)
+
+
+def _calls(dependant: Dependant) -> Iterable[Any]:
+    if dependant.call is not None:
+        yield dependant.call
+    for sub in dependant.dependencies:
+        yield from _calls(sub)
+
+
+def _unwrap(func: Any) -> Any:
+    while hasattr(func, "__wrapped__"):
+        # core.metrics / core.serializers 包装过的视图函数
+        func = func.__wrapped__
+    return func
+
+
+def builds_class(func: Any) -> bool:
+    """ 函数体中是否有 class 语句（每次调用都会创建一个新类） """
+    func = _unwrap(func)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        code = getattr(getattr(func, "__call__", None), "__code__", None)
+    if code is None:
+        return False
+    return any(instruction.opname == "LOAD_BUILD_CLASS" for instruction in dis.get_instructions(code))
+
+
+def warm_route(route: APIRoute) -> List[str]:
+    """ 构建路由用到的模型和序列化器，返回发现的问题 """
+    seen: Set[type] = set()
+    annotations = [param.field_info.annotation for param in route.dependant.body_params]
+    if route.response_model is not None:
+        annotations.append(route.response_model)
+    for annotation in annotations:
+        for model in _models(annotation, seen):
+            if not model.__pydantic_complete__:
+                model.model_rebuild()
+    serializer_for_route(route)
+
+    problems = []
+    for call in _calls(route.dependant):
+        if builds_class(call):
+            problems.append(f"{sorted(route.methods)} {route.path}: {getattr(_unwrap(call), '__qualname__', call)} "
+                            f"在函数体中定义类，每个请求都会重新创建（pydantic 模型还要重新构建校验器），请移到模块级别")
+    return problems
+
+
+# ---------------- 回放 ----------------
+def _model_classes() -> Set[int]:
+    found: Set[int] = set()
+    stack = [BaseModel]
+    while stack:
+        for cls in stack.pop().__subclasses__():
+            if id(cls) not in found:
+                found.add(id(cls))
+                stack.append(cls)
+    return found
+
+
+async def call_app(app: ASGIApp, sample: Sample) -> int:
+    """ 直接调用 ASGI 应用处理一个样例请求，返回状态码（响应体丢弃） """
+    headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in sample.headers.items()]
+    headers.append((b"host", b"warmup"))
+    if sample.body:
+        headers.append((b"content-length", str(len(sample.body)).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": sample.method,
+        "scheme": "http", "path": sample.path, "raw_path": sample.path.encode(), "root_path": "",
+        "query_string": sample.query.encode(), "headers": headers, "client": ("127.0.0.1", 0),
+        "server": ("warmup", 80), "warmup": True,
+    }
+    request_sent = False
+    finished = asyncio.Event()
+    status = 0
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": sample.body, "more_body": False}
+        # 响应发送完之前不断开（流式响应会监听断开事件）
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            finished.set()
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    return status
+
+
+async def replay(app: ASGIApp, samples: List[Sample], unsafe: bool = False) -> List[str]:
+    """ 每个样例回放两次，第二次还创建了新的模型类就记为问题 """
+    problems = []
+    for sample in samples:
+        if sample.method not in SAFE_METHODS and not unsafe:
+            continue
+        try:
+            await call_app(app, sample)
+            before = _model_classes()
+            status = await call_app(app, sample)
+            created = len(_model_classes() - before)
+        except Exception:
+            logger.exception("warmup request %s failed", sample.label)
+            continue
+        logger.debug("warmup %s -> %s", sample.label, status)
+        if created:
+            problems.append(f"{sample.label}: 每个请求都创建了 {created} 个新的 pydantic 模型类")
+    return problems
+
+
+async def warmup(app: FastAPI, samples: Optional[List[Sample]] = None, unsafe: bool = False) -> List[str]:
+    """ 预热 app，返回发现的问题（同时以 warning 打印） """
+    start = time.perf_counter()
+    problems: List[str] = []
+    routes = [route for _, route in iter_routes(app.routes)]
+    for route in routes:
+        problems += warm_route(route)
+    if samples is None:
+        samples = default_samples(app)
+    problems += await replay(app, samples, unsafe)
+    for problem in problems:
+        logger.warning("warmup: %s", problem)
+    logger.info("warmup: %s routes, %s samples in %.1fms", len(routes), len(samples), (time.perf_counter() - start) * 1000)
+    return problems
+
+
+# ---------------- 录制 ----------------
+def _sensitive(name: str, fields: Tuple[str, ...]) -> bool:
+    name = name.lower()
+    return any(field in name for field in fields)
+
+
+def _redact_json(value: Any, fields: Tuple[str, ...]) -> Any:
+    if isinstance(value, dict):
+        return {key: REDACTED if _sensitive(key, fields) else _redact_json(item, fields) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact_json(item, fields) for item in value]
+    return value
+
+
+def _redact_query(query: str, fields: Tuple[str, ...]) -> str:
+    pairs = parse_qsl(query, keep_blank_values=True)
+    if not any(_sensitive(name, fields) for name, _ in pairs):
+        return query
+    return urlencode([(name, REDACTED if _sensitive(name, fields) else value) for name, value in pairs])
+
+
+def redact_body(content_type: str, body: bytes, fields: Tuple[str, ...] = SENSITIVE_FIELDS) -> Optional[bytes]:
+    """ 替换请求体中的敏感字段；无法逐字段处理时返回 None（不录制这个请求） """
+    if not body:
+        return body
+    media_type = content_type.split(";")[0].strip().lower()
+    try:
+        if media_type == "application/json" or media_type.endswith("+json"):
+            return json.dumps(_redact_json(json.loads(body), fields), ensure_ascii=False).encode()
+        if media_type == "application/x-www-form-urlencoded":
+            return _redact_query(body.decode("latin-1"), fields).encode("latin-1")
+    except (ValueError, UnicodeError):
+        return None
+    return None
+
+
+class RequestRecorder:
+    """ 按 (方法, 路径) 各记录一个请求到 .jsonl 文件，作为以后启动时回放的样例 """
+
+    def __init__(self, app: ASGIApp, path: str, limit: int = 200):
+        self.app = app
+        self.path = path
+        self.limit = limit
+        extra = os.environ.get("WARMUP_REDACT_FIELDS", "")
+        self.fields = SENSITIVE_FIELDS + tuple(name.strip().lower() for name in extra.split(",") if name.strip())
+        # 已经录制过的请求不再重复录制
+        self.seen: Set[Tuple[str, str]] = set()
+        if os.path.exists(path):
+            self.seen = {(sample.method, sample.path) for sample in load_samples(path)}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("warmup") or len(self.seen) >= self.limit \
+                or (scope["method"], scope["path"]) in self.seen:
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["method"], scope["path"])
+        self.seen.add(key)
+        chunks: List[bytes] = []
+        size = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request":
+                size += len(message.get("body", b""))
+                if size <= MAX_RECORDED_BODY:
+                    chunks.append(message.get("body", b""))
+            return message
+
+        await self.app(scope, receive_wrapper, send)
+        if size > MAX_RECORDED_BODY:
+            return
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]
+                   if name.decode("latin-1") in RECORDED_HEADERS}
+        body = redact_body(headers.get("content-type", ""), b"".join(chunks), self.fields)
+        if body is None:
+            return
+        query = _redact_query(scope.get("query_string", b"").decode("latin-1"), self.fields)
+        sample = Sample(scope["method"], scope["path"], query, headers, body)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(sample.to_json(), ensure_ascii=False) + "\n")
+
+
+def install_warmup(app: FastAPI) -> None:
+    """ 注册 startup 预热；WARMUP_RECORD 不为空时同时录制样例请求 """
+    record = os.environ.get("WARMUP_RECORD")
+    if record:
+        app.add_middleware(RequestRecorder, path=record, limit=int(os.environ.get("WARMUP_RECORD_LIMIT", 200)))
+    if os.environ.get("WARMUP", "1") == "0":
+        return
+
+    async def run_warmup() -> None:
+        path = os.environ.get("WARMUP_REQUESTS")
+        samples = load_samples(path) if path else None
+        await warmup(app, samples, unsafe=os.environ.get("WARMUP_UNSAFE") == "1")
+
+    app.add_event_handler("startup", run_warmup)
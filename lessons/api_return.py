@@ -1,35 +1,50 @@
 from pydantic import BaseModel
-from runserver import app
+from fastapi import APIRouter
 
+from core.executors import ExecutorRoute, executors
 
-@app.get("/return_int")
+# 下面的 def 视图函数都只返回常量，切换到线程池的开销比函数本身还大，用 @executors.inline 直接在事件循环中执行
+router = APIRouter(route_class=ExecutorRoute)
+
+
+@router.get("/return_int")
+@executors.inline
 def return_int():
     return 123456
 
 
-@app.get("/return_str")
+@router.get("/return_str")
+@executors.inline
 def return_str():
     return "QAZXSW"
 
 
-@app.get("/return_float")
+@router.get("/return_float")
+@executors.inline
 def return_float():
     return 12.346
 
 
-@app.get("/return_list")
+@router.get("/return_list")
+@executors.inline
 def return_list():
     return [1, 2, 3, 4, 5]
 
 
-@app.get("/return_dict")
+@router.get("/return_dict")
+@executors.inline
 def return_dict():
     return dict(name="derek", ages=35)
 
 
-@app.get("/return_pydantic")
+# 模型类要定义在模块级别：如果写在视图函数里，每个请求都会重新创建一次类，pydantic 还要重新构建校验器和序列化器（约 1ms）
+# core.warmup 启动时会检查这种写法并打印警告
+class User(BaseModel):
+    name: str
+    age: int
+
+
+@router.get("/return_pydantic")
+@executors.inline
 def return_pydantic():
-    class User(BaseModel):
-        name: str
-        age: int
     return User(**dict(name="derek", age=35))
@@ -4,7 +4,11 @@ from typing import Optional, List
 from fastapi import FastAPI, Query, Path, Body
 from pydantic import BaseModel, Field
 
+from core.plans import PlanRoute
+
 app = FastAPI()
+# 参数在创建路由时编译成提取计划（core.plans），请求时一次取值、一次校验
+app.router.route_class = PlanRoute
 
 
 class Item(BaseModel):
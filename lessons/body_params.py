@@ -1,11 +1,13 @@
-import typing
 from typing import Optional
 
 from fastapi import FastAPI
 from pydantic import BaseModel
 
-typing.TYPE_CHECKING = True
+from core.bodies import FastBodyRoute
+
 app = FastAPI()
+# JSON 请求体直接 validate_json，并限制大小和嵌套深度（core.bodies）
+app.router.route_class = FastBodyRoute
 
 
 class Item(BaseModel):
@@ -1,7 +1,11 @@
 from typing import Optional, List
 from fastapi import FastAPI, Query
 
+from core.cache import CachedRoute, response_cache
+from core.openapi import install_openapi_cache
+
 app = FastAPI()
+app.router.route_class = CachedRoute
 
 
 # 查询参数的字符串校验
@@ -9,6 +13,7 @@ app = FastAPI()
 # 2、使用 Query 作为默认值，可以在参数上设置默认值，如果参数没有被提供，则使用默认值。这里的默认值为
 # 3、q: str = Query(None) 等同于 q: str = None，但是使用 Query 有更多的条件验证。
 @app.get("/items/")
+@response_cache.cached(ttl=60)  # 缓存 key 包含排序后的查询参数，?q=foo 和 ?q=bar 分别缓存
 async def read_items(
     q: Optional[str] | None = Query(None, min_length=3, max_length=10)
 ) -> dict:
@@ -84,3 +89,7 @@ async def read_items6(
     if q:
         results.update( {"q": q})
     return results
+
+
+# 文档很大（大量 example / summary / description），/openapi.json 改用缓存的 bytes（gzip、ETag / 304）
+install_openapi_cache(app)
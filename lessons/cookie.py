@@ -2,8 +2,12 @@ from typing import Optional
 
 from fastapi import Cookie, FastAPI
 
+from core.plans import PlanRoute
+
 
 app = FastAPI()
+# 参数在创建路由时编译成提取计划（core.plans），请求时一次取值、一次校验
+app.router.route_class = PlanRoute
 
 
 # 声明 Cookie 参数: 与声明 Query 参数和 Path 参数时相同
@@ -2,7 +2,11 @@ from typing import Annotated, List
 
 from fastapi import FastAPI, File, Form, UploadFile
 
+from core.forms import FastFormRoute
+
 app = FastAPI()
+# 按 Form / File 参数预先算好字段，边接收边检查（未知字段 400、超大字段 413），校验通过时不再经过 FastAPI 的逐字段校验
+app.router.route_class = FastFormRoute
 
 
 # FastAPI 支持同时使用 File 和 Form 定义文件和表单字段（web框架都支持，不是fastapi獨有）
@@ -2,7 +2,11 @@ from typing import Optional, List
 
 from fastapi import FastAPI, Form
 
+from core.forms import FastFormRoute
+
 app = FastAPI()
+# 按 Form / File 参数预先算好字段，边接收边检查（未知字段 400、超大字段 413），校验通过时不再经过 FastAPI 的逐字段校验
+app.router.route_class = FastFormRoute
 
 
 # 导入 Form
@@ -1,19 +1,25 @@
-from fastapi import FastAPI, Query
-from fastapi import status
-from fastapi.encoders import jsonable_encoder
+from fastapi import Depends, FastAPI, Query
 from fastapi import HTTPException
 from fastapi.exceptions import RequestValidationError, WebSocketRequestValidationError
 from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from core.cache import CachedRoute, response_cache
+from core.errors import error_renderer
+from core.storage import ItemStore, StoreProvider
 
 app = FastAPI()
+app.router.route_class = CachedRoute
 
 items = {
     "foo": {"name": "Foo", "price": 50.2},
     "bar": {"name": "Bar", "price": 62, "description": "The bartenders"},
     "baz": {"name": "Baz", "price": 50.2, "description": "There goes my baz"},
 }
+# 默认直接使用上面的 items；设置 STORAGE_URL=sqlite:///... 或 STORAGE_URL=shm://（共享内存）后多个 worker 共享同一份数据
+items_db = StoreProvider("handle_errors.items", initial=items)
 
 
 # 錯誤響應信息：
@@ -21,26 +27,29 @@ items = {
 #   "detail": "Item not found"
 # }
 @app.get("/items/{item_id}")
-async def read_item(item_id: str):
-    if item_id not in items:
+@response_cache.cached(ttl=30)
+async def read_item(item_id: str, store: ItemStore = Depends(items_db)):
+    item = await store.get(item_id)
+    if item is None:
         # raise ValueError("Item not found")  # 框架不會返回錯誤的信息，直接在程序裏報錯
 
         # 触发 HTTPException 时，可以用参数 detail 传递任何能转换为 JSON 的值，不仅限于 str。
         # 还支持传递 dict、list 等数据结构。FastAPI 能自动处理这些数据，并将之转换为 JSON
         raise HTTPException(status_code=404, detail="Item not found")  # 框架會返回錯誤的信息
-    return items[item_id]
+    return item
 
 
 # 添加自定义响应头
 @app.get("/items-header/{item_id}")
-async def read_item_header(item_id: str):
-    if item_id not in items:
+async def read_item_header(item_id: str, store: ItemStore = Depends(items_db)):
+    item = await store.get(item_id)
+    if item is None:
         raise HTTPException(
             status_code=404,
             detail="Item not found",
             headers={"X-Error": "There goes my baz"}  # Response headers
         )
-    return items[item_id]
+    return item
 
 
 # 安装自定义异常处理器
@@ -92,12 +101,19 @@ async def read_default_errors(q: int = Query(...)):
 
 
 # 使用 RequestValidationError 的请求体
+# 最直接的写法如下，但每次 422 都会把整个请求体回显并重新编码，错误请求多的时候比正常请求还耗 CPU：
+# return JSONResponse(
+#     status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+#     content=jsonable_encoder({"detail": exc.errors(), "body": exc.body})
+# )
+# error_renderer 输出的格式相同，但错误片段预编码缓存、回显的 body / input 有大小上限；ERROR_MODE=compact 时只返回 type 和 loc
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content=jsonable_encoder({"detail": exc.errors(), "body": exc.body})
-    )
+    return error_renderer.validation_error(request, exc)
+
+
+# HTTPException("Item not found") 这类固定的错误响应只编码一次
+app.add_exception_handler(StarletteHTTPException, error_renderer.http_exception_handler)
 
 
 class Item(BaseModel):
@@ -5,11 +5,15 @@ JSON兼容编码器
 from datetime import datetime
 from typing import Optional
 
-from fastapi import FastAPI
-from fastapi.encoders import jsonable_encoder
+from fastapi import Depends, FastAPI
+from core.encoders import jsonable_encoder  # 与 fastapi.encoders.jsonable_encoder 输出一致，按类型缓存编码函数
 from pydantic import BaseModel, Field
 
+from core.executors import ExecutorRoute
+from core.storage import ItemStore, StoreProvider
+
 fake_db = {}
+fake_db_store = StoreProvider("jsonable_encoder.fake_db", initial=fake_db)
 
 
 class Item(BaseModel):
@@ -24,15 +28,17 @@ class Item(BaseModel):
 
 
 app = FastAPI()
+# 同步的 update_item 在 core.executors 的 default 池中执行（有排队上限，过载时返回 503）
+app.router.route_class = ExecutorRoute
 
 
 # 在此示例中，它将 Pydantic 模型转换为一个字典，并将这个datetime转换为一个字符串
 # jsonable_encoder 將 Item 對象實例轉化爲一個字典，將 datetime 轉化爲一個字符串(默認ISO 格式："2024-07-18T08:10:59.169Z")
 @app.put("/items/{id}")
-def update_item(id: str, item: Item):
+async def update_item(id: str, item: Item, store: ItemStore = Depends(fake_db_store)):
     json_compatible_item_data = jsonable_encoder(item)
-    fake_db[id] = json_compatible_item_data
-    return fake_db[id]
+    await store.put(id, json_compatible_item_data)
+    return json_compatible_item_data
 
 
 # 对于 datetime 也可以不用 class Config 方式来指定类型，通过下面的方式也可以：
@@ -42,7 +48,7 @@ class MyDateTime(datetime):
         yield cls.validate
 
     @classmethod
-    def validate(cls, value):
+    def validate(cls, value, *args):
         if isinstance(value, datetime):
             return value
         return datetime.fromisoformat(value)
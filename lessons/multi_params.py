@@ -4,9 +4,21 @@ from typing import Optional, List
 from fastapi import FastAPI, Query, Path, Body
 from pydantic import BaseModel
 
+from core.bodies import FastBodyRoute
+from core.plans import PlanRoute
+
 app = FastAPI()
 
 
+# JSON 请求体直接 validate_json，并限制大小和嵌套深度（core.bodies）
+# path / query / 请求体参数按预先编译好的计划提取、一次校验（core.plans）；校验失败时交给 FastBodyRoute 原来的流程生成报错
+class FastBodyPlanRoute(PlanRoute, FastBodyRoute):
+    pass
+
+
+app.router.route_class = FastBodyPlanRoute
+
+
 class Item(BaseModel):
     name: str
     description: Optional[str] = None
@@ -1,10 +1,15 @@
 from typing import Optional, List
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from pydantic import BaseModel, HttpUrl
 
+from core.bodies import FastBodyRoute
+from core.bulk import BulkValidator
+
 
 app = FastAPI()
+# JSON 请求体直接 validate_json，并限制大小和嵌套深度（core.bodies）
+app.router.route_class = FastBodyRoute
 
 
 class Image(BaseModel):
@@ -84,3 +89,19 @@ async def update_item(item_id: int, item: Item):
 @app.post("/offers/")
 async def create_offer(offer: Offer):
     return offer
+
+
+# 批量导入 Item：请求体是 Item 的 JSON 数组，或者每行一个 Item 的 NDJSON（Content-Type: application/x-ndjson）
+# 每 1000 行用一个 TypeAdapter(List[Item]) 校验，相同的图片地址只解析一次；出错的行单独报告，其余行照常导入：
+# {"accepted": 998, "rejected": 2, "errors": [{"index": 3, "errors": [{"type": "missing", "loc": ["price"], ...}]}, ...],
+#  "errors_truncated": false}
+bulk_items = BulkValidator(Item)
+
+
+@app.post("/items/bulk", openapi_extra={"requestBody": {"required": True, "content": {
+    "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/Item"}}},
+    "application/x-ndjson": {"schema": {"$ref": "#/components/schemas/Item"}},
+}}})
+async def bulk_create_items(request: Request):
+    result = await bulk_items.ingest(request)
+    return result.summary()
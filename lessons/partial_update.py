@@ -4,13 +4,24 @@
     很多人甚至只用 PUT 实现部分更新。
     FastAPI 对此没有任何限制，可以随意互换使用这两种操作。
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from fastapi import FastAPI
-from fastapi.encoders import jsonable_encoder
+from fastapi import Body, Depends, FastAPI, HTTPException
+from core.encoders import jsonable_encoder  # 与 fastapi.encoders.jsonable_encoder 输出一致，按类型缓存编码函数
 from pydantic import BaseModel
 
+from core.bodies import FastBodyRoute
+from core.cache import CachedRoute, response_cache
+from core.storage import ItemStore, StoreProvider
+
+
+# 请求体有大小限制（BODY_MAX_BYTES），批量更新的 item 个数在校验之前检查（core.bodies）
+class CachedFastBodyRoute(CachedRoute, FastBodyRoute):
+    pass
+
+
 app = FastAPI()
+app.router.route_class = CachedFastBodyRoute
 
 
 class Item(BaseModel):
@@ -26,26 +37,85 @@ items = {
     "bar": {"name": "Bar", "description": "The bartenders", "price": 62, "tax": 20.2},
     "baz": {"name": "Baz", "description": None, "price": 50.2, "tax": 10.5, "tags": []},
 }
+items_db = StoreProvider("partial_update.items", initial=items)
+
+
+async def get_stored_item(item_id: str, store: ItemStore = Depends(items_db)) -> dict:
+    item = await store.get(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
 
 
 @app.get("/items/{item_id}", response_model=Item)
-async def read_item(item_id: str):
-    return items[item_id]
+@response_cache.cached(ttl=30)
+async def read_item(stored_item_data: dict = Depends(get_stored_item)):
+    return stored_item_data
 
 
 @app.patch("/items/{item_id}", response_model=Item)
-async def update_item(item_id: str, item: Item):
-    stored_item_data = items[item_id]
+async def update_item(
+    item_id: str,
+    item: Item,
+    stored_item_data: dict = Depends(get_stored_item),
+    store: ItemStore = Depends(items_db),
+):
     stored_item_model = Item(**stored_item_data)
     print(f"stored_item_model: {stored_item_model}")
     update_data = item.dict(exclude_unset=True)
     print(f"update_data: {update_data}")
     updated_item = stored_item_model.copy(update=update_data)  # 更新 update_data 中的数据
     print(f"updated_item: {updated_item}")
-    items[item_id] = jsonable_encoder(updated_item)
+    await store.put(item_id, jsonable_encoder(updated_item))
+    response_cache.invalidate(read_item, item_id=item_id)  # 删除 GET /items/{item_id} 的缓存
     return updated_item
 
 
+# 批量部分更新：一次请求更新多个 item，请求体为 {item_id: 要更新的字段}
+# {
+#     "foo": {"price": 10},
+#     "bar": {"tags": ["a", "b"], "description": null}
+# }
+# 只把请求中显式设置的字段（model_fields_set）合并到存储的 dict 中，不重新构造整个 Item，
+# 值没有变化的 item 不写存储；结果按 item 返回：updated / unchanged / not_found
+# 超过 MAX_BULK_ITEMS 个 item 时返回 422（too_long），在校验每个 Item 之前检查
+MAX_BULK_ITEMS = 10000
+
+
+class BulkUpdateResult(BaseModel):
+    status: str
+    changed: List[str] = []
+
+
+@app.patch("/items", response_model=Dict[str, BulkUpdateResult])
+async def update_items(
+    patches: Dict[str, Item] = Body(..., max_length=MAX_BULK_ITEMS),
+    store: ItemStore = Depends(items_db),
+):
+    stored = await store.get_many(list(patches))
+    results = {}
+    updated = {}
+    for item_id, patch in patches.items():
+        stored_item_data = stored.get(item_id)
+        if stored_item_data is None:
+            results[item_id] = BulkUpdateResult(status="not_found")
+            continue
+        update_data = patch.model_dump(mode="json", include=patch.model_fields_set)
+        changed = [field for field, value in update_data.items()
+                   if field not in stored_item_data or stored_item_data[field] != value]
+        if not changed:
+            results[item_id] = BulkUpdateResult(status="unchanged")
+            continue
+        # 复制一份再合并，不修改存储中的对象（内存存储返回的是原始 dict）
+        updated[item_id] = {**stored_item_data, **{field: update_data[field] for field in changed}}
+        results[item_id] = BulkUpdateResult(status="updated", changed=changed)
+
+    if updated:
+        await store.put_many(updated)
+        response_cache.invalidate_many(read_item, "item_id", updated)
+    return results
+
+
 if __name__ == "__main__":
     import uvicorn
 
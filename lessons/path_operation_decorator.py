@@ -3,6 +3,8 @@ from typing import Optional, Set
 from fastapi import FastAPI, status
 from pydantic import BaseModel
 
+from core.openapi import install_openapi_cache
+
 app = FastAPI()
 
 
@@ -46,6 +48,10 @@ async def create_item(item: Item):
     return item
 
 
+# 文档很大（大量 example / summary / description），/openapi.json 改用缓存的 bytes（gzip、ETag / 304）
+install_openapi_cache(app)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,14 +1,29 @@
+import os
 from enum import Enum
 from pydantic import BaseModel
-from runserver import app
+from fastapi import APIRouter, Request
 
+from core.cache import CachedRoute, response_cache
+from core.executors import ExecutorRoute, executors
+from core.files import serve_file
 
-@app.get("/items/{item_id}")
+
+class CachedExecutorRoute(CachedRoute, ExecutorRoute):
+    pass
+
+
+# 同步视图函数在 core.executors 的线程池中执行（EXECUTOR_ROUTES 可以把某个函数分到单独的池），很简单的直接内联执行
+router = APIRouter(route_class=CachedExecutorRoute)
+
+
+@router.get("/items/{item_id}")
+@executors.inline
 def read_item(item_id):
     return {"item_id": item_id}
 
 
-@app.get("/items/{item_id}")
+@router.get("/items/{item_id}")
+@executors.inline
 def read_item_int(item_id: int):
     # 注意：上面的路径会接收到所有的 /items/123f, /items/123 的请求，需要把他放到后面，否则会拦截所有的请求
     # 因为上面的请求路径覆盖了本请求的所有请求，请求不会被这个路径匹配到到
@@ -34,7 +49,8 @@ class ModelName(str, Enum):
     lenet = "lenet"
 
 
-@app.get("/models/{model_name}")
+@router.get("/models/{model_name}")
+@response_cache.cached(ttl=300)  # 结果只取决于 model_name，命中缓存时不再校验参数、调用视图函数
 async def get_model(model_name: ModelName):
     """
     获取模型
@@ -55,7 +71,20 @@ async def get_model(model_name: ModelName):
 
 
 # 路径转换器
-@app.get("/files/{file_path:path}")
+@router.get("/files/{file_path:path}")
 async def read_file(file_path: str):
     return {"file_path": file_path}
 
+
+# 基于路径转换器的文件下载：支持 Range（断点续传）、ETag / If-None-Match（304），
+# 文件内容通过 sendfile（服务器支持时）或 mmap 发送，不经过 Python 读取复制
+# 下载目录由环境变量 FILES_ROOT 指定，默认为项目中专用的 files/ 目录（不要指向项目根目录，否则源码、.git 都能被下载），
+# 路径不能跳出该目录，以 . 开头的文件和目录不会发送
+# curl -H "Range: bytes=0-99" http://127.0.0.1:8080/download/example.txt
+FILES_ROOT = os.environ.get("FILES_ROOT", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "files"))
+
+
+@router.get("/download/{file_path:path}")
+@router.head("/download/{file_path:path}", include_in_schema=False)
+async def download_file(file_path: str, request: Request):
+    return serve_file(FILES_ROOT, file_path, request)
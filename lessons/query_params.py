@@ -1,12 +1,42 @@
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 
-from runserver import app
+from fastapi import APIRouter, Depends, Query, Request
 
+from core.pagination import CursorPage, CursorPaginator, PageRequest
+from core.storage import ItemStore, StoreProvider
+from core.streaming import stream_json
 
-@app.get("/items/")
-async def read_items(q: Optional[str] = None, skip: int = 0, limit: int = 10):
+router = APIRouter()
+# key 补零，按字符串排序就是按编号排序
+items_db = StoreProvider("query_params.items", initial={
+    f"{index:06d}": {"name": f"Foo {index}", "price": 42, "index": index} for index in range(1000)
+})
+paginator = CursorPaginator(default_limit=10, max_limit=100)
+# 流式响应虽然不占内存，但 limit 没有上限时一个请求可以一直输出下去
+MAX_STREAM_ITEMS = 100000
+
+
+def iter_items(q: Optional[str], skip: int, limit: int) -> Iterator[dict]:
+    """ 按需生成第 skip 到 skip + limit 个商品，不会一次性创建整个列表 """
+    for index in range(skip, skip + max(limit, 0)):
+        item = {"name": "Foo", "price": 42, "index": index}
+        if q:
+            item["q"] = q
+        yield item
+
+
+@router.get("/items/")
+async def read_items(
+    request: Request,
+    q: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=0, le=MAX_STREAM_ITEMS),
+):
     """
-    如果 skip 或 limit 不是数字，则返回报错信息
+    如果 skip 或 limit 不是数字，或者 skip 为负数、limit 超过 MAX_STREAM_ITEMS，则返回报错信息
+    返回的是流式响应：默认是 JSON 数组，请求头 Accept: application/x-ndjson 时每行一个商品；
+    limit=100000 时首字节时间和内存占用也不会增长
+    :param request:
     :param skip:
     :param limit:
     :param q:
@@ -17,10 +47,22 @@ async def read_items(q: Optional[str] = None, skip: int = 0, limit: int = 10):
     # q: str = None
     # q: Union[str, None] = None
     # 这三种表示基本相同
-    return [{"name": "Foo", "price": 42}]
+    return stream_json(request, iter_items(q, skip, limit))
+
+
+@router.get("/items/page/", response_model=CursorPage)
+async def read_items_page(page: PageRequest = Depends(paginator), store: ItemStore = Depends(items_db)):
+    """
+    游标分页：第一页不带 cursor，之后使用响应中的 next / prev 链接翻页；
+    和 skip / limit 不同，翻到多深每一页的代价都一样，limit 最大 100
+    :param page:
+    :param store:
+    :return:
+    """
+    return await page.fetch(store)
 
 
-@app.get("/items/bool/{item_id}")
+@router.get("/items/bool/{item_id}")
 async def read_item_bool(item_id: str, q: Optional[str] = None, short: bool = False):
     """
     如果 item_id 不是数字，则返回报错信息
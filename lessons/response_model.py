@@ -3,10 +3,24 @@
 """
 from typing import List, Optional
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query
 from pydantic import BaseModel, EmailStr, Field
 
+from core.cache import CachedRoute, response_cache
+from core.columnar import ColumnarStore
+from core.serializers import CompiledResponseRoute
+from core.storage import ItemStore, StoreProvider
+
+
+# CachedRoute 在外层：命中缓存时连序列化都不需要
+class CachedCompiledRoute(CachedRoute, CompiledResponseRoute):
+    pass
+
+
 app = FastAPI()
+# 每个路由在声明时就按 response_model + include/exclude 等参数编译好序列化器，请求时直接输出 JSON bytes
+# 去掉这一行就是 FastAPI 默认的 校验 -> dict -> json.dumps 流程，两者的响应内容一致
+app.router.route_class = CachedCompiledRoute
 
 
 class Item(BaseModel):
@@ -74,6 +88,44 @@ items = {
     "bar": {"name": "Bar", "description": "The bartenders", "price": 62, "tax": 20.2},
     "baz": {"name": "Baz", "description": None, "price": 50.2, "tax": 10.5, "tags": []},
 }
+items_db = StoreProvider("response_model.items", initial=items)
+MAX_SEARCH_ITEMS = 1000
+
+
+def _in_range(item: dict, min_price: Optional[float], max_price: Optional[float], tag: Optional[str]) -> bool:
+    price = item.get("price")
+    if type(price) not in (int, float):
+        return False
+    if min_price is not None and price < min_price or max_price is not None and price > max_price:
+        return False
+    return tag is None or tag in (item.get("tags") or ())
+
+
+# 按价格范围 / tag 过滤
+# STORAGE_URL=columnar:// 时走 ColumnarStore.select：price 列有排序索引，返回的 ColumnarRow 不复制整行，
+# 序列化时才按 response_model 的字段逐列取值，结果按行号顺序（删除后空出的行号会被新写入的 item 复用，不保证是写入顺序）；
+# 其他存储按 key 分页扫描，结果按 key 排序
+@app.get("/items/", response_model=List[Item])
+async def search_items(
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    tag: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_SEARCH_ITEMS),
+    store: ItemStore = Depends(items_db),
+):
+    if isinstance(store, ColumnarStore):
+        conditions = {"price": (min_price, max_price)}
+        if tag is not None:
+            conditions["tags"] = tag
+        return store.select(limit=limit, **conditions)
+    found, after = [], None
+    while len(found) < limit:
+        rows = await store.page(after=after, limit=MAX_SEARCH_ITEMS)
+        if not rows:
+            break
+        found.extend(item for _, item in rows if _in_range(item, min_price, max_price, tag))
+        after = rows[-1][0]
+    return found[:limit]
 
 
 @app.get(
@@ -87,8 +139,12 @@ items = {
     response_model_exclude={"tax"},
     # response_model_exclude=["tax"],   # 会转成 set
 )
-async def read_item(item_id: str):
-    return items[item_id]
+@response_cache.cached(ttl=30)
+async def read_item(item_id: str, store: ItemStore = Depends(items_db)):
+    item = await store.get(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
 
 
 # response_model_by_alias: 默认为 True, 响应中包含的是 alias 而不是字段名
@@ -3,6 +3,8 @@ from typing import Optional
 from fastapi import FastAPI, Body
 from pydantic import BaseModel, Field
 
+from core.openapi import install_openapi_cache
+
 app = FastAPI()
 
 
@@ -50,3 +52,6 @@ async def update_item2(
     results = {"item0": item0}
     return results
 
+
+# 文档很大（大量 example / summary / description），/openapi.json 改用缓存的 bytes（gzip、ETag / 304）
+install_openapi_cache(app)
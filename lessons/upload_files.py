@@ -1,7 +1,10 @@
 from typing import List
 
 from fastapi.responses import HTMLResponse
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, Request, UploadFile
+
+from core.streaming import stream_json
+from core.uploads import StreamedForm, save_multipart
 
 app = FastAPI()
 
@@ -55,14 +58,25 @@ async def create_upload_file(file: UploadFile = File(...)):
 # FastAPI 支持同时上传多个文件。
 # 可用同一个「表单字段」发送含多个文件的「表单数据」。
 # 上传多个文件时，要声明含 bytes 或 UploadFile 的列表（List）
+# 响应按文件逐个输出（core.streaming）：默认仍是 {"file_sizes": [...]}，Accept: application/x-ndjson 时每行一个
 @app.post("/multi-files/")
-async def create_multiple_files(files: List[bytes] = File(...)):
-    return {"file_sizes": [len(file) for file in files]}
+async def create_multiple_files(request: Request, files: List[bytes] = File(...)):
+    return stream_json(request, (len(file) for file in files), envelope="file_sizes")
 
 
 @app.post("/multi-uploadfile/")
-async def create_multiple_upload_files(files: List[UploadFile] = File(...)):
-    return {"filenames": [file.filename for file in files]}
+async def create_multiple_upload_files(request: Request, files: List[UploadFile] = File(...)):
+    return stream_json(request, (file.filename for file in files), envelope="filenames")
+
+
+# 流式上传（大文件）
+# 上面几种方式都要等整个表单解析完才进入视图函数，bytes 会把文件整个放进内存，UploadFile.read() 也一样。
+# 这里不声明 File 参数，直接读取 request.stream()，边解析边计算 sha256、边写磁盘，
+# 每个请求只占用一个固定大小的缓冲区，进程内所有上传共享一个内存预算（UPLOAD_MEMORY_BUDGET）。
+# curl -F "files=@big.iso" -F "note=abc" http://127.0.0.1:8000/stream-files/
+@app.post("/stream-files/", response_model=StreamedForm)
+async def create_streaming_files(request: Request):
+    return await save_multipart(request)
 
 
 @app.get("/html/")
@@ -77,6 +91,10 @@ async def main():
         <input name="files" type="file" multiple>
         <input type="submit">
         </form>
+        <form action="/stream-files/" enctype="multipart/form-data" method="post">
+        <input name="files" type="file" multiple>
+        <input type="submit">
+        </form>
         </body>
     """
     return HTMLResponse(content=content)
@@ -1,6 +1,18 @@
 
+import os
+
 from fastapi import FastAPI
 
+from core.cache import response_cache
+from core.compression import install_compression
+from core.executors import install_executors
+from core.metrics import install_metrics
+from core.openapi import install_openapi_cache
+from core.radix_router import install_radix_router
+from core.registry import LessonRegistry
+from core.storage import install_storage
+from core.warmup import install_warmup
+
 app = FastAPI()
 
 
@@ -17,14 +29,64 @@ async def say_hello(name: str):
     return {"message": f"Hello {name}"}
 
 
-from lessons.api_return import *
-from lessons.path_params import *
-from lessons.query_params import *
+# 响应缓存的命中 / 未命中 / 合并等待 / 淘汰 / 失效次数（按视图函数统计）
+@app.get("/cache/stats")
+async def cache_stats():
+    return response_cache.report()
+
+
+# 课程模块不再通过 import * 挂到 app 上（会产生循环导入，且每个 worker 启动都要导入全部模块）
+# prefix="" 的模块挂在根路径，启动时加载；其余模块挂在 /lessons/<模块名> 下，第一次请求命中时才导入
+# 预加载其他模块: LESSONS_PRELOAD=lessons.body_params,lessons.cookie 或 LESSONS_PRELOAD=*
+registry = LessonRegistry()
+registry.register("lessons.api_return", prefix="")
+registry.register("lessons.path_params", prefix="")
+registry.register("lessons.query_params", prefix="")
+for _name in (
+    "body_fields", "body_params", "check_of_path_and_numerical", "check_of_query_and_string", "cookie",
+    "form_and_files", "form_fields", "handle_errors", "header", "jsonable_encoder", "multi_params",
+    "nested_model_params", "partial_update", "path_operation_decorator", "response_model", "schema_extra",
+    "upload_files",
+):
+    registry.register(f"lessons.{_name}")
+registry.install(app)
+
+# 可选：用前缀树索引代替线性路由匹配（/items/123 会匹配到 read_item_int，/items/abc 匹配到 read_item）
+if os.environ.get("RADIX_ROUTER") == "1":
+    install_radix_router(app)
+
+# 应用关闭时关闭课程模块的存储（core.storage，SQLiteStore 写完待写队列再关闭连接）
+install_storage(app)
+
+# 同步视图函数的线程池（core.executors）；EXECUTOR_DEFAULT_THREADS 调整 AnyIO 默认线程数
+install_executors(app)
+
+# 按路由统计请求数、分阶段耗时（路由 / 参数校验 / 视图函数 / 序列化）、请求和响应大小，Prometheus 格式输出到 /metrics
+install_metrics(app)
+
+# 启动时预热：构建模型和序列化器、检查视图函数中定义模型类的写法、回放样例请求（WARMUP_REQUESTS=test_main.http）
+install_warmup(app)
+
+# /openapi.json 按应用版本缓存成 bytes（含 gzip 版本、ETag / 304），有本地文件时 /docs、/redoc 不再依赖 CDN
+install_openapi_cache(app)
+
+# 响应压缩（gzip，安装了 brotli / zstandard 时优先 br / zstd）：小响应不压缩，大响应在线程池中压缩，相同的 GET 响应复用压缩结果
+install_compression(app)
 
 
 if __name__ == "__main__":
+    import sys
+
     import uvicorn
 
+    # 生产模式：带参数运行时交给多 worker 启动器（SO_REUSEPORT、CPU 绑定、按请求数 / 内存回收、SIGHUP 滚动重启）
+    # python runserver.py --workers 8 --pin-cpus --max-requests 10000 --max-memory-mb 512
+    if len(sys.argv) > 1:
+        from core.supervisor import main
+
+        main(["runserver:app", *sys.argv[1:]])
+        sys.exit()
+
     # uvicorn.run(app, host="0.0.0.0", port=8080)  # ok
 
     # 这里运行时，使用reload=True，在脚本中不能热更新，但在命令行中就可以